@@ -0,0 +1,107 @@
+import bisect
+
+### Interval-based allocator for one NPU memory space
+# Free space is kept as maximal intervals in two sorted lists: by start address (for first-fit and for coalescing on
+# free) and by (size, start) (for best-fit). Allocated blocks are remembered by start address so they can be freed.
+# Intervals are found with bisect, but first-fit walks the free intervals and inserting into or deleting from the
+# sorted lists shifts them, so alloc() and free() are linear in the number of free intervals (not in words).
+class mem_allocator (object):
+   def __init__(self, depth, policy='first_fit'):
+      assert policy in ('first_fit', 'best_fit'), 'Unknown allocation policy ' + str(policy)
+      self.depth        = depth
+      self.policy       = policy
+      self.free_starts  = [0]			# start addresses of the free intervals, sorted
+      self.free_sizes   = {0: depth}		# start -> size of every free interval
+      self.free_by_size = [(depth, 0)]		# (size, start) of every free interval, sorted
+      self.allocated    = {}			# start -> size of every allocated block
+      self.used         = 0			# words currently allocated
+      self.peak_used    = 0			# most words allocated at the same time
+      self.high_water   = 0			# highest address ever allocated + 1
+
+   def add_free(self, start, size):
+      bisect.insort(self.free_starts, start)
+      bisect.insort(self.free_by_size, (size, start))
+      self.free_sizes[start] = size
+
+   def remove_free(self, start):
+      size = self.free_sizes.pop(start)
+      del self.free_starts[bisect.bisect_left(self.free_starts, start)]
+      del self.free_by_size[bisect.bisect_left(self.free_by_size, (size, start))]
+      return size
+
+   # Start of the first aligned block of the given size inside the free interval, or -1 if it does not fit
+   def fit(self, start, size, align):
+      aligned = -(-start // align) * align
+      if(aligned + size <= start + self.free_sizes[start]):
+         return aligned
+      return -1
+
+   # Returns the start address of the allocated block or -1 if allocation failed (linear in the free intervals)
+   def alloc(self, size, align=1):
+      assert size > 0, 'Allocation size must be positive'
+      alloc_addr = -1
+      if(self.policy == 'best_fit'):
+         # Smallest free interval that can hold the block (the first one found is enough when align is 1)
+         for i in range(bisect.bisect_left(self.free_by_size, (size, -1)), len(self.free_by_size)):
+            alloc_addr = self.fit(self.free_by_size[i][1], size, align)
+            if(alloc_addr != -1):
+               start = self.free_by_size[i][1]
+               break
+      else:
+         # Lowest-address free interval that can hold the block
+         for start in self.free_starts:
+            alloc_addr = self.fit(start, size, align)
+            if(alloc_addr != -1):
+               break
+      if(alloc_addr == -1):
+         return -1
+
+      # Split the free interval around the allocated block
+      free_size = self.remove_free(start)
+      if(alloc_addr > start):
+         self.add_free(start, alloc_addr - start)
+      if(alloc_addr + size < start + free_size):
+         self.add_free(alloc_addr + size, start + free_size - alloc_addr - size)
+
+      self.allocated[alloc_addr] = size
+      self.used += size
+      self.peak_used = max(self.peak_used, self.used)
+      self.high_water = max(self.high_water, alloc_addr + size)
+      return alloc_addr
+
+   # Release a block returned by alloc() and merge it with the neighbouring free intervals (linear in the free intervals)
+   def free(self, addr):
+      assert addr in self.allocated, 'Address ' + str(addr) + ' was not allocated'
+      size = self.allocated.pop(addr)
+      self.used -= size
+      start = addr
+      i = bisect.bisect_left(self.free_starts, addr)
+      if(i > 0):
+         prev_start = self.free_starts[i - 1]
+         if(prev_start + self.free_sizes[prev_start] == addr):
+            start = prev_start
+            size += self.remove_free(prev_start)
+      if((start + size) in self.free_sizes):
+         size += self.remove_free(start + size)
+      self.add_free(start, size)
+
+   def size_of(self, addr):
+      return self.allocated[addr]
+
+   # Fragmentation: share of the free words that are not in the largest free interval
+   def fragmentation(self):
+      total_free = self.depth - self.used
+      if(total_free == 0):
+         return 0.0
+      return 1.0 - (self.free_by_size[-1][0] * 1.0 / total_free)
+
+   def stats(self):
+      return {
+         'depth'          : self.depth,
+         'used'           : self.used,
+         'peak_used'      : self.peak_used,
+         'high_water'     : self.high_water,
+         'free_intervals' : len(self.free_starts),
+         'largest_free'   : self.free_by_size[-1][0] if self.free_by_size else 0,
+         'fragmentation'  : self.fragmentation()
+      }
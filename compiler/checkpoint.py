@@ -0,0 +1,71 @@
+import ast
+import numpy as np
+
+### FSim checkpoint container
+# One file per checkpoint holding every architecture state, queue and the decoded instruction table: a fixed preamble
+# (magic, version, header length), a header that is the repr of a dict describing the arrays (name -> dtype descr, shape,
+# offset) and the raw arrays, each starting on an aligned offset. Arrays are only mapped when they are asked for, so a
+# reader that needs the instructions never touches the MRF image and slices of the MRFs only page in what they cover.
+CHECKPOINT_MAGIC   = b'NPUCKPT\0'
+CHECKPOINT_VERSION = 1
+CHECKPOINT_ALIGN   = 64
+
+checkpoint_preamble = np.dtype([('magic', 'S8'), ('version', '<u4'), ('header_len', '<u4')])
+
+# Write the (name, array) pairs to path, one write per array
+def write_checkpoint(path, arrays):
+   arrays = [(name, np.ascontiguousarray(array)) for name, array in arrays]
+   for name, array in arrays:
+      assert array.dtype != object, 'Checkpoint array ' + name + ' is not numeric'
+
+   # The header length depends on the offsets, so they are laid out after a generous estimate of it
+   entries = {name: {'descr': np.lib.format.dtype_to_descr(array.dtype), 'shape': array.shape} for name, array in arrays}
+   data_start = checkpoint_preamble.itemsize + len(repr(entries)) + len(arrays) * 32
+   data_start += -data_start % CHECKPOINT_ALIGN
+   offset = data_start
+   for name, array in arrays:
+      entries[name]['offset'] = offset
+      offset += array.nbytes + (-array.nbytes % CHECKPOINT_ALIGN)
+   header = repr(entries).encode()
+   assert checkpoint_preamble.itemsize + len(header) <= data_start, 'Checkpoint header does not fit'
+
+   preamble = np.zeros(1, dtype=checkpoint_preamble)
+   preamble['magic'] = CHECKPOINT_MAGIC
+   preamble['version'] = CHECKPOINT_VERSION
+   preamble['header_len'] = len(header)
+   with open(path, 'wb') as ckpt_file:
+      ckpt_file.write(preamble.tobytes() + header)
+      for name, array in arrays:
+         ckpt_file.seek(entries[name]['offset'])
+         ckpt_file.write(array.data)
+      ckpt_file.truncate(offset)
+
+class checkpoint (object):
+   def __init__(self, path):
+      self.path = path
+      with open(path, 'rb') as ckpt_file:
+         raw = ckpt_file.read(checkpoint_preamble.itemsize)
+         assert raw[:len(CHECKPOINT_MAGIC)] == CHECKPOINT_MAGIC and len(raw) == checkpoint_preamble.itemsize, \
+            path + ' is not an FSim checkpoint'
+         preamble = np.frombuffer(raw, dtype=checkpoint_preamble)
+         assert preamble['version'][0] == CHECKPOINT_VERSION, 'Unsupported checkpoint version ' + str(preamble['version'][0])
+         self.entries = ast.literal_eval(ckpt_file.read(int(preamble['header_len'][0])).decode())
+      self.arrays = {}
+
+   def __contains__(self, name):
+      return name in self.entries
+
+   def names(self):
+      return list(self.entries)
+
+   # Read-only view of one array, mapped on first use
+   def __getitem__(self, name):
+      assert name in self.entries, 'No ' + name + ' in checkpoint ' + self.path
+      if(name not in self.arrays):
+         entry = self.entries[name]
+         dtype = np.lib.format.descr_to_dtype(entry['descr'])
+         if(int(np.prod(entry['shape'])) == 0):
+            self.arrays[name] = np.zeros(entry['shape'], dtype=dtype)
+         else:
+            self.arrays[name] = np.memmap(self.path, dtype=dtype, mode='r', offset=entry['offset'], shape=entry['shape'])
+      return self.arrays[name]
@@ -1,17 +1,29 @@
 import math
 import numpy as np
 import warnings
-import pickle
 import sys
 import copy
 import subprocess
 import os
-import threading
 import time
-import re
+import multiprocessing
+import concurrent.futures
 
-from fsim import chain
+from fsim import inst_table, adjust_bypassed
 from fsim import npu_isa_sim
+from int_gemm import int_gemm
+from allocator import mem_allocator
+from perf_model import perf_params, estimate_cycles, pipeline_sim, STAGES
+from sim_image import write_sim_image
+from checkpoint import checkpoint, write_checkpoint
+from flow_cache import flow_cache, hash_arrays, hash_files
+from mif_writer import write_mif_files
+from pac_header import write_pac_header
+from fsim import MVU_NOP, MVU_MATVEC, EVRF_NOP, EVRF_MOVE, EVRF_READ, MFU_NOP, MFU_ADD, MFU_SUB_A_B, MFU_SUB_B_A, MFU_MAX, MFU_MUL
+from fsim import LD_NOP, LD_IN, LD_WB, LD_FLUSH, VRF_NONE, vrf_spaces, mfu_op_codes
+
+# Depth of the provisional VRF memory spaces used until the VRF reuse pass places the vectors
+VIRTUAL_VRF_DEPTH = 2**31
 
 '''
 Current Limitations:
@@ -59,15 +71,22 @@ class npu:
 		self.ac_data_type	= np.int32
 
 		# Memory spaces of the NPU and instruction tagging
+		# With VRF reuse, vectors get provisional addresses from an unbounded space and the VRFs are only
+		# allocated for real by the reuse pass at the end of the program (see reuse_vrf_space)
+		alloc_policy = flow_opts['alloc_policy']
+		vrf_alloc_depth = VIRTUAL_VRF_DEPTH if flow_opts['vrf_reuse'] else arch_params['vrf_depth']
 		self.mem_space = {
-			'mvu_vrf' 	: np.zeros(arch_params['vrf_depth'], dtype=int),
-			'mvu_mrf' 	: np.zeros(arch_params['mrf_depth'], dtype=int),
-			'evrf' 		: np.zeros(arch_params['vrf_depth'], dtype=int),
-			'mfu0_add'  	: np.zeros(arch_params['vrf_depth'], dtype=int),
-			'mfu0_mul' 	: np.zeros(arch_params['vrf_depth'], dtype=int),
-			'mfu1_add' 	: np.zeros(arch_params['vrf_depth'], dtype=int),
-			'mfu1_mul' 	: np.zeros(arch_params['vrf_depth'], dtype=int)
+			'mvu_vrf' 	: mem_allocator(vrf_alloc_depth, alloc_policy),
+			'mvu_mrf' 	: mem_allocator(arch_params['mrf_depth'], alloc_policy),
+			'evrf' 		: mem_allocator(vrf_alloc_depth, alloc_policy),
+			'mfu0_add'  	: mem_allocator(vrf_alloc_depth, alloc_policy),
+			'mfu0_mul' 	: mem_allocator(vrf_alloc_depth, alloc_policy),
+			'mfu1_add' 	: mem_allocator(vrf_alloc_depth, alloc_policy),
+			'mfu1_mul' 	: mem_allocator(vrf_alloc_depth, alloc_policy)
 		}
+		self.vrf_refs = []
+		self.vrf_space = None
+		self.last_writer = {}
 		self.highest_tag_so_far = 0
 		self.mrf_filled_depth = 0
 
@@ -80,8 +99,12 @@ class npu:
 		self.mfu1_vrf0  = np.zeros((self.arch_params['vrf_depth'], self.arch_params['lanes']),dtype = self.ac_data_type)
 		self.mfu1_vrf1  = np.zeros((self.arch_params['vrf_depth'], self.arch_params['lanes']),dtype = self.ac_data_type)
 
-		# Instruction, input and golden output queues
-		self.inst_q = []
+		# Instruction table, input and golden output queues
+		self.inst_table = inst_table()
+		self.wb_so_far = []
+		self.wb_names = []
+		self.chain_results = []
+		self.chain_flags = []
 		self.ibuf_q = []
 		self.golden_obuf_q = []
 		self.fsim = None
@@ -98,53 +121,44 @@ class npu:
 		self.MIW_EVRF = 0
 		self.MIW_MVU = 0
 		self.MICW = 0
-		self.mvu_minst = 0
-		self.evrf_minst = 0
-		self.mfu0_minst = 0
-		self.mfu1_minst = 0
-		self.ld_minst = 0
-		self.minst_chain = 0
+		self.inst_layout = []
 
 		self.operands = []
 		self.unsupported_layers = []
 		self.ops = 0
 
+		# Flow cache entry of the model being compiled (with -cache) and its arrays if it was restored from the cache
+		self.cache = None
+		self.cache_key = None
+		self.cached_program = None
+
 	# This function is used to allocate memory of a specific number of words (size) in a specific memory space.
 	# It returns the start address of the allocated memory or -1 if allocation failed.
-	def alloc_space(self, space, size):
-		alloc_addr = -1
-		idx = 0
+	def alloc_space(self, space, size, align=1):
 		assert space in self.mem_space.keys(), 'No such memory space exists'
-		space_depth = self.mem_space[space].size
-
-		# Start from address 0 in the specified memory space and look for the first empty contiguous location of the required size
-		while (idx < space_depth and alloc_addr == -1):
-			assert self.mem_space[space][idx] != -1, 'Something wrong with allocation'
-			if (self.mem_space[space][idx] == 0):
-				can_allocate = True
-				for i in range(1, size):
-					if(idx+i >= space_depth):
-						can_allocate = False
-						idx = space_depth
-						break
-					if (self.mem_space[space][idx+i] != 0):
-						can_allocate = False
-						idx = idx + i + self.mem_space[space][idx+i]
-						break
-				if (can_allocate):
-					self.mem_space[space][idx] = size
-					for i in range(1, size):
-						self.mem_space[space][idx+i] = -1
-					alloc_addr = idx
-					idx = space_depth
-			else:
-				idx = idx + self.mem_space[space][idx]
+		alloc_addr = self.mem_space[space].alloc(size, align)
 
 		if(space == 'mvu_mrf'):
-			self.mrf_filled_depth += size
+			self.mrf_filled_depth = self.mem_space[space].high_water
 
 		return alloc_addr
 
+	# This function releases memory allocated by alloc_space so that it can be reused by later allocations.
+	def free_space(self, space, addr):
+		assert space in self.mem_space.keys(), 'No such memory space exists'
+		self.mem_space[space].free(addr)
+
+	# This function prints the usage, high-water mark and fragmentation of every memory space (after VRF reuse if enabled).
+	def print_mem_stats(self):
+		for space in self.mem_space:
+			if (self.vrf_space and space in self.vrf_space):
+				stats = self.vrf_space[space].stats()
+			else:
+				stats = self.mem_space[space].stats()
+			print(space + ': ' + str(stats['used']) + '/' + str(stats['depth']) + ' word(s) used, peak ' + str(stats['peak_used']) + \
+				', high-water mark ' + str(stats['high_water']) + ', ' + str(stats['free_intervals']) + ' free interval(s), fragmentation ' + \
+				str(round(stats['fragmentation'], 3)))
+
 	# This function sets all the parameters for instruction field widths based on those specified by the user
 	def set_inst_params(self):
 		self.NTAGW = int(math.ceil(math.log(self.arch_params['max_tag'], 2)))
@@ -158,6 +172,7 @@ class npu:
 		self.MIW_EVRF = (3*self.VRFAW) + self.NSIZEW + self.NTAGW + 4
 		self.MIW_MVU = (3*self.VRFAW) + (3*self.NSIZEW) + self.MRFAW + self.NTAGW + 1
 		self.MICW = self.MIW_LD + (2*self.MIW_MFU) + self.MIW_EVRF + self.MIW_MVU
+		self.set_inst_layout()
 		if(self.flow_opts['verbose']):
 			print('NTAGW = ' + str(self.NTAGW))
 			print('NSIZEW = ' + str(self.NSIZEW))
@@ -169,240 +184,109 @@ class npu:
 			print('MIW_MFU = ' + str(self.MIW_MFU))
 			print('MIW_EVRF = ' + str(self.MIW_EVRF)) 
 
-	# This function puts together the macro-instructions into one VLIW instruction (chain)
-	def set_inst(self,inst):
-		self.set_mvu_minst(inst)
-		self.set_evrf_minst(inst)
-		self.set_mfu0_minst(inst)
-		self.set_mfu1_minst(inst)
-		self.set_ld_minst(inst)
-		self.minst_chain = 0
-		shift = 0
-		self.minst_chain += (int(self.ld_minst) << shift)
-		shift += self.MIW_LD
-		self.minst_chain += (int(self.mfu1_minst) << shift)
-		shift += self.MIW_MFU
-		self.minst_chain += (int(self.mfu0_minst) << shift)
-		shift += self.MIW_MFU
-		self.minst_chain += (int(self.evrf_minst) << shift)
-		shift += self.MIW_EVRF
-		self.minst_chain += (int(self.mvu_minst) << shift)
-
-	# This function sets the fields of the MVU macro-instruction
-	def set_mvu_minst(self, inst):		
-		self.mvu_minst=0
-		shift=0
-		if inst.mvu_op_type!='nop':
-			self.mvu_minst=1
-			shift+=1
-			self.mvu_minst+=(int(inst.mvu_tag) << shift)
-			shift+=self.NTAGW
-			self.mvu_minst =(int(inst.mvu_words_per_row) << shift) + self.mvu_minst
-			shift+=self.NSIZEW 
-			self.mvu_minst+=(int(inst.mvu_mrf_rd_sz) << shift)
-			shift+=self.NSIZEW 
-			self.mvu_minst+=(int(inst.mvu_mrf_rd_base) << shift)
-			shift+=self.MRFAW
-			self.mvu_minst+=(int(inst.mvu_vrf_rd_sz) <<shift)
-			shift+=self.NSIZEW 
-			self.mvu_minst =(int(inst.mvu_vrf_rd_base[2])<<shift) + self.mvu_minst
-			shift+=self.VRFAW
-			self.mvu_minst =(int(inst.mvu_vrf_rd_base[1])<<shift) + self.mvu_minst
-			shift+=self.VRFAW
-			self.mvu_minst =(int(inst.mvu_vrf_rd_base[0])<<shift) + self.mvu_minst
-			if(self.mvu_minst < 0):
-				digits = len(bin(self.mvu_minst)[2:])
-				self.mvu_minst = self.mvu_minst + (2**digits)
-
-	# This function sets the fields of the eVRF macro-instruction
-	def set_evrf_minst(self, inst):
-		self.evrf_minst=0
-		shift=0
-		if inst.extvrf_op_type!='nop':
-			self.evrf_minst+=(int(inst.batch)<<shift)
-			shift+=2
-			self.evrf_minst+=(0x1<<shift) # MOV
-			shift+=1
-			self.evrf_minst+=(int(inst.extvrf_tag)<<shift)
-			shift+=self.NTAGW
-			if inst.extvrf_op_type=='move':
-				self.evrf_minst+=(0x0<<shift)
-			else:
-				self.evrf_minst+=(0x1<<shift)
-			shift+=1
-			self.evrf_minst+=(int(inst.extvrf_rd_sz)<<shift)
-			shift+=self.NSIZEW 
-			self.evrf_minst+=(int(inst.extvrf_rd_base[2])<<shift)
-			shift+=self.VRFAW
-			self.evrf_minst+=(int(inst.extvrf_rd_base[1])<<shift)
-			shift+=self.VRFAW
-			self.evrf_minst+=(int(inst.extvrf_rd_base[0])<<shift)
-			if(self.evrf_minst < 0):
-				digits = len(bin(self.evrf_minst)[2:])
-				self.evrf_minst = self.evrf_minst + (2**digits)
-
-	# This function sets the fields of the MFU0 macro-instruction
-	def set_mfu0_minst(self, inst):
-		self.mfu0_minst=0
-		shift=0
-		if (inst.mfu0_act_op_type!='nop' and inst.mfu0_add_op_type!='nop' and inst.mfu0_mul_op_type!='nop'):
-			self.mfu0_minst+=(int(inst.batch)<<shift)
-			shift+=2
-			self.mfu0_minst+=(0x40<<shift)
-			# Activation functions set as pass-through (check limitations listed at the top of this file)
-			#if(inst.mfu0_act_op_type=='relu'):
-			#    self.mfu0_minst+=(0x10<<shift)
-			#elif(inst.mfu0_act_op_type=='sig'):
-			#    self.mfu0_minst+=(0x20<<shift)
-			#elif(inst.mfu0_act_op_type=='tanh'):
-			#    self.mfu0_minst+=(0x30<<shift)
-
-			if(inst.mfu0_add_op_type=='add'):
-				self.mfu0_minst+=(0x02<<shift)
-			elif(inst.mfu0_add_op_type=='sub_a_b'):
-				self.mfu0_minst+=(0x04<<shift)
-			elif(inst.mfu0_add_op_type=='sub_b_a'):
-				self.mfu0_minst+=(0x06<<shift)
-			elif(inst.mfu0_add_op_type=='max'):
-				self.mfu0_minst+=(0x08<<shift)
-
-			if(inst.mfu0_mul_op_type=='mul'):
-				self.mfu0_minst+=(0x01<<shift)
-
-			shift+=7
-			self.mfu0_minst+=(int(inst.mfu0_tag)<<shift)
-			shift+=self.NTAGW 
-			self.mfu0_minst+=(int(inst.mfu0_vrf_rd_size)<<shift)
-			shift+=self.NSIZEW 
-			self.mfu0_minst+=(int(inst.mfu0_vrf1_rd_base[2])<<shift)
-			shift+=self.VRFAW
-			self.mfu0_minst+=(int(inst.mfu0_vrf1_rd_base[1])<<shift)
-			shift+=self.VRFAW
-			self.mfu0_minst+=(int(inst.mfu0_vrf1_rd_base[0])<<shift)
-			shift+=self.VRFAW
-			self.mfu0_minst+=(int(inst.mfu0_vrf0_rd_base[2])<<shift)
-			shift+=self.VRFAW
-			self.mfu0_minst+=(int(inst.mfu0_vrf0_rd_base[1])<<shift)
-			shift+=self.VRFAW
-			self.mfu0_minst+=(int(inst.mfu0_vrf0_rd_base[0])<<shift)
-
-	# This function sets the fields of the MFU1 macro-instruction
-	def set_mfu1_minst(self, inst):
-		self.mfu1_minst=0
-		shift=0
-		if (inst.mfu1_act_op_type!='nop' and inst.mfu1_add_op_type!='nop' and inst.mfu1_mul_op_type!='nop'):
-			self.mfu1_minst+=(int(inst.batch)<<shift)
-			shift+=2
-			self.mfu1_minst+=(0x40<<shift)
+	'''
+	VLIW instruction layout. Every field is (unit, name, offset, width), where the offset is the position of its
+	least significant bit in the instruction word. The units are packed from the least significant bit in the order
+	loader, MFU1, MFU0, eVRF, MVU and the fields of each unit from its least significant bit. A field whose unit is
+	not active in a chain (NOP) is left as zeros.
+	'''
+	def set_inst_layout(self):
+		units = [
+			('ld', [('write_to_obuf', 1), ('last_flag', 1), ('batch', 2), ('one', 1), ('ld_wb', 1), ('vrf_id0_wr_size', self.NSIZEW),
+				('vrf_id1_wr_base2', self.VRFAW), ('vrf_id1_wr_base1', self.VRFAW), ('vrf_id1_wr_base0', self.VRFAW),
+				('vrf_id0_wr_base2', self.VRFAW), ('vrf_id0_wr_base1', self.VRFAW), ('vrf_id0_wr_base0', self.VRFAW),
+				('ld_dst', 2*self.NVRF)]),
+			('mfu1', [('batch', 2), ('mfu1_op', 7), ('mfu1_tag', self.NTAGW), ('mfu1_vrf_rd_size', self.NSIZEW),
+				('mfu1_vrf1_rd_base2', self.VRFAW), ('mfu1_vrf1_rd_base1', self.VRFAW), ('mfu1_vrf1_rd_base0', self.VRFAW),
+				('mfu1_vrf0_rd_base2', self.VRFAW), ('mfu1_vrf0_rd_base1', self.VRFAW), ('mfu1_vrf0_rd_base0', self.VRFAW)]),
+			('mfu0', [('batch', 2), ('mfu0_op', 7), ('mfu0_tag', self.NTAGW), ('mfu0_vrf_rd_size', self.NSIZEW),
+				('mfu0_vrf1_rd_base2', self.VRFAW), ('mfu0_vrf1_rd_base1', self.VRFAW), ('mfu0_vrf1_rd_base0', self.VRFAW),
+				('mfu0_vrf0_rd_base2', self.VRFAW), ('mfu0_vrf0_rd_base1', self.VRFAW), ('mfu0_vrf0_rd_base0', self.VRFAW)]),
+			('evrf', [('batch', 2), ('one', 1), ('extvrf_tag', self.NTAGW), ('extvrf_read', 1), ('extvrf_rd_sz', self.NSIZEW),
+				('extvrf_rd_base2', self.VRFAW), ('extvrf_rd_base1', self.VRFAW), ('extvrf_rd_base0', self.VRFAW)]),
+			('mvu', [('one', 1), ('mvu_tag', self.NTAGW), ('mvu_words_per_row', self.NSIZEW), ('mvu_mrf_rd_sz', self.NSIZEW),
+				('mvu_mrf_rd_base', self.MRFAW), ('mvu_vrf_rd_sz', self.NSIZEW),
+				('mvu_vrf_rd_base2', self.VRFAW), ('mvu_vrf_rd_base1', self.VRFAW), ('mvu_vrf_rd_base0', self.VRFAW)])
+		]
+		self.inst_layout = []
+		offset = 0
+		for unit, fields in units:
+			for name, width in fields:
+				self.inst_layout.append((unit, name, offset, width))
+				offset += width
+		assert offset == self.MICW, 'Instruction layout does not match the instruction width'
+
+	# This function gets the instruction fields of all chains as integer columns of the instruction table
+	def inst_columns(self, insts):
+		col = lambda attr: insts[attr].astype(np.int64)
+		c = {}
+		for attr in ['batch', 'write_to_obuf', 'last_flag', 'vrf_id0_wr_size', 'vrf_id0', 'vrf_id1',
+				'mfu0_tag', 'mfu0_vrf_rd_size', 'mfu1_tag', 'mfu1_vrf_rd_size', 'extvrf_tag', 'extvrf_rd_sz',
+				'mvu_tag', 'mvu_words_per_row', 'mvu_mrf_rd_sz', 'mvu_mrf_rd_base', 'mvu_vrf_rd_sz']:
+			c[attr] = col(attr)
+		for attr in ['vrf_id0_wr_base', 'vrf_id1_wr_base', 'mfu0_vrf0_rd_base', 'mfu0_vrf1_rd_base',
+				'mfu1_vrf0_rd_base', 'mfu1_vrf1_rd_base', 'extvrf_rd_base', 'mvu_vrf_rd_base']:
+			b = col(attr)
+			for k in range(3):
+				c[attr + str(k)] = b[:, k]
+		c['one'] = np.ones(len(insts), dtype=np.int64)
+
+		# Units are active unless their op is NOP (an MFU is only active if none of its ops is NOP)
+		ld_src = col('ld_src')
+		extvrf_op = col('extvrf_op')
+		c['ld'] = (ld_src != LD_NOP)
+		c['ld_wb'] = ((ld_src == LD_WB) | (ld_src == LD_FLUSH)).astype(np.int64)
+		c['evrf'] = (extvrf_op != EVRF_NOP)
+		c['extvrf_read'] = (extvrf_op != EVRF_MOVE).astype(np.int64)
+		c['mvu'] = (col('mvu_op') != MVU_NOP)
+		add_codes = {MFU_ADD: 0x02, MFU_SUB_A_B: 0x04, MFU_SUB_B_A: 0x06, MFU_MAX: 0x08}
+		for mfu in ['mfu0', 'mfu1']:
+			act_op, add_op, mul_op = col(mfu + '_act_op'), col(mfu + '_add_op'), col(mfu + '_mul_op')
+			c[mfu] = (act_op != MFU_NOP) & (add_op != MFU_NOP) & (mul_op != MFU_NOP)
 			# Activation functions set as pass-through (check limitations listed at the top of this file)
-			#if(inst.mfu1_act_op_type=='relu'):
-			#    self.mfu1_minst+=(0x10<<shift)
-			#elif(inst.mfu1_act_op_type=='sig'):
-			#    self.mfu1_minst+=(0x20<<shift)
-			#elif(inst.mfu1_act_op_type=='tanh'):
-			#    self.mfu1_minst+=(0x30<<shift)
-
-			if(inst.mfu1_add_op_type=='add'):
-				self.mfu1_minst+=(0x02<<shift)
-			elif(inst.mfu1_add_op_type=='sub_a_b'):
-				self.mfu1_minst+=(0x04<<shift)
-			elif(inst.mfu1_add_op_type=='sub_b_a'):
-				self.mfu1_minst+=(0x06<<shift)
-			elif(inst.mfu1_add_op_type=='max'):
-				self.mfu1_minst+=(0x08<<shift)
-
-			if(inst.mfu1_mul_op_type=='mul'):
-				self.mfu1_minst+=(0x01<<shift)
-
-			shift+=7
-			self.mfu1_minst+=(int(inst.mfu1_tag)<<shift)
-			shift+=self.NTAGW 
-			self.mfu1_minst+=(int(inst.mfu1_vrf_rd_size)<<shift)
-			shift+=self.NSIZEW 
-			self.mfu1_minst+=(int(inst.mfu1_vrf1_rd_base[2])<<shift)
-			shift+=self.VRFAW
-			self.mfu1_minst+=(int(inst.mfu1_vrf1_rd_base[1])<<shift)
-			shift+=self.VRFAW
-			self.mfu1_minst+=(int(inst.mfu1_vrf1_rd_base[0])<<shift)
-			shift+=self.VRFAW
-			self.mfu1_minst+=(int(inst.mfu1_vrf0_rd_base[2])<<shift)
-			shift+=self.VRFAW
-			self.mfu1_minst+=(int(inst.mfu1_vrf0_rd_base[1])<<shift)
-			shift+=self.VRFAW
-			self.mfu1_minst+=(int(inst.mfu1_vrf0_rd_base[0])<<shift)
-
-
-	# This function sets the fields of the Loader macro-instruction
-	def set_ld_minst(self, inst):
-		self.ld_minst=0
-		shift=0
-		if inst.loader_src!='nop':
-			self.ld_minst=(int(inst.write_to_obuf)<<shift)
-			shift+=1
-			self.ld_minst+=(int(inst.last_flag)<<shift)
-			shift+=1
-			self.ld_minst+=(int(inst.batch)<<shift)
-			shift+=2
-			self.ld_minst+=(0x1<<shift)
-			shift+=1
-			if inst.loader_src=='wb':
-				self.ld_minst+=(0x1<<shift)
-			elif inst.loader_src=='flush':
-				self.ld_minst+=(0x1<<shift)
-			else:
-				self.ld_minst+=(0x0<<shift)
-			shift+=1 
-			self.ld_minst+=(int(inst.vrf_id0_wr_size)<<shift)
-			shift+=self.NSIZEW 
-			self.ld_minst+=(int(inst.vrf_id1_wr_base[2])<<shift)
-			shift+=self.VRFAW
-			self.ld_minst+=(int(inst.vrf_id1_wr_base[1])<<shift)
-			shift+=self.VRFAW
-			self.ld_minst+=(int(inst.vrf_id1_wr_base[0])<<shift)
-			shift+=self.VRFAW
-			self.ld_minst+=(int(inst.vrf_id0_wr_base[2])<<shift)
-			shift+=self.VRFAW
-			self.ld_minst+=(int(inst.vrf_id0_wr_base[1])<<shift)
-			shift+=self.VRFAW
-			self.ld_minst+=(int(inst.vrf_id0_wr_base[0])<<shift)
-			shift+=self.VRFAW
-			if(inst.vrf_id0_op=='--'):
-				vrf_id=0x0
-			elif(inst.vrf_id0_op[0:3]=='mvu'):
-				vrf_id=inst.vrf_id0_op.split(".")
-				vrf_id=0x1<<(2*int(vrf_id[0][3:]))
-			elif(inst.vrf_id0_op=='extvrf'):
-				vrf_id=0x1<<(2*self.NTILE)
-			elif(inst.vrf_id0_op=='mfu0.vrf0'):
-				vrf_id=0x1<<(2*self.NTILE+2)
-			elif(inst.vrf_id0_op=='mfu0.vrf1'):
-				vrf_id=0x1<<(2*self.NTILE+4)
-			elif(inst.vrf_id0_op=='mfu1.vrf0'):
-				vrf_id=0x1<<(2*self.NTILE+6)
-			elif(inst.vrf_id0_op=='mfu1.vrf1'):
-				vrf_id=0x1<<(2*self.NTILE+8)
-			else:
-				vrf_id=0x0
-			self.ld_minst+=vrf_id<<shift
-
-			if(inst.vrf_id1_op=='--'):
-				vrf_id=0x0
-			elif(inst.vrf_id1_op[0:3]=='mvu'):
-				vrf_id=inst.vrf_id1_op.split(".")
-				vrf_id=0x3<<(2*int(vrf_id[0][3:]))
-			elif(inst.vrf_id1_op=='extvrf'):
-				vrf_id=0x3<<(2*self.NTILE)
-			elif(inst.vrf_id1_op=='mfu0.vrf0'):
-				vrf_id=0x3<<(2*self.NTILE+2)
-			elif(inst.vrf_id1_op=='mfu0.vrf1'):
-				vrf_id=0x3<<(2*self.NTILE+4)
-			elif(inst.vrf_id1_op=='mfu1.vrf0'): 
-				vrf_id=0x3<<(2*self.NTILE+6)
-			elif(inst.vrf_id1_op=='mfu1.vrf1'):
-				vrf_id=0x3<<(2*self.NTILE+8)
-			else:
-				vrf_id=0x0
-			self.ld_minst+=vrf_id<<shift
+			op = np.full(len(insts), 0x40, dtype=np.int64)
+			for code, bits in add_codes.items():
+				op += np.where(add_op == code, bits, 0)
+			op += np.where(mul_op == MFU_MUL, 0x01, 0)
+			c[mfu + '_op'] = op
+		return c
+
+	'''
+	This function encodes the rows of an instruction table (inst_table.data() or a snapshot) into VLIW instructions.
+	It returns an (instructions x ceil(MICW/8)) uint8 array in which byte j of an instruction holds its bits 8j to
+	8j+7. All fields of all instructions are inserted at once, one field at a time. set_inst_params() must have
+	been called.
+	'''
+	def encode_program(self, insts):
+		num_inst = len(insts)
+		inst_byte_width = int(math.ceil(self.MICW * 1.0 / 8.0))
+		if(num_inst == 0):
+			return np.zeros((0, inst_byte_width), dtype=np.uint8)
+		bits = np.zeros((num_inst, inst_byte_width*8), dtype=np.uint8)
+		c = self.inst_columns(insts)
+		for unit, name, offset, width in self.inst_layout:
+			active = c[unit]
+			if(name == 'ld_dst'):
+				# One-hot (dst0) / two-hot (dst1) destination select, two bits per VRF
+				rows = np.nonzero(active & (c['vrf_id0'] != VRF_NONE))[0]
+				bits[rows, offset + 2*c['vrf_id0'][rows]] = 1
+				rows1 = np.nonzero(active & (c['vrf_id1'] != VRF_NONE))[0]
+				assert not np.any(bits[rows1, offset + 2*c['vrf_id1'][rows1]]), 'A chain writes back twice to the same VRF'
+				bits[rows1, offset + 2*c['vrf_id1'][rows1]] = 1
+				bits[rows1, offset + 2*c['vrf_id1'][rows1] + 1] = 1
+				continue
+			# Unlike the old per-chain encoder, which wrapped a negative macro-instruction into the bits above it,
+			# a field that is negative or too wide for its slot is an error
+			value = np.where(active, c[name], 0)
+			assert np.all((value >= 0) & (value < (1 << width))), 'Instruction field ' + name + ' does not fit in ' + str(width) + ' bits'
+			bits[:, offset:offset+width] = (value[:, None] >> np.arange(width)) & 1
+		return np.packbits(bits, axis=1, bitorder='little')
+
+	# Binary digits (most significant bit first) of the lowest width bits of encoded instructions, one row of characters
+	# per instruction
+	def inst_bit_chars(self, words, width):
+		bits = np.unpackbits(words, axis=1, bitorder='little')[:, width-1::-1]
+		return (bits + ord('0')).astype(np.uint8)
 
 	'''
 	This function is used for allocating memory for vectors and matrices depending on the dimensions
@@ -430,14 +314,64 @@ class npu:
 			allocated_mem = matrix(name, dimension_x, dimension_y, space_name, tiles, dpes, lanes, self.in_data_type, values)
 			allocated_mem.alloc_addr = self.alloc_space(space_name, allocated_mem.word_count)
 			assert allocated_mem.alloc_addr != -1, 'Cannot allocate matrix ' + name
-			tile_cols = allocated_mem.dimension_x_padded / tiles
-			tile_rows = allocated_mem.dimension_y_padded / dpes
-			for y in range(allocated_mem.dimension_y_padded):
-				for x in range(allocated_mem.dimension_x_padded):
-					self.mrfs[int(x / tile_cols)][int(y % dpes)][allocated_mem.alloc_addr + int((x % tile_cols) / lanes) + (int(y / dpes) * int(tile_cols/lanes))][int(x % lanes)] = allocated_mem.data[y][x]
+			self.place_matrix(allocated_mem)
 
 		return allocated_mem
 
+	'''
+	MRF layout of a matrix: element (y, x) goes to tile x / tile_cols, DPE y % dpes, lane x % lanes, at address
+	alloc_addr + (y / dpes) * tile_words + (x % tile_cols) / lanes, where tile_cols = dimension_x_padded / tiles
+	and tile_words = tile_cols / lanes. This function returns the (tile, dpe, address, lane) index arrays of
+	all the elements of the padded matrix.
+	'''
+	def mrf_index(self, mtx):
+		tiles = self.arch_params['tiles']
+		dpes  = self.arch_params['dpes']
+		lanes = self.arch_params['lanes']
+		tile_cols = mtx.dimension_x_padded // tiles
+		y = np.arange(mtx.dimension_y_padded)[:, None]
+		x = np.arange(mtx.dimension_x_padded)[None, :]
+		addr = mtx.alloc_addr + ((x % tile_cols) // lanes) + ((y // dpes) * (tile_cols // lanes))
+		return (x // tile_cols, y % dpes, addr, x % lanes)
+
+	# View of the padded matrix as (steps, dpes, tiles, tile_words, lanes), or None if its rows are not a multiple of dpes
+	def mrf_blocks(self, mtx, data):
+		tiles = self.arch_params['tiles']
+		dpes  = self.arch_params['dpes']
+		lanes = self.arch_params['lanes']
+		if (mtx.dimension_y_padded % dpes != 0):
+			return None
+		return data.reshape(mtx.dimension_y_padded // dpes, dpes, tiles, mtx.dimension_x_padded // tiles // lanes, lanes)
+
+	# This function scatters the padded matrix data into the MRFs (the inverse of gather_matrix).
+	def place_matrix(self, mtx):
+		blocks = self.mrf_blocks(mtx, mtx.data)
+		if (blocks is None):
+			self.mrfs[self.mrf_index(mtx)] = mtx.data
+			return
+		# (steps, dpes, tiles, words, lanes) -> (tiles, dpes, steps * words, lanes)
+		blocks = blocks.transpose(2, 1, 0, 3, 4)
+		num_words = blocks.shape[2] * blocks.shape[3]
+		self.mrfs[:, :, mtx.alloc_addr:mtx.alloc_addr + num_words, :] = blocks.reshape(blocks.shape[0], blocks.shape[1], num_words, blocks.shape[4])
+
+	# This function rebuilds the padded matrix from the MRF contents, e.g. to check the MRF image of a matrix.
+	def gather_matrix(self, mtx):
+		blocks = self.mrf_blocks(mtx, mtx.data)
+		if (blocks is None):
+			return self.mrfs[self.mrf_index(mtx)]
+		num_steps, dpes, tiles, words, lanes = blocks.shape
+		blocks = self.mrfs[:, :, mtx.alloc_addr:mtx.alloc_addr + (num_steps * words), :]
+		blocks = blocks.reshape(tiles, dpes, num_steps, words, lanes).transpose(2, 1, 0, 3, 4)
+		return blocks.reshape(mtx.dimension_y_padded, mtx.dimension_x_padded)
+
+	'''
+	This function releases the memory of a vector or matrix allocated by malloc. The freed words can be
+	reused by later allocations, so it must only be called once no later instruction reads the vector.
+	'''
+	def free(self, allocated_mem):
+		if (allocated_mem.space_name != 'temp'):
+			self.free_space(allocated_mem.space_name, allocated_mem.alloc_addr)
+
 	'''
 	This function performs matrix-vector multiplication. Returns a vector data structure.
 	vector_in: input vector that resides in the mvu_vrf memory space.
@@ -445,7 +379,7 @@ class npu:
 	'''
 	def matvec_mult(self, vectors, matrix, batch=1):
 		#Assertions to catch illegal inst order or invalid inputs
-		assert self.inst_q, 'An NPU program should start with a load operation'
+		assert self.inst_table, 'An NPU program should start with a load operation'
 		for i in range(batch):
 			assert vectors[i].space_name == 'mvu_vrf', 'Vector ' + vectors[i].name + ' does not exist in the mvu_vrf memory space'
 		tiles = self.arch_params['tiles']
@@ -455,10 +389,8 @@ class npu:
 		#Create a new instruction chain
 		tmp = []
 		for i in range(batch):
-			tmp.append(vector('tmp_' + str(len(self.inst_q)) + '_0', matrix.dimension_y, 'temp', tiles, dpes, lanes, self.in_data_type, self.ac_data_type))
-		inst = chain(batch)
-		tag = 0
-		wb_count = self.inst_q[-1].wb_so_far
+			tmp.append(vector('tmp_' + str(len(self.inst_table)) + '_0', matrix.dimension_y, 'temp', tiles, dpes, lanes, self.in_data_type, self.ac_data_type))
+		wb_count = self.wb_so_far[-1]
 
 		#Get names of all input vectors to search for them in previous instructions
 		names = []
@@ -466,39 +398,35 @@ class npu:
 			names.append(vectors[i].name)
 
 		#Calculate the tag for this matvec operation based on the most recently committed vector
-		for i in reversed(self.inst_q):
-			if(i.results[-1] in names):
-				tag = i.wb_so_far
-				break
+		tag = self.find_tag(names)
 		if (tag > self.highest_tag_so_far):
 			self.highest_tag_so_far = tag
 
 		#Fill in the MVU mOP fields
+		inst = self.new_chain(batch, wb_count)
 		inst.mvu_mrf_rd_base = matrix.alloc_addr
 		inst.mvu_mrf_rd_sz = matrix.word_count
 		for i in range(batch):
-			inst.mvu_vrf_rd_base[i] = vectors[i].alloc_addr
+			self.set_vrf_addr('mvu_vrf_rd_base', i, vectors[i])
 		inst.mvu_vrf_rd_sz = vectors[0].word_count
-		inst.mvu_words_per_row = int(inst.mvu_mrf_rd_sz/inst.mvu_vrf_rd_sz)
-		inst.mvu_op_type = 'matvec'
+		inst.mvu_words_per_row = int(matrix.word_count/vectors[0].word_count)
+		inst.mvu_op = MVU_MATVEC
 		inst.mvu_tag = tag
 
 		#Set the eVRF mOP to move 
 		evrf_word_count = int(tmp[0].word_count) #int(math.ceil(1.0 * matrix.dimension_y / dpes)) * dpes / lanes 
 		inst.extvrf_rd_sz = evrf_word_count
-		inst.extvrf_rd_base = [0] * batch
-		inst.extvrf_op_type = 'move'
+		inst.extvrf_op = EVRF_MOVE
 		inst.extvrf_tag = tag
 
-		#Adjust WB count, flags and results of the chain and add it to instruction queue
-		inst.wb_so_far = wb_count
-		inst.flags[0] = True
-		inst.results[0] = tmp[0].name
-		self.inst_q.append(inst)
+		#Adjust flags and results of the chain
+		self.chain_flags[0] = True
+		self.chain_results[0] = tmp[0].name
 
-		#Functional model
+		#Functional model (all vectors of the batch in one GEMM)
+		result = int_gemm(matrix.data, np.stack([vectors[i].data for i in range(batch)], axis=1))
 		for i in range(batch):
-			tmp[i].data = np.dot(matrix.data.astype(self.ac_data_type), vectors[i].data.astype(self.ac_data_type))
+			tmp[i].data = result[:, i]
 			tmp[i].useful_data = tmp[i].data[:tmp[i].dimension_x]
 		return tmp
 
@@ -507,38 +435,32 @@ class npu:
 	vector_in: vector to be read from the evrf memory space.
 	'''
 	def read_evrf(self, vectors, batch=1):
-		assert self.inst_q, 'An NPU program should start with a load operation'
+		assert self.inst_table, 'An NPU program should start with a load operation'
 		for b in range(batch):
 			assert vectors[b].space_name == 'evrf', 'Vector ' + vectors[b].name + ' does not exist in the evrf memory space'
 		tiles = self.arch_params['tiles']
 		dpes  = self.arch_params['dpes']
 		lanes = self.arch_params['lanes']
 
-		inst = chain(batch)
-		tag = 0
-		wb_count = self.inst_q[-1].wb_so_far
+		wb_count = self.wb_so_far[-1]
 		names = []
 		for i in range(batch):
 			names.append(vectors[i].name)
 
-		for i in reversed(self.inst_q):
-			if(i.results[-1] in names):
-				tag = i.wb_so_far
-				break
+		tag = self.find_tag(names)
 		if (tag > self.highest_tag_so_far):
 			self.highest_tag_so_far = tag
 		
+		inst = self.new_chain(batch, wb_count)
 		tmp = []
 		for b in range(batch):
 			tmp.append(vector('tmp_1', vectors[b].dimension_x, 'temp', tiles, dpes, lanes, self.in_data_type, self.ac_data_type))
-			inst.extvrf_rd_base[b] = vectors[b].alloc_addr
+			self.set_vrf_addr('extvrf_rd_base', b, vectors[b])
 		inst.extvrf_rd_sz = vectors[0].word_count
-		inst.extvrf_op_type = 'extvrf'
+		inst.extvrf_op = EVRF_READ
 		inst.extvrf_tag = tag
-		inst.wb_so_far= wb_count
-		inst.flags[0] = True
-		inst.results[0] = tmp[0].name
-		self.inst_q.append(inst)
+		self.chain_flags[0] = True
+		self.chain_results[0] = tmp[0].name
 
 		#Functional model
 		for b in range(batch):
@@ -575,25 +497,25 @@ class npu:
 	def activation(self, vectors, op, batch):
 		for b in range(batch):
 			assert vectors[b].alloc_addr == -1, 'Input vector is not a temp variable'
-		assert self.inst_q, 'Cannot start a chain with a ' + op + ' function'
+		assert self.inst_table, 'Cannot start a chain with a ' + op + ' function'
 		tiles = self.arch_params['tiles']
 		dpes  = self.arch_params['dpes']
 		lanes = self.arch_params['lanes']
-		prev_inst = self.inst_q[-1]
+		prev_inst = self.inst_table.row(-1)
 		input_vec_name = ''
 
 		# If possible to schedule at MFU0
-		if(prev_inst.flags[0] == True and prev_inst.flags[1] == False):
-			input_vec_name = prev_inst.results[0]
+		if(self.chain_flags[0] == True and self.chain_flags[1] == False):
+			input_vec_name = self.chain_results[0]
 			assert vectors[0].name == input_vec_name, 'Invalid input to ' + op + ' function'
-			prev_inst.mfu0_act_op_type = op
+			prev_inst.mfu0_act_op = mfu_op_codes[op]
 			prev_inst.mfu0_tag = 0
-			prev_inst.flags[1] = True
+			self.chain_flags[1] = True
 			tmp = []
 			for b in range(batch):
-				tmp.append(vector('tmp_' + str(len(self.inst_q)) + '_1', vectors[b].dimension_x, 'temp', tiles, dpes, lanes, self.in_data_type, self.ac_data_type))
+				tmp.append(vector('tmp_' + str(len(self.inst_table)) + '_1', vectors[b].dimension_x, 'temp', tiles, dpes, lanes, self.in_data_type, self.ac_data_type))
 			prev_inst.mfu0_vrf_rd_size = tmp[0].word_count
-			prev_inst.results[1] = tmp[0].name
+			self.chain_results[1] = tmp[0].name
 
 			#Functional Model
 			# The functional model treats activation functions as if they are bypassed since those
@@ -605,21 +527,21 @@ class npu:
 			return tmp
 
 		# If possible to schedule at MFU1
-		elif(prev_inst.flags[0] == True and prev_inst.flags[4] == False):
+		elif(self.chain_flags[0] == True and self.chain_flags[4] == False):
 			for i in range(4, -1, -1):
-				if prev_inst.results[i] != '':
-					input_vec_name = prev_inst.results[i]
+				if self.chain_results[i] != '':
+					input_vec_name = self.chain_results[i]
 					break
 			assert vectors[0].name == input_vec_name, 'Invalid input to ' + op + ' function'
-			prev_inst.mfu1_act_op_type = op
+			prev_inst.mfu1_act_op = mfu_op_codes[op]
 			prev_inst.mfu1_tag = 0
 			for i in range(4, 1, -1):
-				prev_inst.flags[i] = True
+				self.chain_flags[i] = True
 			tmp = []
 			for b in range(batch):
-				tmp.append(vector('tmp_' + str(len(self.inst_q)) + '_4', vectors[b].dimension_x, 'temp', tiles, dpes, lanes, self.in_data_type, self.ac_data_type))
+				tmp.append(vector('tmp_' + str(len(self.inst_table)) + '_4', vectors[b].dimension_x, 'temp', tiles, dpes, lanes, self.in_data_type, self.ac_data_type))
 			prev_inst.mfu1_vrf_rd_size = tmp[0].word_count
-			prev_inst.results[4] = tmp[0].name
+			self.chain_results[4] = tmp[0].name
 
 			#Functional Model
 			# The functional model treats activation functions as if they are bypassed since those
@@ -690,14 +612,10 @@ class npu:
 		names = []
 		for b in range(batch):
 			names.append(vrf_vectors[b].name)
-		tag = 0
-		for i in reversed(self.inst_q):
-			if(i.results[-1] in names):
-				tag = i.wb_so_far
-				break
+		tag = self.find_tag(names)
 		if (tag > self.highest_tag_so_far):
 			self.highest_tag_so_far = tag
-		prev_inst = self.inst_q[-1]
+		prev_inst = self.inst_table.row(-1)
 		input_vec_name = ''
 
 		# Make sure that all VRF vectors reside in the same memory space
@@ -708,21 +626,21 @@ class npu:
 		assert all_vrf_vectors_in_same_space, 'Not all the VRF vectors belong to the same memory space'
 
 		# If possible to schedule at MFU0
-		if(prev_inst.flags[0] == True and prev_inst.flags[2] == False and vrf_vectors[0].space_name == 'mfu0_add'):
+		if(self.chain_flags[0] == True and self.chain_flags[2] == False and vrf_vectors[0].space_name == 'mfu0_add'):
 			for i in range(2, -1, -1):
-				if prev_inst.results[i] != '':
-					input_vec_name = prev_inst.results[i]
+				if self.chain_results[i] != '':
+					input_vec_name = self.chain_results[i]
 					break
 			assert temp_vectors[0].name == input_vec_name, 'Invalid input to ' + op_name + ' function'
 
-			prev_inst.mfu0_add_op_type = op_name
+			prev_inst.mfu0_add_op = mfu_op_codes[op_name]
 			for i in range(2, 0, -1):
-				prev_inst.flags[i] = True
+				self.chain_flags[i] = True
 			tmp = []
 			for b in range(batch):
-				tmp.append(vector('tmp_' + str(len(self.inst_q)) + '_2', vrf_vectors[b].dimension_x, 'temp', tiles, dpes, lanes, self.in_data_type, self.ac_data_type))
-				prev_inst.mfu0_vrf0_rd_base[b] = vrf_vectors[b].alloc_addr
-			prev_inst.results[2] 		= tmp[0].name
+				tmp.append(vector('tmp_' + str(len(self.inst_table)) + '_2', vrf_vectors[b].dimension_x, 'temp', tiles, dpes, lanes, self.in_data_type, self.ac_data_type))
+				self.set_vrf_addr('mfu0_vrf0_rd_base', b, vrf_vectors[b])
+			self.chain_results[2] 		= tmp[0].name
 			prev_inst.mfu0_vrf_rd_size 	= vrf_vectors[0].word_count
 			prev_inst.mfu0_tag 			= tag
 
@@ -742,21 +660,21 @@ class npu:
 			return tmp
 
 		# If possible to schedule at MFU1
-		elif(prev_inst.flags[0] == True and prev_inst.flags[5] == False and vrf_vectors[0].space_name == 'mfu1_add'):
+		elif(self.chain_flags[0] == True and self.chain_flags[5] == False and vrf_vectors[0].space_name == 'mfu1_add'):
 			for i in range(5, -1, -1):
-				if prev_inst.results[i] != '':
-					input_vec_name = prev_inst.results[i]
+				if self.chain_results[i] != '':
+					input_vec_name = self.chain_results[i]
 					break
 			assert temp_vectors[0].name == input_vec_name, 'Invalid input to ' + op_name + ' function'
 
-			prev_inst.mfu1_add_op_type = op_name
+			prev_inst.mfu1_add_op = mfu_op_codes[op_name]
 			for i in range(5, 3, -1):
-				prev_inst.flags[i] = True
+				self.chain_flags[i] = True
 			tmp = []
 			for b in range(batch):
-				tmp.append(vector('tmp_' + str(len(self.inst_q)) + '_5', vrf_vectors[b].dimension_x, 'temp', tiles, dpes, lanes, self.in_data_type, self.ac_data_type))
-				prev_inst.mfu1_vrf0_rd_base[b] = vrf_vectors[b].alloc_addr
-			prev_inst.results[5] 		= tmp[0].name
+				tmp.append(vector('tmp_' + str(len(self.inst_table)) + '_5', vrf_vectors[b].dimension_x, 'temp', tiles, dpes, lanes, self.in_data_type, self.ac_data_type))
+				self.set_vrf_addr('mfu1_vrf0_rd_base', b, vrf_vectors[b])
+			self.chain_results[5] 		= tmp[0].name
 			prev_inst.mfu1_vrf_rd_size 	= vrf_vectors[0].word_count
 			prev_inst.mfu1_tag 			= tag
 
@@ -795,14 +713,10 @@ class npu:
 		names = []
 		for b in range(batch):
 			names.append(vrf_vectors[b].name)
-		tag = 0
-		for i in reversed(self.inst_q):
-			if(i.results[-1] in names):
-				tag = i.wb_so_far
-				break
+		tag = self.find_tag(names)
 		if (tag > self.highest_tag_so_far):
 			self.highest_tag_so_far = tag
-		prev_inst = self.inst_q[-1]
+		prev_inst = self.inst_table.row(-1)
 		input_vec_name = ''
 
 		# Make sure that all VRF vectors reside in the same memory space
@@ -813,21 +727,21 @@ class npu:
 		assert all_vrf_vectors_in_same_space, 'Not all the VRF vectors belong to the same memory space'
 
 		# If possible to schedule at MFU0
-		if(prev_inst.flags[0] == True and prev_inst.flags[3] == False and vrf_vectors[0].space_name == 'mfu0_mul'):
+		if(self.chain_flags[0] == True and self.chain_flags[3] == False and vrf_vectors[0].space_name == 'mfu0_mul'):
 			for i in range(3, -1, -1):
-				if prev_inst.results[i] != '':
-					input_vec_name = prev_inst.results[i]
+				if self.chain_results[i] != '':
+					input_vec_name = self.chain_results[i]
 					break
 			assert temp_vectors[0].name == input_vec_name, 'Invalid input to multiply function ' + temp_vectors[0].name + ' != ' + input_vec_name
 
-			prev_inst.mfu0_mul_op_type = 'mul'
+			prev_inst.mfu0_mul_op = MFU_MUL
 			for i in range(3, 0, -1):
-				prev_inst.flags[i] = True
+				self.chain_flags[i] = True
 			tmp = []
 			for b in range(batch):
-				tmp.append(vector('tmp_' + str(len(self.inst_q)) + '_3', vrf_vectors[b].dimension_x, 'temp', tiles, dpes, lanes, self.in_data_type, self.ac_data_type))
-				prev_inst.mfu0_vrf1_rd_base[b] = vrf_vectors[b].alloc_addr
-			prev_inst.results[3] 		= tmp[0].name	
+				tmp.append(vector('tmp_' + str(len(self.inst_table)) + '_3', vrf_vectors[b].dimension_x, 'temp', tiles, dpes, lanes, self.in_data_type, self.ac_data_type))
+				self.set_vrf_addr('mfu0_vrf1_rd_base', b, vrf_vectors[b])
+			self.chain_results[3] 		= tmp[0].name	
 			prev_inst.mfu0_vrf_rd_size 	= vrf_vectors[0].word_count
 			prev_inst.mfu0_tag 			= tag
 
@@ -838,21 +752,21 @@ class npu:
 			return tmp
 
 		# If possible to schedule at MFU1
-		elif(prev_inst.flags[0] == True and prev_inst.flags[6] == False and vrf_vectors[0].space_name == 'mfu1_mul'):
+		elif(self.chain_flags[0] == True and self.chain_flags[6] == False and vrf_vectors[0].space_name == 'mfu1_mul'):
 			for i in range(6, -1, -1):
-				if prev_inst.results[i] != '':
-					input_vec_name = prev_inst.results[i]
+				if self.chain_results[i] != '':
+					input_vec_name = self.chain_results[i]
 					break
 			assert temp_vectors[0].name == input_vec_name, 'Invalid input to multiply function'
 
-			prev_inst.mfu1_mul_op_type = 'mul'
+			prev_inst.mfu1_mul_op = MFU_MUL
 			for i in range(6, 3, -1):
-				prev_inst.flags[i] = True
+				self.chain_flags[i] = True
 			tmp = []
 			for b in range(batch):
-				tmp.append(vector('tmp_' + str(len(self.inst_q)) + '_6', vrf_vectors[b].dimension_x, 'temp', tiles, dpes, lanes, self.in_data_type, self.ac_data_type))
-				prev_inst.mfu1_vrf1_rd_base[b] = vrf_vectors[b].alloc_addr
-			prev_inst.results[6] = tmp[0].name
+				tmp.append(vector('tmp_' + str(len(self.inst_table)) + '_6', vrf_vectors[b].dimension_x, 'temp', tiles, dpes, lanes, self.in_data_type, self.ac_data_type))
+				self.set_vrf_addr('mfu1_vrf1_rd_base', b, vrf_vectors[b])
+			self.chain_results[6] = tmp[0].name
 			prev_inst.mfu1_vrf_rd_size 	= vrf_vectors[0].word_count
 			prev_inst.mfu1_tag 			= tag
 
@@ -873,9 +787,8 @@ class npu:
 	def wb_to_vrfs(self, dst1, dst2, write_to_obuf, batch=1):
 		# Assign the vrf_id based on the destination memory space
 		tiles = self.arch_params['tiles']
-		prev_inst = self.inst_q[-1]
-		wb_count = self.inst_q[-1].wb_so_far
-		prev_inst.wb_so_far = wb_count + 1
+		prev_inst = self.inst_table.row(-1)
+		self.wb_so_far[-1] += 1
 
 		# Make sure that all dst1 vectors belong to the same memory space
 		space_name = dst1[0].space_name
@@ -885,23 +798,15 @@ class npu:
 		assert all_dst1_vectors_in_same_space, 'Not all dst1 vectors belong to the same memory space'
 
 		# Write load instruction fields
-		if (dst1[0].space_name == 'evrf'):
-			prev_inst.vrf_id0_op = 'extvrf'
-		elif (dst1[0].space_name == 'mfu0_add'):
-			prev_inst.vrf_id0_op = 'mfu0.vrf0'
-		elif (dst1[0].space_name == 'mfu0_mul'):
-			prev_inst.vrf_id0_op = 'mfu0.vrf1'
-		elif (dst1[0].space_name == 'mfu1_add'):
-			prev_inst.vrf_id0_op = 'mfu1.vrf0'
-		elif (dst1[0].space_name == 'mfu1_mul'):
-			prev_inst.vrf_id0_op = 'mfu1.vrf1'
+		prev_inst.vrf_id0 = self.vrf_id(dst1[0].space_name)
 		for b in range(batch):
-			prev_inst.vrf_id0_wr_base[b] = dst1[b].alloc_addr
+			self.set_vrf_addr('vrf_id0_wr_base', b, dst1[b])
 		prev_inst.vrf_id0_wr_size = dst1[0].word_count
 		prev_inst.vrf_id1_wr_size = 0
 		prev_inst.write_to_obuf = write_to_obuf
-		prev_inst.loader_src = 'wb'
-		prev_inst.results[-1] = dst1[0].name
+		prev_inst.ld_src = LD_WB
+		self.wb_names[-1] = dst1[0].name
+		self.record_writer(len(self.inst_table) - 1)
 
 		# Do the same for second destination if exists
 		if (dst2 != None):
@@ -911,23 +816,14 @@ class npu:
 			for b in range(1, batch):
 				all_dst2_vectors_in_same_space = all_dst2_vectors_in_same_space and (dst2[b].space_name == space_name)
 			assert all_dst2_vectors_in_same_space, 'Not all dst2 vectors belong to the same memory space'
-			if (dst2[0].space_name == 'evrf'):
-				prev_inst.vrf_id1_op = 'extvrf'
-			elif (dst2[0].space_name == 'mfu0_add'):
-				prev_inst.vrf_id1_op = 'mfu0.vrf0'
-			elif (dst2[0].space_name == 'mfu0_mul'):
-				prev_inst.vrf_id1_op = 'mfu0.vrf1'
-			elif (dst2[0].space_name == 'mfu1_add'):
-				prev_inst.vrf_id1_op = 'mfu1.vrf0'
-			elif (dst2[0].space_name == 'mfu1_mul'):
-				prev_inst.vrf_id1_op = 'mfu1.vrf1'
+			prev_inst.vrf_id1 = self.vrf_id(dst2[0].space_name)
 			for b in range(batch):
-				prev_inst.vrf_id1_wr_base[b] = dst2[b].alloc_addr
+				self.set_vrf_addr('vrf_id1_wr_base', b, dst2[b])
 			prev_inst.vrf_id1_wr_size = dst2[0].word_count
 
 		# Set flags of all stages to be used 
 		for i in range(7, -1, -1):
-			prev_inst.flags[i] = True
+			self.chain_flags[i] = True
 
 	'''
 	This function is backend function for writing back a result to MVU VRFs. The write_to_obuf flag 
@@ -936,25 +832,24 @@ class npu:
 	def wb_to_mvu(self, dst, write_to_obuf, batch=1):
 		# In case of mvu write back we write a new instruction for each tile
 		tiles = self.arch_params['tiles']	
-		wb_count = self.inst_q[-1].wb_so_far
-		prev_inst = self.inst_q[-1]
+		wb_count = self.wb_so_far[-1]
+		prev_inst = self.inst_table.row(-1)
 		remaining_entries = prev_inst.mfu1_vrf_rd_size
 		for i in range(tiles):
 			if(remaining_entries > 0):
-				inst = chain(batch);
-				inst.results[-1] = dst[0].name
 				wb_count = wb_count + 1
-				inst.wb_so_far = wb_count
-				inst.vrf_id0_op = 'mvu'+str(i)+'.vrf'
+				inst = self.new_chain(batch, wb_count)
+				self.wb_names[-1] = dst[0].name
+				inst.vrf_id0 = i
 				for b in range(batch):
-					inst.vrf_id0_wr_base[b] 	= dst[b].alloc_addr
+					self.set_vrf_addr('vrf_id0_wr_base', b, dst[b])
 				inst.vrf_id0_wr_size = min(dst[0].word_count, remaining_entries)
 				inst.vrf_id1_wr_size = 0
 				inst.write_to_obuf = write_to_obuf
-				inst.loader_src = 'wb'
+				inst.ld_src = LD_WB
 				for i in range(7, -1, -1):
-					inst.flags[i] = True
-				self.inst_q.append(inst)
+					self.chain_flags[i] = True
+				self.record_writer(len(self.inst_table) - 1)
 				remaining_entries -= dst[0].word_count
 
 	'''
@@ -974,39 +869,28 @@ class npu:
 			all_dst2_vectors_in_same_space = all_dst2_vectors_in_same_space and (dst2[b].space_name == space_name)
 		assert all_dst2_vectors_in_same_space, 'Not all dst2 vectors belong to the same memory space'
 
-		if (dst2[0].space_name == 'evrf'):
-			temp_vrf_id1_op = 'extvrf'
-		elif (dst2[0].space_name == 'mfu0_add'):
-			temp_vrf_id1_op = 'mfu0.vrf0'
-		elif (dst2[0].space_name == 'mfu0_mul'):
-			temp_vrf_id1_op = 'mfu0.vrf1'
-		elif (dst2[0].space_name == 'mfu1_add'):
-			temp_vrf_id1_op = 'mfu1.vrf0'
-		elif (dst2[0].space_name == 'mfu1_mul'):
-			temp_vrf_id1_op = 'mfu1.vrf1'
-
-		wb_count = self.inst_q[-1].wb_so_far
-		prev_inst = self.inst_q[-1]
+		temp_vrf_id1 = self.vrf_id(dst2[0].space_name)
+
+		wb_count = self.wb_so_far[-1]
+		prev_inst = self.inst_table.row(-1)
 		remaining_entries = prev_inst.mfu1_vrf_rd_size
 		for i in range(tiles):
 			if(remaining_entries > 0):
-				inst = chain(batch);
-				inst.results[-1] = dst1[0].name
 				wb_count = wb_count + 1
-				inst.wb_so_far = wb_count
-				inst.vrf_id0_op 	 = 'mvu'+str(i)+'.vrf'
-				inst.vrf_id1_op 	 = temp_vrf_id1_op
+				inst = self.new_chain(batch, wb_count)
+				self.wb_names[-1] = dst1[0].name
+				inst.vrf_id0 	 = i
+				inst.vrf_id1 	 = temp_vrf_id1
 				for b in range(batch):
-					inst.vrf_id0_wr_base[b] = dst1[b].alloc_addr
-					inst.vrf_id1_wr_base[b] = dst2[b].alloc_addr + (i * dst1[b].word_count)
+					self.set_vrf_addr('vrf_id0_wr_base', b, dst1[b])
+					self.set_vrf_addr('vrf_id1_wr_base', b, dst2[b], i * dst1[b].word_count)
 				inst.vrf_id0_wr_size = min(dst1[0].word_count, remaining_entries)
 				inst.vrf_id1_wr_size = min(dst1[0].word_count, remaining_entries)
-				inst.loader_src 	 = 'wb'
+				inst.ld_src 	 = LD_WB
 				inst.write_to_obuf = write_to_obuf
-				inst.results[-1] = dst1[0].name
 				for i in range(7, -1, -1):
-					inst.flags[i] = True
-				self.inst_q.append(inst)
+					self.chain_flags[i] = True
+				self.record_writer(len(self.inst_table) - 1)
 				remaining_entries -= dst1[0].word_count
 
 	'''
@@ -1018,11 +902,11 @@ class npu:
 	'''
 	def write_back(self, vectors, dst1, dst2=None, write_to_obuf=0, batch=1):
 		# Make sure that this is not the first instruction and that the write back is not the start of a new instruction
-		assert self.inst_q, 'Cannot start a new chain with a write back'
-		prev_inst = self.inst_q[-1]
-		assert prev_inst.flags[-1] == False, 'Cannot start a new instruction with a write back'
+		assert self.inst_table, 'Cannot start a new chain with a write back'
+		prev_inst = self.inst_table.row(-1)
+		assert self.chain_flags[-1] == False, 'Cannot start a new instruction with a write back'
 		inst_check = False
-		for i in prev_inst.flags:
+		for i in self.chain_flags:
 			inst_check = inst_check | i
 		assert inst_check == True, 'Cannot start a new instruction with a write back'
 
@@ -1030,12 +914,12 @@ class npu:
 		for b in range(batch):
 			assert vectors[b].space_name == 'temp', 'Input vector is not a temp variable'
 			for i in range(6, -1, -1):
-				if prev_inst.results[i] != '':
-					input_vec_name = prev_inst.results[i]
+				if self.chain_results[i] != '':
+					input_vec_name = self.chain_results[i]
 					break
 			assert vectors[b].name == input_vec_name, 'Invalid input to write back function'
 
-		prev_inst.adjust_bypassed()
+		adjust_bypassed(prev_inst)
 		# Single destination
 		if (dst2 == None):
 			if(dst1[0].space_name != 'mvu_vrf'):
@@ -1062,16 +946,14 @@ class npu:
 						self.golden_obuf_q.append(list(temp_data[b][i]))
 
 			if(len(vectors[0].data) > len(dst1[0].data)):
-				wb_count = self.inst_q[-1].wb_so_far
-				inst = chain(batch)
+				wb_count = self.wb_so_far[-1]
 				#wb_count = wb_count + 1
-				inst.wb_so_far = wb_count
+				inst = self.new_chain(batch, wb_count)
 				inst.vrf_id0_wr_size = int((len(vectors[0].data) - len(dst1[0].data))/self.arch_params['lanes'])
-				inst.loader_src = 'flush'
+				inst.ld_src = LD_FLUSH
 				inst.write_to_obuf = 0
 				for i in range(7, -1, -1):
-					inst.flags[i] = True
-				self.inst_q.append(inst)
+					self.chain_flags[i] = True
 			
 		# Two destinations
 		else:
@@ -1108,16 +990,14 @@ class npu:
 						self.golden_obuf_q.append(list(temp_data[b][i]))
 
 			if(len(vectors[0].data) > len(dst1[0].data)):
-				wb_count = self.inst_q[-1].wb_so_far
-				inst = chain(batch)
+				wb_count = self.wb_so_far[-1]
 				#wb_count = wb_count + 1
-				inst.wb_so_far = wb_count
+				inst = self.new_chain(batch, wb_count)
 				inst.vrf_id0_wr_size = int((len(vectors[0].data) - len(dst1[0].data))/self.arch_params['lanes'])
-				inst.loader_src = 'flush'
+				inst.ld_src = LD_FLUSH
 				inst.write_to_obuf = 0
 				for i in range(7, -1, -1):
-					inst.flags[i] = True
-				self.inst_q.append(inst)
+					self.chain_flags[i] = True
 
 	'''
 	This function ends the instruction chain with a fake write back to MVU VRFs (i.e. only send outputs to ofifo).
@@ -1126,11 +1006,11 @@ class npu:
 	'''
 	def produce_output(self, vectors, dst1, batch=1):
 		# Make sure that this is not the first instruction and that the write back is not the start of a new instruction
-		assert self.inst_q, 'Cannot start a new chain with a write back'
-		prev_inst = self.inst_q[-1]
-		assert prev_inst.flags[-1] == False, 'Cannot start a new instruction with a write back'
+		assert self.inst_table, 'Cannot start a new chain with a write back'
+		prev_inst = self.inst_table.row(-1)
+		assert self.chain_flags[-1] == False, 'Cannot start a new instruction with a write back'
 		inst_check = False
-		for i in prev_inst.flags:
+		for i in self.chain_flags:
 			inst_check = inst_check | i
 		assert inst_check == True, 'Cannot start a new instruction with a write back'
 
@@ -1138,33 +1018,32 @@ class npu:
 		for b in range(batch):
 			assert vectors[b].space_name == 'temp', 'Input vector is not a temp variable'
 			for i in range(6, -1, -1):
-				if prev_inst.results[i] != '':
-					input_vec_name = prev_inst.results[i]
+				if self.chain_results[i] != '':
+					input_vec_name = self.chain_results[i]
 					break
 			assert vectors[b].name == input_vec_name, 'Invalid input to write back function'
 
-		prev_inst.adjust_bypassed()
+		adjust_bypassed(prev_inst)
 
 		tiles = self.arch_params['tiles']	
-		wb_count = self.inst_q[-1].wb_so_far
-		prev_inst = self.inst_q[-1]
+		wb_count = self.wb_so_far[-1]
+		prev_inst = self.inst_table.row(-1)
 		remaining_entries = prev_inst.mfu1_vrf_rd_size
 		for i in range(tiles):
 			if(remaining_entries > 0):
-				inst = chain(batch);
-				inst.results[-1] = dst1[0].name
 				#wb_count = wb_count + 1
-				inst.wb_so_far = wb_count
-				inst.vrf_id0_op = '--'
+				inst = self.new_chain(batch, wb_count)
+				self.wb_names[-1] = dst1[0].name
+				inst.vrf_id0 = VRF_NONE
 				for b in range(batch):
-					inst.vrf_id0_wr_base[b] 	= dst1[b].alloc_addr
+					self.set_vrf_addr('vrf_id0_wr_base', b, dst1[b])
 				inst.vrf_id0_wr_size = min(dst1[0].word_count, remaining_entries)
 				inst.vrf_id1_wr_size = 0
 				inst.write_to_obuf = 1
-				inst.loader_src = 'wb'
+				inst.ld_src = LD_WB
 				for i in range(7, -1, -1):
-					inst.flags[i] = True
-				self.inst_q.append(inst)
+					self.chain_flags[i] = True
+				self.record_writer(len(self.inst_table) - 1)
 				remaining_entries -= dst1[0].word_count
 
 		#Functional Model
@@ -1181,16 +1060,14 @@ class npu:
 				self.golden_obuf_q.append(list(temp_data[b][i]))
 
 		if(len(vectors[0].data) > len(dst1[0].data)):
-			wb_count = self.inst_q[-1].wb_so_far
-			inst = chain(batch)
+			wb_count = self.wb_so_far[-1]
 			#wb_count = wb_count + 1
-			inst.wb_so_far = wb_count
+			inst = self.new_chain(batch, wb_count)
 			inst.vrf_id0_wr_size = int((len(vectors[0].data) - len(dst1[0].data))/self.arch_params['lanes'])
-			inst.loader_src = 'flush'
+			inst.ld_src = LD_FLUSH
 			inst.write_to_obuf = 0
 			for i in range(7, -1, -1):
-				inst.flags[i] = True
-			self.inst_q.append(inst)
+				self.chain_flags[i] = True
 
 	'''
 	This function loads data from the NPU input buffer to a specific destination vector
@@ -1211,10 +1088,10 @@ class npu:
 		# Get number of tiles
 		tiles = self.arch_params['tiles']	
 		# Write instruction chains for loading input vectors
-		if not self.inst_q:
+		if not self.inst_table:
 			wb_count = 0
 		else:
-			wb_count = self.inst_q[-1].wb_so_far
+			wb_count = self.wb_so_far[-1]
 
 		# Make sure that all vectors belong to the same memory space
 		space_name = vectors[0].space_name
@@ -1225,42 +1102,31 @@ class npu:
 
 		if(vectors[0].space_name == 'mvu_vrf'):
 			for i in range(tiles):
-				inst = chain(batch);
-				inst.results[-1] = vectors[0].name
 				wb_count = wb_count + 1
-				inst.wb_so_far = wb_count
-				inst.vrf_id0_op = 'mvu'+str(i)+'.vrf'
+				inst = self.new_chain(batch, wb_count)
+				self.wb_names[-1] = vectors[0].name
+				inst.vrf_id0 = i
 				for b in range(batch):
-					inst.vrf_id0_wr_base[b] = vectors[b].alloc_addr
+					self.set_vrf_addr('vrf_id0_wr_base', b, vectors[b])
 				inst.vrf_id0_wr_size = vectors[0].word_count
 				inst.vrf_id1_wr_size = 0
-				inst.loader_src	= 'in'
+				inst.ld_src	= LD_IN
 				inst.write_to_obuf = write_to_obuf
-				inst.flags[-1] = True
-				self.inst_q.append(inst)
+				self.chain_flags[-1] = True
+				self.record_writer(len(self.inst_table) - 1)
 		else:
-			inst = chain(batch);
-			inst.results[-1] = vectors[0].name
 			wb_count = wb_count + 1
-			inst.wb_so_far = wb_count
-			if(vectors[0].space_name == 'evrf'):
-				inst.vrf_id0_op = 'extvrf'
-			elif(vectors[0].space_name == 'mfu0_add'):
-				inst.vrf_id0_op = 'mfu0.vrf0'
-			elif(vectors[0].space_name == 'mfu0_mul'):
-				inst.vrf_id0_op = 'mfu0.vrf1'
-			elif(vectors[0].space_name == 'mfu1_add'):
-				inst.vrf_id0_op = 'mfu1.vrf0'
-			else:
-				inst.vrf_id0_op = 'mfu1.vrf1'
+			inst = self.new_chain(batch, wb_count)
+			self.wb_names[-1] = vectors[0].name
+			inst.vrf_id0 = self.vrf_id(vectors[0].space_name)
 			for b in range(batch):
-				inst.vrf_id0_wr_base[b] = vectors[b].alloc_addr
+				self.set_vrf_addr('vrf_id0_wr_base', b, vectors[b])
 			inst.vrf_id0_wr_size = vectors[0].word_count
 			inst.vrf_id1_wr_size = 0
-			inst.loader_src	= 'in'
+			inst.ld_src	= LD_IN
 			inst.write_to_obuf = write_to_obuf
-			inst.flags[-1] = True
-			self.inst_q.append(inst)
+			self.chain_flags[-1] = True
+			self.record_writer(len(self.inst_table) - 1)
 
 		if(write_to_obuf == 1):
 			temp_data = []
@@ -1279,11 +1145,134 @@ class npu:
 	def end_npu_program(self):
 		idx = -1
 		while True:
-			if (self.inst_q[idx].loader_src == 'flush'):
+			if (self.inst_table.row(idx).ld_src == LD_FLUSH):
 				idx = idx - 1
 			else:
 				break
-		self.inst_q[idx].last_flag = 1
+		self.inst_table.row(idx).last_flag = 1
+		if (self.flow_opts['vrf_reuse']):
+			self.reuse_vrf_space()
+
+	'''
+	The compiler appends every chain to the instruction table and fills its row in place. Next to the table it only
+	keeps, per chain, the number of write backs so far (wb_so_far) and the name of the vector the chain writes
+	(wb_names), and the results and flags of the last chain, the only one later operations can still be added to.
+	'''
+	def new_chain(self, batch, wb_count):
+		self.inst_table.append(batch)
+		self.wb_so_far.append(wb_count)
+		self.wb_names.append('')
+		self.chain_results = ['', '', '', '', '', '', '', '']
+		self.chain_flags = [False, False, False, False, False, False, False, False]
+		return self.inst_table.row(-1)
+
+	# Destination VRF id of a memory space other than the MVU VRFs
+	def vrf_id(self, space_name):
+		return self.arch_params['tiles'] + vrf_spaces.index(space_name)
+
+	'''
+	Dependency tags: last_writer maps a vector name to the position in the instruction table of the last chain that
+	writes it (wb_names). The tag of a chain that reads some vectors is the wb_so_far of the most recent of their
+	writers, so it is found without scanning the chains backwards. With -checktags, every lookup is checked against
+	the backward scan (scan_tag).
+	'''
+	def record_writer(self, idx):
+		self.last_writer[self.wb_names[idx]] = idx
+
+	def find_tag(self, names):
+		idx = -1
+		for name in names:
+			idx = max(idx, self.last_writer.get(name, -1))
+		tag = 0 if idx == -1 else self.wb_so_far[idx]
+		if (self.flow_opts['check_tags']):
+			assert tag == self.scan_tag(names), 'Indexed tag lookup of ' + str(names) + ' does not match the instruction queue scan'
+		return tag
+
+	# Reference tag lookup: the wb_so_far of the last chain that writes one of the vectors
+	def scan_tag(self, names):
+		for idx in range(len(self.wb_names) - 1, -1, -1):
+			if (self.wb_names[idx] in names):
+				return self.wb_so_far[idx]
+		return 0
+
+	'''
+	This function records that a field of the last chain holds the VRF address of a vector (plus an offset) and
+	sets it. The recorded references are what the VRF reuse pass uses to find and rewrite the addresses of a vector.
+	'''
+	def set_vrf_addr(self, field, b, vec, offset=0):
+		idx = len(self.inst_table) - 1
+		self.inst_table.row(idx)[field][b] = vec.alloc_addr + offset
+		self.vrf_refs.append((idx, field, b, vec, offset))
+
+	'''
+	VRF reuse pass: the live range of every vector in the VRF memory spaces goes from the first to the last
+	chain that reads or writes it. The VRFs are allocated again in chain order, allocating each vector at the
+	start of its live range and freeing it once its last chain has retired, so vectors with disjoint live ranges
+	share addresses. A vector whose first access is a read keeps its space for the whole program.
+	The MVU/eVRF/MFU reads are only ordered by tags, which protect read-after-write, so a later chain (an input
+	load or a write back) could overwrite a freed vector before a tag-stalled reader has read it. All VRF writes
+	go through the loader, which executes its uOPs in chain order, and the write back of a chain's results can
+	only complete once its reads are done. So a vector is only freed after the last write back of its last chain
+	(retired_chains), and a vector whose last chain is never written back keeps its space.
+	The pass only depends on the recorded references, so it can run again when a program has several routines.
+	'''
+	def reuse_vrf_space(self):
+		live = {}
+		for (idx, field, b, vec, offset) in self.vrf_refs:
+			is_read = field not in ('vrf_id0_wr_base', 'vrf_id1_wr_base')
+			if (id(vec) not in live):
+				live[id(vec)] = [vec, idx, idx, is_read]
+			else:
+				vec_live = live[id(vec)]
+				if (idx < vec_live[1]):
+					vec_live[1] = idx
+					vec_live[3] = is_read
+				elif (idx == vec_live[1]):
+					vec_live[3] = vec_live[3] or is_read
+				vec_live[2] = max(vec_live[2], idx)
+
+		# Vectors read before being written are live from the start of the program
+		retired = self.retired_chains()
+		starts = [[] for i in range(len(self.inst_table))]
+		ends = [[] for i in range(len(self.inst_table))]
+		for vec_live in live.values():
+			if (vec_live[3]):
+				starts[0].append(vec_live[0])
+			else:
+				starts[vec_live[1]].append(vec_live[0])
+				if (retired[vec_live[2]] != -1):
+					ends[retired[vec_live[2]]].append(vec_live[0])
+
+		self.vrf_space = {}
+		for space in self.mem_space:
+			if (space != 'mvu_mrf'):
+				self.vrf_space[space] = mem_allocator(self.arch_params['vrf_depth'], self.flow_opts['alloc_policy'])
+		for i in range(len(self.inst_table)):
+			for vec in starts[i]:
+				vec.alloc_addr = self.vrf_space[vec.space_name].alloc(vec.word_count)
+				assert vec.alloc_addr != -1, 'Cannot allocate vector ' + vec.name + ' in ' + vec.space_name + ' even with VRF reuse'
+			for vec in ends[i]:
+				self.vrf_space[vec.space_name].free(vec.alloc_addr)
+
+		for (idx, field, b, vec, offset) in self.vrf_refs:
+			self.inst_table.array[field][idx, b] = vec.alloc_addr + offset
+
+	# For every chain, the last chain whose loader uOPs carry its results: the write back (or flush) chains that
+	# directly follow it. Once the loader has executed them, all reads of the chain are done. -1 if no loader uOP
+	# carries the results of the chain, so nothing is known to be ordered after its reads.
+	def retired_chains(self):
+		ld_src = self.inst_table.column('ld_src').tolist()
+		# A write back only chain continues the results of the chain before it
+		wb_only = ((self.inst_table.column('mvu_op') == MVU_NOP) & (self.inst_table.column('extvrf_op') == EVRF_NOP)).tolist()
+		retired = [-1] * len(self.inst_table)
+		last = -1
+		for i in range(len(self.inst_table) - 1, -1, -1):
+			if (ld_src[i] != LD_NOP and last == -1):
+				last = i
+			retired[i] = last
+			if (not (wb_only[i] and ld_src[i] in (LD_WB, LD_FLUSH))):
+				last = -1
+		return retired
 
 	'''
 	This function uses FSim to perform a functional simulation for the NPU program written by the user,
@@ -1292,7 +1281,7 @@ class npu:
 	'''
 	def fsim_npu_program(self, verbose=0):
 		# Initialize FSim
-		inst_stream = copy.deepcopy(self.inst_q)
+		inst_stream = self.inst_table.rows()
 		input_buffer = copy.deepcopy(self.ibuf_q)
 		initial_mvu_vrfs = copy.deepcopy(self.mvu_vrfs)
 		initial_ext_vrf = copy.deepcopy(self.ext_vrf)
@@ -1300,9 +1289,9 @@ class npu:
 		initial_mfu0_vrf1 = copy.deepcopy(self.mfu0_vrf1)
 		initial_mfu1_vrf0 = copy.deepcopy(self.mfu1_vrf0)
 		initial_mfu1_vrf1 = copy.deepcopy(self.mfu1_vrf1)
-		inst_count = len(self.inst_q)
+		inst_count = len(self.inst_table)
 		self.fsim = npu_isa_sim(inst_stream, list(input_buffer), initial_mvu_vrfs, initial_ext_vrf, initial_mfu0_vrf0, initial_mfu0_vrf1, initial_mfu1_vrf0, initial_mfu1_vrf1,\
-			self.arch_params['tiles'], self.arch_params['dpes'], self.arch_params['lanes'], self.arch_params['vrf_depth'])
+			self.arch_params['tiles'], self.arch_params['dpes'], self.arch_params['lanes'], self.arch_params['vrf_depth'], self.flow_opts['fsim_ref'], self.flow_opts['fsim_dataflow'])
 		self.fsim.mvu_mrfs = self.mrfs
 
 		# Simulate the instructions in instruction queue
@@ -1312,79 +1301,94 @@ class npu:
 			self.fsim.step(verbose) 
 			if(verbose):
 				print("-------------- Finished simulation of instruction " + str(i+1) + " --------------")
-
-		# Verify results
-		if (np.array_equal(self.fsim.obuf_q, self.golden_obuf_q)):
+		if(verbose):
+			for fifo_name in ['mvu_ofifo', 'mfu0_ififo', 'mfu1_ififo', 'mfu1_ofifo']:
+				print(fifo_name + ' high-water mark: ' + str(getattr(self.fsim, fifo_name).max_count) + ' word(s)')
+		self.check_outputs(self.fsim.obuf_q)
+
+	# Compare the FSim outputs to the golden results
+	def check_outputs(self, outputs):
+		if (np.array_equal(outputs, self.golden_obuf_q)):
 			print(bcolors.OKGREEN + 'Simulation finished successfully!' + bcolors.RESET)
 		else:
 			print(bcolors.FAIL + 'Simulation FAILED!' + bcolors.RESET)
-			for r in range(len(self.fsim.obuf_q)):
-				print('FSim: ' + str(self.fsim.obuf_q[r]))
+			for r in range(len(outputs)):
+				print('FSim: ' + str(outputs[r]))
 				print('Gold: ' + str(self.golden_obuf_q[r]))
 
 	'''
-	This function dumps the FSim data structures containing the architecture states (i.e. MRFs, VRFs),
-	as well as the instructions, input and output queues. These checkpoints are later used to generate
-	the low-level binary checkpoints for the NPU.
+	Key of a model in the flow cache, computed before it is compiled from everything the compiled program depends on: the
+	model configuration and the test input arrays it reads, the state of the random generator its weights are drawn
+	from (set by -seed), and the architecture and the compiler and FSim options.
 	'''
-	def generate_fsim_checkpoints(self, checkpoint_name, verbose=0):
-		subprocess.call('mkdir dump', shell=True)
-		count = 0
-		# Instructions checkpoint
-		instfile = open('./dump/' + checkpoint_name + '-inst', 'wb')
-		pickle.dump(self.inst_q, instfile)
-		instfile.close()
-		count += 1
-		if (verbose):
-			print('Dumped ' + checkpoint_name + '-inst checkpoint')
-
-		# Input checkpoint
-		inputfile = open('./dump/' + checkpoint_name + '-input', 'wb')
-		np.save(inputfile, self.ibuf_q)
-		inputfile.close()
-		count += 1
-		if (verbose):
-			print('Dumped ' + checkpoint_name + '-input checkpoint')
+	def model_key(self, config, arrays):
+		params = dict(self.arch_params)
+		for opt in ['alloc_policy', 'vrf_reuse', 'fsim_ref', 'fsim_dataflow']:
+			params[opt] = self.flow_opts[opt]
+		params['model'] = config
+		generator, keys, pos, has_gauss, cached_gaussian = np.random.get_state()
+		params['random_state'] = (generator, pos, has_gauss, cached_gaussian)
+		return hash_arrays([keys] + [np.asarray(array) for array in arrays], params)
 
-		# MRFs checkpoint
-		mvumrffile = open('./dump/' + checkpoint_name + '-mvu_mrf', 'wb')
-		np.save(mvumrffile, self.fsim.mvu_mrfs)
-		mvumrffile.close()
-		count += 1
-		if (verbose):
-			print('Dumped ' + checkpoint_name + '-mvu_mrf checkpoint')
-
-		# VRFs checkpoints
-		mvuvrffile = open('./dump/' + checkpoint_name + '-mvu_vrf', 'wb')
-		np.save(mvuvrffile, self.mvu_vrfs)
-		mvuvrffile.close()
-		count += 1
-		if (verbose):
-			print('Dumped ' + checkpoint_name + '-mvu_vrf checkpoint')
+	'''
+	With -cache, look a model up in the flow cache before it is compiled. On a hit the compiled program and its FSim
+	outputs are restored and True is returned: the caller skips compilation and run_flow skips FSim and the checkpoint
+	dump. On a miss run_flow stores the program once FSim has run.
+	'''
+	def restore_compiled(self, config, arrays):
+		if(self.flow_opts['cache'] == 0):
+			return False
+		self.cache = flow_cache(self.flow_opts['cache_dir'], self.flow_opts['cache_size'] * 1024 * 1024)
+		self.cache_key = self.model_key(config, arrays)
+		cached = self.cache.load_program(self.cache_key)
+		if(cached is None):
+			return False
 
-		extvrffile = open('./dump/' + checkpoint_name + '-ext_vrf', 'wb')
-		np.save(extvrffile, self.ext_vrf)
-		extvrffile.close()
-		count += 1
-		if (verbose):
-			print('Dumped ' + checkpoint_name + '-ext_vrf checkpoint')
+		self.inst_table = inst_table.from_data(cached['inst'])
+		self.mrf_filled_depth = int(cached['mrf_filled_depth'][0])
+		self.mrfs[:, :, :self.mrf_filled_depth] = cached['mvu_mrf']
+		self.ibuf_q = list(cached['input'])
+		self.golden_obuf_q = list(cached['golden'])
+		self.ops = int(cached['ops'][0])
+		self.set_inst_params()
+		self.cached_program = {'mrfs': self.mrfs, 'inputs': cached['input'], 'outputs': cached['output'], \
+			'words': cached['words'], 'inst_width': self.MICW}
+		return True
 
-		mfuvrffile = open('./dump/' + checkpoint_name + '-mfu_vrf', 'wb')
-		np.save(mfuvrffile, self.mfu0_vrf0)
-		mfuvrffile.close()
-		count += 1
-		if (verbose):
-			print('Dumped ' + checkpoint_name + '-mfu_vrf checkpoint')
+	# Store the compiled program, its encoded words and FSim outputs (the arrays of artifact_arrays) in the flow cache
+	def store_compiled(self, program):
+		self.cache.store_program(self.cache_key, {
+			'inst': self.inst_table.data(),
+			'mrf_filled_depth': np.array([self.mrf_filled_depth]),
+			'mvu_mrf': self.mrfs[:, :, :self.mrf_filled_depth],
+			'input': program['inputs'],
+			'golden': np.asarray(self.golden_obuf_q),
+			'output': program['outputs'],
+			'words': program['words'],
+			'ops': np.array([self.ops], dtype=np.int64)
+		})
 
-		# Output checkpoint
-		outputfile = open('./dump/' + checkpoint_name + '-output', 'wb')
-		np.save(outputfile, self.fsim.obuf_q)
-		outputfile.close()
-		count += 1
+	'''
+	This function dumps the FSim data structures containing the architecture states (i.e. MRFs, VRFs),
+	as well as the decoded instruction table, input and output queues into one checkpoint file. These
+	checkpoints are later used to generate the low-level binary checkpoints for the NPU.
+	'''
+	def generate_fsim_checkpoints(self, checkpoint_name, verbose=0):
+		subprocess.call('mkdir dump', shell=True)
+		states = [
+			('inst', self.inst_table.data()),
+			('input', np.asarray(self.ibuf_q)),
+			('mvu_mrf', self.fsim.mvu_mrfs),
+			('mvu_vrf', self.mvu_vrfs),
+			('ext_vrf', self.ext_vrf),
+			('mfu_vrf', self.mfu0_vrf0),
+			('output', np.asarray(self.fsim.obuf_q))
+		]
+		write_checkpoint('./dump/' + checkpoint_name + '.ckpt', states)
 		if (verbose):
-			print('Dumped ' + checkpoint_name + '-output checkpoint')
-
-		return count
+			for name, state in states:
+				print('Dumped ' + checkpoint_name + '-' + name + ' checkpoint')
+		return len(states)
 
 	def write_verilog_header_file(self, num_tiles, num_dpes, num_lanes, vrf_depth, mrf_depth, max_tag, mrf_filled_depth):
 		dump_path = '../rtl/npu.vh'
@@ -1634,466 +1638,192 @@ class npu:
 	This function is used to launch the RTL simulation in case specified by the user. This requires 
 	Synopsys VCS to be set up properly
 	'''
-	def launch_rtl_sim(self, checkpoint_name, num_tiles, num_dpes, num_lanes, vrf_depth, mrf_depth, max_tag, mrf_filled_depth):
+	def launch_rtl_sim(self, checkpoint_name, num_tiles, num_dpes, num_lanes, vrf_depth, mrf_depth, max_tag, mrf_filled_depth, timeout = None):
 		#self.write_verilog_header_file(num_tiles, num_dpes, num_lanes, vrf_depth, mrf_depth, max_tag, mrf_filled_depth)
-		subprocess.call('cd ../rtl; sed -i -e \'s/\r$//\' run_sim.sh; ./run_sim.sh; cd ../compiler', shell=True)
+		return run_command('sed -i -e \'s/\r$//\' run_sim.sh; ./run_sim.sh', '../rtl', 'rtl_run_log', timeout)
 
 	'''
 	This function uses the FSim checkpoints to generate MRF, instructions, input, and output files for PCIe demo.
 	'''
-	def dump_pcie_files(self, checkpoint_name, num_tiles, num_dpes, num_lanes, program_loops):
-		precision_in = 8
-		precision_out = 32
-		mask = int(np.power(2, precision_in)) - 1
+	def dump_pcie_files(self, checkpoint_name, num_tiles, num_dpes, num_lanes, program_loops, progress = None, program = None):
+		if(program is None):
+			program = self.artifact_arrays(checkpoint_name)
 
 		# MRF file
-		src_path = './dump/' + checkpoint_name + '-mvu_mrf'
-		with open (src_path,'rb') as src_file:
-			mrfs = np.load(src_file)
-			file_path = './pcie_dump/mrfs.dat'
-			with open (file_path, 'w') as mrf_file:
-				mrf_file.write(str(num_tiles*num_dpes) + ' ' + str(self.mrf_filled_depth) + ' ' + str(num_lanes) + '\n')
-				for i in range(num_tiles):
-					for j in range(num_dpes):
-						for k in range(self.mrf_filled_depth):
-							for l in range(num_lanes):
-								mrf_file.write(str(mrfs[i][j][k][l]) + ' ')
-							mrf_file.write('\n')
-
-		# Inputs file
-		src_path = './dump/' + checkpoint_name + '-output'
-		outputs_file = open(src_path,'rb')
-		outputs = np.load(outputs_file)
-		outputs_file.close()
-		src_path = './dump/' + checkpoint_name + '-input'
-		with open(src_path,'rb') as src_file:
-			inputs = np.load(src_file)
-			file_path = './pcie_dump/inputs.dat'
-			with open (file_path,'w') as inputs_file:
-				inputs_file.write(str(2 * program_loops * len(inputs)) + ' ' + str(num_lanes) + ' ' + str(2 * program_loops * len(outputs)) + ' ' + str(num_lanes) + ' ' + str(2 * len(inputs)) + '\n')
-				for l in range(program_loops):
-					for i in range(len(inputs)):
-						for j in range(num_lanes):
-							inputs_file.write(str(inputs[i][j]) + ' ')
-						inputs_file.write('\n')
-						for j in range(num_lanes):
-							inputs_file.write(str(inputs[i][j]) + ' ')
-						inputs_file.write('\n')
-
-		# Instructions
-		self.set_inst_params()
-		src_path = './dump/' + checkpoint_name + '-inst'
-		with open(src_path,'rb') as src_file:
-			insts = np.load(src_file, allow_pickle=True, fix_imports=True, encoding='latin1')
-			file_path = './pcie_dump/instructions_bin.dat'
-			with open (file_path,'w') as inst_file:
-				inst_file.write(str(len(insts)+1) + '\n')
-				for i, inst in enumerate(insts):
-					self.set_inst(inst)
-					inst_str = bin(self.minst_chain & int(pow(2, self.MICW)-1))[2:].zfill(512)
-					inst_file.write(inst_str)
-					inst_file.write('\n')
-				inst_str = '1'*self.MICW
-				inst_file.write(inst_str)
-				inst_file.write('\n')
-
-			file_path = './pcie_dump/instructions.dat'
-			with open (file_path,'w') as inst_file:
-				inst_byte_width = int(math.ceil(self.MICW * 1.0 / 8.0))
-				inst_file.write(str(len(insts)+1) + ' ' + str(inst_byte_width) + '\n')
-				for i, inst in enumerate(insts):
-					self.set_inst(inst)
-					inst_str = bin(self.minst_chain & int(pow(2, self.MICW)-1))[2:].zfill(inst_byte_width*8)
-					for j in range(inst_byte_width):
-						partial_inst_str = inst_str[(inst_byte_width*8) - ((j+1)*8): (inst_byte_width*8) - (j*8)];
-						value = 0;
-						for k in range(8):
-							if (partial_inst_str[7-k] == '1'):
-								value += int(pow(2,k))
-						inst_file.write(str(value) + ' ')
-					inst_file.write('\n')
-				inst_file.write(str(program_loops % 256) + ' ')
-				inst_file.write(str(program_loops >> 8) + ' ')
-				for i in range(inst_byte_width-2):
-					inst_file.write('255 ')
-				inst_file.write('\n')
-
-		# Outputs file
-		mask = int(np.power(2, precision_out)) - 1
+		mrfs = program['mrfs'][:, :, :self.mrf_filled_depth]
+		file_path = './pcie_dump/mrfs.dat'
+		with open (file_path, 'wb') as mrf_file:
+			mrf_file.write((str(num_tiles*num_dpes) + ' ' + str(self.mrf_filled_depth) + ' ' + str(num_lanes) + '\n').encode())
+			mrf_file.write(decimal_rows(mrfs.reshape(-1, num_lanes)))
+
+		if(progress):
+			progress('Dumping MRF data')
+
+		# Inputs file (every input is sent twice, once for each core)
+		outputs = program['outputs']
+		inputs = program['inputs']
+		file_path = './pcie_dump/inputs.dat'
+		with open (file_path, 'wb') as inputs_file:
+			inputs_file.write((str(2 * program_loops * len(inputs)) + ' ' + str(num_lanes) + ' ' + str(2 * program_loops * len(outputs)) + ' ' + str(num_lanes) + ' ' + str(2 * len(inputs)) + '\n').encode())
+			inputs_file.write(decimal_rows(np.repeat(inputs, 2, axis=0)) * program_loops)
+
+		if(progress):
+			progress('Dumping inputs file')
+
+		# Instructions (zero extended to 512 bits, the end marker is not)
+		words = program['words']
+		inst_width = program['inst_width']
+		file_path = './pcie_dump/instructions_bin.dat'
+		with open (file_path, 'wb') as inst_file:
+			lines = np.full((len(words), max(512, inst_width) + 1), ord('0'), dtype=np.uint8)
+			lines[:, -1-inst_width:-1] = self.inst_bit_chars(words, inst_width)
+			lines[:, -1] = ord('\n')
+			inst_file.write((str(len(words)+1) + '\n').encode())
+			inst_file.write(lines.tobytes() + b'1'*inst_width + b'\n')
+
+		file_path = './pcie_dump/instructions.dat'
+		with open (file_path, 'wb') as inst_file:
+			inst_byte_width = words.shape[1]
+			end_marker = [program_loops % 256, program_loops >> 8] + [255] * (inst_byte_width-2)
+			inst_file.write((str(len(words)+1) + ' ' + str(inst_byte_width) + '\n').encode())
+			inst_file.write(decimal_rows(words) + decimal_rows([end_marker]))
+
+		if(progress):
+			progress('Dumping instructions file')
+
+		# Outputs file (lowest 8 bits, twice like the inputs)
 		file_path = './pcie_dump/outputs.dat'
-		with open (file_path,'w') as outputs_file:
-			for l in range(program_loops):
-				for i in range(len(outputs)):
-					for j in range(num_lanes):
-						outputs_file.write(str(outputs[i][j] & int(pow(2, 8)-1)) + ' ')
-					outputs_file.write('\n')
-					for j in range(num_lanes):
-						outputs_file.write(str(outputs[i][j] & int(pow(2, 8)-1)) + ' ')
-					outputs_file.write('\n')
-
-	'''
-	This function uses the FSim checkpoints to generate low-level binary NPU checkpoints. These
-	checkpoints will later be used to generate the PAC C header file. Make sure to set the precision_in
-	and precision_out to correct number of bits in case the RTL is changed (parameters EW & ACCW in RTL).
-	'''
-	def dump_binary_files(self, checkpoint_name, num_tiles, num_dpes, num_lanes):
-		precision_in = 8
-		precision_out = 32
-		mask = int(np.power(2, precision_in)) - 1
-
-		# Dump MRF data
-		path = './dump/' + checkpoint_name + '-mvu_mrf'
-		with open (path,'rb') as mrffile:
-			mrfs = np.load(mrffile)
-			for i in range(num_tiles):
-				for j in range(num_dpes):
-					dump_path = './pac_dump/mvu-mrf' + format(i * num_dpes + j, '03d')
-					with open (dump_path,'wb') as dump_file:
-						for k in range(len(mrfs[i][j])):
-							val = 0
-							for l in range(num_lanes):
-								temp = mrfs[i][j][k][l].item()
-								temp &= mask
-								val += (temp << (precision_in * l))
-							val_str = bin(val)[2:].zfill(num_lanes * precision_in)
-							dump_file.write(val_str.encode())
-							dump_file.write('\n'.encode())
-
-		# Dump input vectors
-		path = './dump/' + checkpoint_name + '-input'
-		with open(path,'rb') as inputfile:
-			inputs = np.load(inputfile)
-			dump_path = './pac_dump/input'
-			with open (dump_path,'wb') as dump_file:
-				for i in range(len(inputs)):
-					val = 0
-					for j in range(num_lanes):
-						temp = inputs[i][j].item() 
-						if((((temp >> (precision_in-1)) & 0x1) == 0x1)):
-							temp -= int(np.power(2, precision_in))
-						temp &= mask 
-						val +=  (temp << (precision_in * j))
-					val_str = hex(val)[2:].zfill(int(num_lanes * precision_in / 4))
-					dump_file.write(val_str.encode())
-					dump_file.write('\n'.encode())
-
-		# Dump instructions
-		self.set_inst_params()
-		path = './dump/' + checkpoint_name + '-inst'
-		with open(path,'rb') as instfile:
-			insts = np.load(instfile, allow_pickle=True, fix_imports=True, encoding='latin1')
-			dump_path = './pac_dump/top_sched'
-			with open (dump_path,'wb') as dump_file:
-				for i, inst in enumerate(insts):
-					self.set_inst(inst)
-					inst_str = bin(self.minst_chain & int(pow(2, self.MICW)-1))[2:].zfill(self.MICW)
-					dump_file.write(inst_str.encode())
-					dump_file.write('\n'.encode())
-				inst_str = '1'*self.MICW
-				dump_file.write(inst_str.encode())
-				dump_file.write('\n'.encode())
-
-		# Dump output vectors
-		mask = int(np.power(2, precision_in)) - 1  #Changed for demo
-		path = './dump/' + checkpoint_name + '-output'
-		with open(path,'rb') as outputfile:
-			outputs = np.load(outputfile)
-			dump_path = './pac_dump/output'
-			with open (dump_path,'wb') as dump_file:
-				for i in range(len(outputs)):
-					val = 0	            
-					for j in range(num_lanes):
-						temp = outputs[i][j].item()
-						temp &= mask
-						val += (temp << (precision_in * j)) #Changed for demo
-					val_str = hex(val)[2:].zfill(int(num_lanes * precision_in / 4)) #Changed for demo
-					dump_file.write(val_str.encode())
-					dump_file.write('\n'.encode())
-
-	def launch_perf_sim(self, num_tiles, num_dpes, num_lanes, vrf_depth, mrf_depth, verbose = False):
-		num_tiles = len(self.fsim.mvu_mrfs)
-		num_dpes = len(self.fsim.mvu_mrfs[0])
-		mrf_depth = len(self.fsim.mvu_mrfs[0][0])
-		num_lanes = len(self.fsim.mvu_mrfs[0][0][0])
-		vrf_depth = self.arch_params['vrf_depth']
-
-		dump_path = '../simulator/inc/defines.h'
-		with open(dump_path, 'w') as defines:
-			defines.write('#ifndef DEFINES_H_\n#define DEFINES_H_\n\n')
-			defines.write('#include <string>\n#include <iostream>\n\n')
-
-			defines.write('// Debug Messages\n')
-			defines.write('#define VERBOSE_OP 1\n')
-			defines.write('#define VERBOSE_MVU 1\n')
-			defines.write('#define VERBOSE_LD_OUT 0\n\n')
-
-			defines.write('// Architecture Parameters\n')
-			defines.write('#define TILES ' + str(num_tiles) + '\n')
-			defines.write('#define DPES ' + str(num_dpes) + '\n')
-			defines.write('#define LANES ' + str(num_lanes) + '\n')
-			defines.write('#define MVU_VRF_DEPTH ' + str(vrf_depth) + '\n')
-			defines.write('#define MVU_MRF_DEPTH ' + str(mrf_depth) + '\n')
-			defines.write('#define EVRF_DEPTH ' + str(vrf_depth) + '\n')
-			defines.write('#define MFU_VRF0_DEPTH ' + str(vrf_depth) + '\n')
-			defines.write('#define MFU_VRF1_DEPTH ' + str(vrf_depth) + '\n')
-			defines.write('#define FIFO_DEPTH 512\n\n')
-
-			defines.write('// Latency Parameters\n')
-			defines.write('#define DPE_MULT_LATENCY 2\n')
-			defines.write('#define DPE_ADDER_LATENCY 1\n')
-			defines.write('#define RF_WRITE_LATENCY 1\n')
-			defines.write('#define RF_READ_LATENCY 1\n')
-			defines.write('#define MRF_TO_DPE_LATENCY 8\n')
-			defines.write('#define VRF_TO_DPE_LATENCY 8\n')
-			defines.write('#define MVU_ACCUM_LATENCY 4\n')
-			defines.write('#define MVU_REDUCTION_LATENCY (unsigned int)(ceil(log2(TILES))+5)\n')
-			defines.write('#define MFU_ACT_LATENCY 3\n')
-			defines.write('#define MFU_ADD_LATENCY 3\n')
-			defines.write('#define MFU_MUL_LATENCY 3\n')
-			defines.write('#define MFU_LATENCY MFU_ACT_LATENCY+MFU_ADD_LATENCY+MFU_MUL_LATENCY\n')
-			defines.write('#define LD_WB_LATENCY 5\n\n')
-
-			defines.write('// Precision\n')
-			defines.write('#define TYPE int\n')
-			defines.write('#define INPUT_PRECISION 8\n')
-			defines.write('#define MASK_TRUNCATE 0x000000FF\n')
-			defines.write('#define MASK_SIGN_EXTEND 0xFFFFFF00\n')
-			defines.write('#define MASK_SIGN_CHECK 0x00000080\n\n')
-
-			defines.write('#define LOG(module_name, msg) do { \\\n')
-			defines.write('std::cout << "[" << module_name << " @ " << cycle_count << "]: " << msg << std::endl; \\\n')
-			defines.write('} while (0)\n\n')
-			defines.write('#endif\n')
-
-		for t in range(num_tiles):
-			for d in range(num_dpes):
-				dump_path = '../simulator/register_files/mrf_tile_'+str(t)+'_dpe_'+str(d)+'.txt'
-				with open(dump_path, 'w') as dump_file:
-					for m in range(mrf_depth):
-						for l in range(num_lanes):
-							dump_file.write(str(self.fsim.mvu_mrfs[t][d][m][l]) + ' ')
-						dump_file.write('\n')
-
-		dump_path = '../simulator/register_files/vrf_file.txt'
-		num_inputs = len(self.ibuf_q)
-		with open(dump_path, 'w') as dump_file:
-			for i in range(num_inputs):
-				for l in range(num_lanes):
-					dump_file.write(str(self.ibuf_q[i][l]) + ' ')
-				dump_file.write('\n')
-
-		dump_path = '../simulator/register_files/py_output.txt'
-		num_outputs = len(self.fsim.obuf_q)
-		#mask = int(np.power(2, precision_out)) - 1
-		with open(dump_path, 'w') as dump_file:
-			for i in range(num_outputs):
-				for l in range(num_lanes):
-					dump_file.write(str(self.fsim.obuf_q[i][l]) + ' ')
-				dump_file.write('\n')
-	            
-		dump_path = '../simulator/register_files/instructions.txt'
-		num_inst = len(self.inst_q)
-		with open(dump_path, 'w') as dump_file:
-			for i in range(num_inst):
-				inst = self.inst_q[i]
-				
-				# MVU macro-op
-				if(inst.mvu_op_type == 'matvec'):
-					dump_file.write('1 ')
-				else:
-					dump_file.write('0 ')
-				dump_file.write(str(inst.mvu_vrf_rd_base[0]) + ' ')
-				dump_file.write(str(inst.mvu_vrf_rd_base[1]) + ' ')
-				dump_file.write(str(inst.mvu_vrf_rd_base[2]) + ' ')
-				dump_file.write(str(inst.mvu_vrf_rd_sz) + ' ')
-				dump_file.write(str(inst.mvu_mrf_rd_base) + ' ')
-				dump_file.write(str(inst.mvu_mrf_rd_sz) + ' ')
-				dump_file.write(str(inst.mvu_tag) + '\n')
-				
-				# eVRF macro-op
-				if(inst.extvrf_op_type == 'move'):
-					dump_file.write('1 0 ')
-				elif(inst.extvrf_op_type == 'extvrf'):
-					dump_file.write('1 1 ')
-				else:
-					dump_file.write('0 0 ')
-
-				for i in range(inst.batch):
-					dump_file.write(str(inst.extvrf_rd_base[i]) + ' ')
-				for i in range(3-inst.batch):
-					dump_file.write('0 ')
-
-				dump_file.write(str(inst.extvrf_rd_sz) + ' ')
-				dump_file.write(str(inst.batch) + ' ')
-				dump_file.write(str(inst.extvrf_tag) + '\n')
-				
-				# MFU0 macro-op
-				if((inst.mfu0_act_op_type == 'nop') and (inst.mfu0_act_op_type == 'nop') \
-				    and (inst.mfu0_act_op_type == 'nop')):
-					dump_file.write('0 ')
-				else:
-					dump_file.write('1 ')
-				dump_file.write(str(inst.mfu0_vrf_rd_size) + ' ')
-				if(inst.mfu0_act_op_type == 'tanh'):
-					dump_file.write('1 ')
-				elif(inst.mfu0_act_op_type == 'sig'):
-					dump_file.write('2 ')
-				elif(inst.mfu0_act_op_type == 'relu'):
-					dump_file.write('3 ')
-				else:
-					dump_file.write('0 ')
-				if(inst.mfu0_add_op_type == 'add'):
-					dump_file.write('1 ')
-				elif(inst.mfu0_add_op_type == 'sub_a_b'):
-					dump_file.write('2 ')
-				elif(inst.mfu0_add_op_type == 'sub_b_a'):
-					dump_file.write('3 ')
-				else:
-					dump_file.write('0 ')
-
-				for addr in inst.mfu0_vrf0_rd_base:
-					dump_file.write(str(addr) + ' ')
-				for i in range(3-inst.batch):
-					dump_file.write('0 ')
-				#dump_file.write(str(inst.mfu0_vrf0_rd_base) + ' ')
-
-				if(inst.mfu0_mul_op_type == 'mul'):
-					dump_file.write('1 ')
-				else:
-					dump_file.write('0 ')
-
-				for addr in inst.mfu0_vrf1_rd_base:
-					dump_file.write(str(addr) + ' ')
-				for i in range(3-inst.batch):
-					dump_file.write('0 ')
-				#dump_file.write(str(inst.mfu0_vrf1_rd_base) + ' ')
+		with open (file_path, 'wb') as outputs_file:
+			outputs_file.write(decimal_rows(np.repeat(outputs & 0xFF, 2, axis=0)) * program_loops)
 
-				dump_file.write(str(inst.batch) + ' ')
-				dump_file.write(str(inst.mfu0_tag) + '\n')
-				
-				# MFU1 macro-op
-				if((inst.mfu1_act_op_type == 'nop') and (inst.mfu1_act_op_type == 'nop') \
-				    and (inst.mfu1_act_op_type == 'nop')):
-					dump_file.write('0 ')
-				else:
-					dump_file.write('1 ')
-				dump_file.write(str(inst.mfu1_vrf_rd_size) + ' ')
-				if(inst.mfu1_act_op_type == 'tanh'):
-					dump_file.write('1 ')
-				elif(inst.mfu1_act_op_type == 'sig'):
-					dump_file.write('2 ')
-				elif(inst.mfu1_act_op_type == 'relu'):
-					dump_file.write('3 ')
-				else:
-					dump_file.write('0 ')
-				if(inst.mfu1_add_op_type == 'add'):
-					dump_file.write('1 ')
-				elif(inst.mfu1_add_op_type == 'sub_a_b'):
-					dump_file.write('2 ')
-				elif(inst.mfu1_add_op_type == 'sub_b_a'):
-					dump_file.write('3 ')
-				else:
-					dump_file.write('0 ')
+		if(progress):
+			progress('Dumping outputs file')
 
-				for addr in inst.mfu1_vrf0_rd_base:
-					dump_file.write(str(addr) + ' ')
-				for i in range(3-inst.batch):
-					dump_file.write('0 ')
-				#dump_file.write(str(inst.mfu1_vrf0_rd_base) + ' ')
+	'''
+	The arrays all artifacts are generated from: the MRFs, inputs and golden outputs from the FSim checkpoint and the
+	encoded program. The program is encoded here once, the artifact writers only format these arrays. The MRFs stay
+	mapped from the checkpoint, the writers only read the parts they format. Without a checkpoint name the arrays are
+	taken from the FSim states in memory instead (no checkpoint needs to be written).
+	'''
+	def artifact_arrays(self, checkpoint_name = None):
+		if(checkpoint_name is None):
+			program = {'mrfs': self.fsim.mvu_mrfs, 'inputs': np.asarray(self.ibuf_q), 'outputs': np.asarray(self.fsim.obuf_q)}
+			insts = self.inst_table.data()
+		else:
+			ckpt = checkpoint('./dump/' + checkpoint_name + '.ckpt')
+			program = {'mrfs': ckpt['mvu_mrf'], 'inputs': ckpt['input'], 'outputs': ckpt['output']}
+			insts = ckpt['inst']
+		self.set_inst_params()
+		program['words'] = self.encode_program(insts)
+		program['inst_width'] = self.MICW
+		return program
 
-				if(inst.mfu1_mul_op_type == 'mul'):
-					dump_file.write('1 ')
-				else:
-					dump_file.write('0 ')
+	# Generate one artifact family from the shared arrays (see generate_artifacts)
+	def generate_artifact(self, family, checkpoint_name, program):
+		num_tiles = self.arch_params['tiles']
+		num_dpes = self.arch_params['dpes']
+		num_lanes = self.arch_params['lanes']
+		if(family == 'pcie'):
+			self.dump_pcie_files(checkpoint_name, num_tiles, num_dpes, num_lanes, self.flow_opts['program_loops'], program = program)
+		elif(family == 'pac'):
+			write_pac_header('./pac_dump/' + checkpoint_name + '.h', program['mrfs'], program['inputs'], program['outputs'], \
+				program['words'], program['inst_width'])
+		elif(family == 'mif'):
+			if(os.path.isdir('../rtl/mif_files') == False):
+				subprocess.call('mkdir ../rtl/mif_files', shell=True)
+			write_mif_files('../rtl/mif_files/', program['mrfs'], program['inputs'], program['outputs'], program['words'], program['inst_width'])
+		elif(family == 'perfsim'):
+			self.write_perf_sim_files(program)
+		else:
+			assert False, 'Unknown artifact family ' + str(family)
 
-				for addr in inst.mfu1_vrf1_rd_base:
-					dump_file.write(str(addr) + ' ')
-				for i in range(3-inst.batch):
-					dump_file.write('0 ')
-				#dump_file.write(str(inst.mfu1_vrf1_rd_base) + ' ')
+	'''
+	This function generates the requested artifact families ('pcie', 'pac' for the PAC C header file, 'mif' for the RTL
+	MIF files, 'perfsim' for the C++ simulator inputs). They only read the shared arrays and write to different files, so with more than one
+	family each runs in its own forked process, which inherits the arrays without copying them.
+	'''
+	def generate_artifacts(self, families, checkpoint_name, program, progress = None):
+		global artifact_job
+		if(len(families) == 1 or 'fork' not in multiprocessing.get_all_start_methods()):
+			for family in families:
+				self.generate_artifact(family, checkpoint_name, program)
+				if(progress):
+					progress(artifact_steps[family])
+			return
+
+		artifact_job = (self, checkpoint_name, program)
+		try:
+			with concurrent.futures.ProcessPoolExecutor(len(families), mp_context = multiprocessing.get_context('fork')) as pool:
+				futures = {pool.submit(run_artifact_job, family): family for family in families}
+				for future in concurrent.futures.as_completed(futures):
+					error = future.exception()
+					if(progress):
+						progress(artifact_steps[futures[future]], None if error is None else repr(error))
+					if(error is not None):
+						raise error
+		finally:
+			artifact_job = None
 
-				dump_file.write(str(inst.batch) + ' ')
-				dump_file.write(str(inst.mfu1_tag) + '\n')
-				
-				# LD macro-op
-				if(inst.loader_src == 'wb'):
-					dump_file.write('1 0 ')
-				elif(inst.loader_src == 'in'):
-					dump_file.write('1 1 ')
-				elif(inst.loader_src == 'flush'):
-					dump_file.write('2 0 ')
-				else:
-					dump_file.write('0 0 ')
-				dump_file.write(str(inst.vrf_id0_wr_size) + ' ')
-				## DST0
-				if((inst.vrf_id0_wr_size == 0) or (inst.loader_src == 'flush')):
-					dump_file.write('0 ')
-				else:
-					dump_file.write('1 ')
-				if(inst.vrf_id0_op.startswith('mvu')):
-					vrf_id = re.search('mvu(.*)vrf', inst.vrf_id0_op)
-					dump_file.write(vrf_id.group(1)[:-1] + ' ')
-				elif(inst.vrf_id0_op == 'extvrf'):
-					dump_file.write(str(num_tiles) + ' ')
-				elif(inst.vrf_id0_op == 'mfu0.vrf0'):
-					dump_file.write(str(num_tiles+1) + ' ')
-				elif(inst.vrf_id0_op == 'mfu0.vrf1'):
-					dump_file.write(str(num_tiles+2) + ' ')
-				elif(inst.vrf_id0_op == 'mfu1.vrf0'):
-					dump_file.write(str(num_tiles+3) + ' ')
-				elif(inst.vrf_id0_op == 'mfu1.vrf1'):
-					dump_file.write(str(num_tiles+4) + ' ')
-				else:
-					dump_file.write('0 ')
+	'''
+	Estimate the cycles the C++ performance simulator takes to run the program using the analytical model in
+	perf_model.py. It works on the instruction table the compiler fills, so it does not need FSim to run first.
+	'''
+	def estimate_perf(self):
+		params = perf_params(self.arch_params['tiles'], self.arch_params['dpes'], self.arch_params['lanes'], \
+			self.arch_params['vrf_depth'], self.arch_params['mrf_depth'])
+		cycles, _, _ = estimate_cycles(self.inst_table, params)
+		return cycles
 
-				for addr in inst.vrf_id0_wr_base:
-					dump_file.write(str(addr) + ' ')
-				for i in range(3-inst.batch):
-					dump_file.write('0 ')
-				#dump_file.write(str(inst.vrf_id0_wr_base) + ' ')
+	'''
+	Run the discrete-event model of the chain pipeline in perf_model.py on the compiled instruction table. Returns the
+	simulator, which holds the cycle count and the per-stage busy/stall timelines.
+	'''
+	def simulate_pipeline(self):
+		params = perf_params(self.arch_params['tiles'], self.arch_params['dpes'], self.arch_params['lanes'], \
+			self.arch_params['vrf_depth'], self.arch_params['mrf_depth'])
+		sim = pipeline_sim(self.inst_table, params)
+		sim.run()
+		return sim
+
+	# Write the config file and program image the C++ performance simulator reads at startup
+	def write_perf_sim_files(self, program):
+		num_tiles, num_dpes, mrf_depth, num_lanes = program['mrfs'].shape
+		vrf_depth = self.arch_params['vrf_depth']
+		params = perf_params(num_tiles, num_dpes, num_lanes, vrf_depth, mrf_depth)
 
-				## DST1
-				if((inst.vrf_id1_wr_size == 0) or (inst.loader_src == 'flush')):
-					dump_file.write('0 ')
-				else:
-					dump_file.write('1 ')
-				if(inst.vrf_id1_op.startswith('mvu')):
-					vrf_id = re.search('mvu(.*)vrf', inst.vrf_id1_op)
-					dump_file.write(vrf_id.group(1)[:-1] + ' ')
-				elif(inst.vrf_id1_op == 'extvrf'):
-					dump_file.write(str(num_tiles) + ' ')
-				elif(inst.vrf_id1_op == 'mfu0.vrf0'):
-					dump_file.write(str(num_tiles+1) + ' ')
-				elif(inst.vrf_id1_op == 'mfu0.vrf1'):
-					dump_file.write(str(num_tiles+2) + ' ')
-				elif(inst.vrf_id1_op == 'mfu1.vrf0'):
-					dump_file.write(str(num_tiles+3) + ' ')
-				elif(inst.vrf_id1_op == 'mfu1.vrf1'):
-					dump_file.write(str(num_tiles+4) + ' ')
-				else:
-					dump_file.write('0 ')
+		# The simulator is built once and reads its architecture and latency parameters from this file at startup
+		dump_path = '../simulator/register_files/config.txt'
+		with open(dump_path, 'w') as config:
+			for name in params:
+				if(name != 'MFU_LATENCY'):
+					config.write(name + ' ' + str(params[name]) + '\n')
 
-				for addr in inst.vrf_id1_wr_base:
-					dump_file.write(str(addr) + ' ')
-				for i in range(3-inst.batch):
-					dump_file.write('0 ')
-				#dump_file.write(str(inst.vrf_id1_wr_base) + ' ')
+		# MRF image (up to the filled depth), inputs, golden outputs and instructions in one binary file the simulator mmaps
+		dump_path = '../simulator/register_files/npu_program.bin'
+		write_sim_image(dump_path, program['mrfs'][:, :, :self.mrf_filled_depth], program['inputs'], program['outputs'], self.inst_table)
 
-				dump_file.write(str(inst.batch) + ' ')
-				if(inst.write_to_obuf == True):
-					dump_file.write('1 \n')
-				else:
-					dump_file.write('0 \n')
-	           
-		dump_path = '../simulator/gen_done'
-		with open(dump_path, 'w') as dump_file:
-			dump_file.write('1')
-		
-		subprocess.call('./perf_sim.sh', shell=True)	
+	'''
+	Build and run the C++ performance simulator on the files written by write_perf_sim_files. Returns None once the
+	simulator has finished (its result is in ../simulator/sim_done), an error message otherwise. The build is reported
+	through progress, the 'Running simulation ... ' line is left open for the caller to finish with the result.
+	'''
+	def launch_perf_sim(self, num_tiles, num_dpes, num_lanes, vrf_depth, mrf_depth, verbose = False, progress = None, timeout = None):
+		# Only rebuilds when the simulator sources changed, the architecture comes from register_files/config.txt
+		error = run_command(['make'], '../simulator', 'make_log', timeout)
+		if(progress):
+			progress('Building simulator', error)
+		if(error is not None):
+			return error
+		sys.stdout.write('Running simulation ... ')
+		sys.stdout.flush()
+		return run_command(['./npu_sim'], '../simulator', 'perf_sim_log', timeout)
 
 
 	def run_flow(self):
-		self.end_npu_program()
+		# A program restored from the flow cache was stored after its end
+		cached = self.cached_program is not None
+		if(not cached):
+			self.end_npu_program()
 
 		print('\n')
 		if self.unsupported_layers:
@@ -2112,11 +1842,14 @@ class npu:
 		pac_gen = self.flow_opts['pac']
 		rtl_simulation = self.flow_opts['rtl_sim']
 		perf_simulation = self.flow_opts['perf_sim']
+		perf_estimation = self.flow_opts['perf_est']
+		pipe_simulation = self.flow_opts['pipe_sim']
 		verbose = self.flow_opts['verbose']
 		freq = self.flow_opts['freq']
 		mif_gen = self.flow_opts['mif_gen']
 		pcie_gen = self.flow_opts['pcie_gen']
-		program_loops = self.flow_opts['program_loops']
+		sim_timeout = self.flow_opts['sim_timeout']
+		in_memory = self.flow_opts['in_memory']
 
 		# Parameter checks
 		if (num_tiles <= 0 or num_dpes <= 0 or num_lanes <= 0):
@@ -2126,173 +1859,67 @@ class npu:
 			print('Number of DPEs has to be a multiple of the number of lanes')
 			sys.exit(1)
 
-		# Make sure that dump files from previous runs are deleted
-		if os.path.isfile('./pac_dump/mvu-mrf0'):
-			subprocess.call('rm ./pac_dump/mvu-mrf*', shell=True)
-		if os.path.isfile('./pac_dump/input'):
-			subprocess.call('rm ./pac_dump/input', shell=True)
-		if os.path.isfile('./pac_dump/output'):
-			subprocess.call('rm ./pac_dump/output', shell=True)
-		if os.path.isfile('./pac_dump/top_sched'):
-			subprocess.call('rm ./pac_dump/top_sched', shell=True)
-		if os.path.isfile('./pac_dump/top_sched.mif'):
-			subprocess.call('rm ./pac_dump/top_sched.mif', shell=True)
-
-		# Step 1: Compile NPU program written by the user in npu_program() function
+		# Step 1: Compile NPU program written by the user in npu_program() function (or restore it from the flow cache)
 		print(bcolors.HEADER + '=== Compiling NPU Program ===' + bcolors.RESET)
-		print(bcolors.OKGREEN + 'NPU program compiled successfully! It contains ' + str(len(self.inst_q)) + ' NPU instruction(s)' + bcolors.RESET)
+		if(cached):
+			print(bcolors.OKGREEN + 'NPU program restored from the flow cache! It contains ' + str(len(self.inst_table)) + ' NPU instruction(s)' + bcolors.RESET)
+		else:
+			print(bcolors.OKGREEN + 'NPU program compiled successfully! It contains ' + str(len(self.inst_table)) + ' NPU instruction(s)' + bcolors.RESET)
+			if(verbose):
+				self.print_mem_stats()
 
 		# -------------------------------------------------------------------------
 
 		# Step 2: Perform functional simulation using FSim
 		print(bcolors.HEADER + '=== Performing Functional Simulation ===' + bcolors.RESET)
-		self.fsim_npu_program(verbose)
-		sys.stdout.write('Generating FSim checkpoints ... ')
-		sys.stdout.flush()
-		if os.path.isdir('./dump'):
-			subprocess.call('rm -r ./dump', shell=True)
-		checkpoints_count = self.generate_fsim_checkpoints(checkpoint_name, verbose)
-		print(bcolors.OKGREEN + 'DONE' + bcolors.RESET)
+		program = None
+		cached_sim_result = None
+		if(cached):
+			program = self.cached_program
+			print('Restored FSim outputs from the flow cache')
+			self.check_outputs(program['outputs'])
+		else:
+			self.fsim_npu_program(verbose)
+			# A model looked up in the flow cache before it was compiled is stored with its encoded program
+			if(self.cache is not None):
+				program = self.artifact_arrays()
+				self.store_compiled(program)
+			# In-memory mode hands the FSim states straight to the artifact generators
+			if(in_memory == 0):
+				sys.stdout.write('Generating FSim checkpoints ... ')
+				sys.stdout.flush()
+				if os.path.isdir('./dump'):
+					subprocess.call('rm -r ./dump', shell=True)
+				checkpoints_count = self.generate_fsim_checkpoints(checkpoint_name, verbose)
+				print(bcolors.OKGREEN + 'DONE' + bcolors.RESET)
+		# The C++ simulator results are cached per version of its sources
+		if(self.cache is not None and perf_simulation == 1):
+			sim_result_name = 'perf_sim_' + hash_files(['../simulator/Makefile', '../simulator/*/*.cpp', '../simulator/inc/*.h'])[:16]
+			cached_sim_result = self.cache.load_text(self.cache_key, sim_result_name)
 
 		# -------------------------------------------------------------------------
 		
-		# Generate PCIe files
-		if(pcie_gen):
-			if os.path.isfile('./pcie_dump/mrfs.dat'):
-				subprocess.call('rm ./pcie_dump/mrfs.dat', shell=True)
-			if os.path.isfile('./pcie_dump/inputs.dat'):
-				subprocess.call('rm ./pcie_dump/inputs.dat', shell=True)
-			if os.path.isfile('./pcie_dump/outputs.dat'):
-				subprocess.call('rm ./pcie_dump/outputs.dat', shell=True)
-			if os.path.isfile('./pcie_dump/instructions.dat'):
-				subprocess.call('rm ./pcie_dump/instructions.dat', shell=True)
-
-			print(bcolors.HEADER + '=== Generating PCIE Files ===' + bcolors.RESET)
-			thread1 = threading.Thread(target = self.dump_pcie_files, args = (checkpoint_name, num_tiles, num_dpes, num_lanes, program_loops))
-			thread1.start()
-
-			sys.stdout.write('Dumping MRF data ... ')
-			sys.stdout.flush()
-			mrf_file_name = './pcie_dump/mrfs.dat'
-			while not os.path.isfile(mrf_file_name):
-				time.sleep(0.2)
-			print(bcolors.OKGREEN + 'DONE' + bcolors.RESET)
-
-			sys.stdout.write('Dumping inputs file ... ')
-			sys.stdout.flush()
-			while not os.path.isfile('./pcie_dump/inputs.dat'):
-				time.sleep(0.2)
-			print(bcolors.OKGREEN + 'DONE' + bcolors.RESET)
-
-			sys.stdout.write('Dumping instructions file ... ')
-			sys.stdout.flush()
-			while not os.path.isfile('./pcie_dump/instructions.dat'):
-				time.sleep(0.2)
-			print(bcolors.OKGREEN + 'DONE' + bcolors.RESET)
-
-			sys.stdout.write('Dumping outputs file ... ')
-			sys.stdout.flush()
-			while not os.path.isfile('./pcie_dump/outputs.dat'):
-				time.sleep(0.2)
-			print(bcolors.OKGREEN + 'DONE' + bcolors.RESET)
-
-			thread1.join()
-		# -------------------------------------------------------------------------
-
-		# Step 3: Generate PAC C header file
-
-		# Use the checkpoints generated by FSim (python data structures) to generate binary low-level NPU checkpoints
-		if(pac_gen):
-			print(bcolors.HEADER + '=== Generating PAC Header File ===' + bcolors.RESET)
-			thread1 = threading.Thread(target = self.dump_binary_files, args = (checkpoint_name, num_tiles, num_dpes, num_lanes))
-			thread1.start()
-
-			sys.stdout.write('Dumping MRF data ... ')
-			sys.stdout.flush()
-			while not os.path.isfile('./pac_dump/mvu-mrf' + str(num_tiles * num_dpes - 1)):
-				time.sleep(0.2)
-			print(bcolors.OKGREEN + 'DONE' + bcolors.RESET)
-
-			sys.stdout.write('Dumping input vectors ... ')
-			sys.stdout.flush()
-			while not os.path.isfile('./pac_dump/input'):
-				time.sleep(0.2)
-			print(bcolors.OKGREEN + 'DONE' + bcolors.RESET)
-
-			sys.stdout.write('Dumping instructions ... ')
-			sys.stdout.flush()
-			while not os.path.isfile('./pac_dump/input'):
-				time.sleep(0.2)
-			print(bcolors.OKGREEN + 'DONE' + bcolors.RESET)
-
-			sys.stdout.write('Dumping output vectors ... ')
-			sys.stdout.flush()
-			while not os.path.isfile('./pac_dump/input'):
-				time.sleep(0.2)
-			print(bcolors.OKGREEN + 'DONE' + bcolors.RESET)
-
-			thread1.join()
-
-			# Transform the binary low-level NPU checkpoints into the PAC header file format
-			sys.stdout.write('Generating C header file ... ')
-			sys.stdout.flush()
-			transform_list_to_mif(num_lanes)
-			generate_header_file(checkpoint_name)
-			print(bcolors.OKGREEN + 'DONE' + bcolors.RESET)
-
-			# After generating C header file, clean all the checkpoints created along the way
-			subprocess.call('rm ./pac_dump/mvu-mrf* ./pac_dump/input ./pac_dump/output ./pac_dump/top_sched.mif', shell=True)
-
-		# -------------------------------------------------------------------------
-		# Generate MIF files
-		if(mif_gen):
-			print(bcolors.HEADER + '=== Generating MIF Files ===' + bcolors.RESET)
-			thread1 = threading.Thread(target = self.dump_binary_files, args = (checkpoint_name, num_tiles, num_dpes, num_lanes))
-			thread1.start()
-
-			sys.stdout.write('Dumping MRF data ... ')
-			sys.stdout.flush()
-			if(num_tiles * num_dpes - 1 < 10):
-				mrf_mif_name = './pac_dump/mvu-mrf00'
-			elif(num_tiles * num_dpes - 1 < 100):
-				mrf_mif_name = './pac_dump/mvu-mrf0'
-			else:
-				mrf_mif_name = './pac_dump/mvu-mrf'
-			while not os.path.isfile(mrf_mif_name + str(num_tiles * num_dpes - 1)):
-				time.sleep(0.2)
-			print(bcolors.OKGREEN + 'DONE' + bcolors.RESET)
-
-			sys.stdout.write('Dumping input vectors ... ')
-			sys.stdout.flush()
-			while not os.path.isfile('./pac_dump/input'):
-				time.sleep(0.2)
-			print(bcolors.OKGREEN + 'DONE' + bcolors.RESET)
-
-			sys.stdout.write('Dumping instructions ... ')
-			sys.stdout.flush()
-			while not os.path.isfile('./pac_dump/top_sched'):
-				time.sleep(0.2)
-			print(bcolors.OKGREEN + 'DONE' + bcolors.RESET)
-
-			sys.stdout.write('Dumping output vectors ... ')
-			sys.stdout.flush()
-			while not os.path.isfile('./pac_dump/output'):
-				time.sleep(0.2)
-			print(bcolors.OKGREEN + 'DONE' + bcolors.RESET)
-
-			thread1.join()
-
-			# Transform the binary low-level NPU checkpoints into MIF files
-			sys.stdout.write('Converting checkpoints to MIFs ... ')
-			sys.stdout.flush()
-			transform_list_to_mif(num_lanes)
-			subprocess.call('rm ./pac_dump/input ./pac_dump/output', shell=True)
-			if(os.path.isdir('../rtl/mif_files') == False):
-				subprocess.call('mkdir ../rtl/mif_files', shell=True)
-			subprocess.call('mv ./pac_dump/*.mif ../rtl/mif_files/', shell=True)
-			print(bcolors.OKGREEN + 'DONE' + bcolors.RESET)
+		# Step 3: Generate the PCIe files, the PAC C header file, the RTL MIF files and the C++ simulator inputs
+
+		# All of them are generated from the FSim checkpoints and the program encoded once, in parallel if more than one is needed
+		families = [family for family, enabled in [('pcie', pcie_gen), ('pac', pac_gen), ('mif', mif_gen), \
+			('perfsim', perf_simulation and cached_sim_result is None)] if enabled]
+		if(families):
+			if(pcie_gen):
+				for file_name in ['mrfs.dat', 'inputs.dat', 'outputs.dat', 'instructions.dat']:
+					if os.path.isfile('./pcie_dump/' + file_name):
+						subprocess.call('rm ./pcie_dump/' + file_name, shell=True)
+
+			print(bcolors.HEADER + '=== Generating Artifacts ===' + bcolors.RESET)
+			start_time = time.time()
+			if(program is None):
+				program = self.artifact_arrays(None if in_memory else checkpoint_name)
+			self.generate_artifacts(families, checkpoint_name, program, report_step)
+			end_time = time.time()
+			print(bcolors.OKBLUE + 'Artifact generation took ' + str(round(end_time-start_time, 3)) + ' sec' + bcolors.RESET)
 
-			self.write_verilog_header_file(num_tiles, num_dpes, num_lanes, vrf_depth, mrf_depth, self.arch_params['max_tag'], self.mrf_filled_depth)
+			if(mif_gen):
+				self.write_verilog_header_file(num_tiles, num_dpes, num_lanes, vrf_depth, mrf_depth, self.arch_params['max_tag'], self.mrf_filled_depth)
 
 		# -------------------------------------------------------------------------
 		# Step 4: Perform RTL simulation
@@ -2308,103 +1935,112 @@ class npu:
 
 			print(bcolors.HEADER + '=== Launching RTL Simulation ===' + bcolors.RESET)
 
-			start_time = time.time()
-
-			thread1 = threading.Thread(target = self.launch_rtl_sim, args = (checkpoint_name, num_tiles, num_dpes, num_lanes, vrf_depth, mrf_depth, self.arch_params['max_tag'], self.mrf_filled_depth))
-			thread1.start()
-
-			sys.stdout.write('Setting up simulation ... ')
-			sys.stdout.flush()
-			while not os.path.isfile('../rtl/init_done'):
-				time.sleep(0.2)
-			print(bcolors.OKGREEN + 'DONE' + bcolors.RESET)
-
-			'''sys.stdout.write('Loading MRFs ... ')
-			sys.stdout.flush()
-			while not os.path.isfile('../rtl/mrf_done'):
-				time.sleep(0.2)
-			print(bcolors.OKGREEN + 'DONE' + bcolors.RESET)'''
-
-			sys.stdout.write('Loading inputs ... ')
-			sys.stdout.flush()
-			while not os.path.isfile('../rtl/input_done'):
-				time.sleep(0.2)
-			print(bcolors.OKGREEN + 'DONE' + bcolors.RESET)
-
+			# The testbench reports its result in ../rtl/sim_done before the simulation script exits. The result goes on
+			# the 'Running simulation ... ' line, which is where the test scripts in ../scripts read it from
 			sys.stdout.write('Running simulation ... ')
 			sys.stdout.flush()
-			while not os.path.isfile('../rtl/sim_done'):
-				time.sleep(0.2)
-
+			start_time = time.time()
+			sim_error = self.launch_rtl_sim(checkpoint_name, num_tiles, num_dpes, num_lanes, vrf_depth, mrf_depth, \
+				self.arch_params['max_tag'], self.mrf_filled_depth, sim_timeout)
 			end_time = time.time()
-			time.sleep(2)
-			
-			file = open('../rtl/sim_done', 'r')
-			lines = file.readlines()
-			if (lines[0] == 'PASS\n'):
+			if(sim_error is None and not os.path.isfile('../rtl/sim_done')):
+				sim_error = 'no result in ../rtl/sim_done'
+
+			if(sim_error is None):
+				with open('../rtl/sim_done', 'r') as file:
+					lines = file.readlines()
+			if(sim_error is None and lines[0] == 'PASS\n'):
 				runtime_ms = int(lines[1]) * 1.0 / (freq*1000)
 				print(bcolors.OKGREEN + 'PASSED (' + lines[1] + ' cycles - ' + str(round(runtime_ms, 5)) + ' ms - ' + str(round(self.ops/(runtime_ms/1000)/1000000000000, 2)) + ' TOPS)' + bcolors.RESET)
 				print(bcolors.OKBLUE + 'RTL simulation took ' + str(round(end_time-start_time, 3)) + ' sec' + bcolors.RESET)
 			else:
-				print(bcolors.FAIL + 'FAILED' + bcolors.RESET)
+				report_failure(sim_error)
 
-			thread1.join()
+		# -------------------------------------------------------------------------
+
+		# Step 5: Estimate performance with the analytical model
+		est_cycles = 0
+		if(perf_estimation == 1):
+			print(bcolors.HEADER + '=== Estimating Performance ===' + bcolors.RESET)
+			start_time = time.time()
+			est_cycles = self.estimate_perf()
+			end_time = time.time()
+			runtime_ms = est_cycles * 1.0 / (freq*1000)
+			print(bcolors.OKGREEN + 'ESTIMATED (' + str(est_cycles) + ' cycles - ' + str(round(runtime_ms, 5)) + \
+				' ms - ' + str(round(self.ops/(runtime_ms/1000)/1000000000000, 2)) + ' TOPS)' + bcolors.RESET)
+			print(bcolors.OKBLUE + 'Performance estimation took ' + str(round(end_time-start_time, 3)) + ' sec' + bcolors.RESET)
 
 		# -------------------------------------------------------------------------
 
-		# Step 5: Perform Performance simulation
+		# Step 6: Simulate the chain pipeline with the discrete-event model
+		pipe_cycles = 0
+		if(pipe_simulation == 1):
+			print(bcolors.HEADER + '=== Running Pipeline Simulation ===' + bcolors.RESET)
+			start_time = time.time()
+			pipe_sim = self.simulate_pipeline()
+			end_time = time.time()
+			pipe_cycles = pipe_sim.cycles
+			runtime_ms = pipe_cycles * 1.0 / (freq*1000)
+			print(bcolors.OKGREEN + 'SIMULATED (' + str(pipe_cycles) + ' cycles - ' + str(round(runtime_ms, 5)) + \
+				' ms - ' + str(round(self.ops/(runtime_ms/1000)/1000000000000, 2)) + ' TOPS)' + bcolors.RESET)
+			summary = pipe_sim.stage_summary()
+			for stage in STAGES:
+				print(stage.ljust(5) + ': busy ' + str(summary[stage]['busy']) + ' - tag stall ' + str(summary[stage]['tag']) + \
+					' - input stall ' + str(summary[stage]['input']) + ' - output stall ' + str(summary[stage]['output']) + ' cycles')
+			if(os.path.isdir('./pipe_dump') == False):
+				subprocess.call('mkdir pipe_dump', shell=True)
+			timelines_path = './pipe_dump/' + checkpoint_name + '_pipeline.csv'
+			pipe_sim.write_timelines(timelines_path)
+			print(bcolors.OKBLUE + 'Pipeline simulation took ' + str(round(end_time-start_time, 3)) + ' sec (timelines in ' + \
+				timelines_path + ')' + bcolors.RESET)
+
+		# -------------------------------------------------------------------------
+
+		# Step 7: Perform Performance simulation
 		if(perf_simulation == 1):
-			if os.path.isfile('../simulator/gen_done'):
-				subprocess.call('rm ../simulator/gen_done', shell=True)
 			if os.path.isfile('../simulator/sim_done'):
 				subprocess.call('rm ../simulator/sim_done', shell=True)
 
 			print(bcolors.HEADER + '=== Launching C++ Performance Simulation ===' + bcolors.RESET)
-
-			thread1 = threading.Thread(target = self.launch_perf_sim, args = (num_tiles, num_dpes, num_lanes, vrf_depth, mrf_depth))
-			thread1.start()
-
-			sys.stdout.write('Generating simulation files ... ')
-			sys.stdout.flush()
-			while not os.path.isfile('../simulator/gen_done'):
-				time.sleep(0.2)
-			print(bcolors.OKGREEN + 'DONE' + bcolors.RESET)
-
-			sys.stdout.write('Building simulator ... ')
-			sys.stdout.flush()
-			while not os.path.isfile('../simulator/npu_sim'):
-				time.sleep(0.2)
-			print(bcolors.OKGREEN + 'DONE' + bcolors.RESET)
-
-			sys.stdout.write('Running simulation ... ')
-			sys.stdout.flush()
-			while not os.path.isfile('../simulator/sim_done'):
-				time.sleep(0.2)
-			time.sleep(2)
-
-			file = open('../simulator/sim_done', 'r')
-			lines = file.readlines()
-			if (lines[0] == 'PASS\n'):
+			if(cached_sim_result is not None):
+				sim_error = None
+				lines = cached_sim_result
+				sys.stdout.write('Running simulation ... ')
+			else:
+				sim_error = self.launch_perf_sim(num_tiles, num_dpes, num_lanes, vrf_depth, mrf_depth, progress = report_step, timeout = sim_timeout)
+				if(sim_error is None):
+					with open('../simulator/sim_done', 'r') as file:
+						lines = file.readlines()
+					if(self.cache is not None):
+						self.cache.store_text(self.cache_key, sim_result_name, lines)
+
+			if(sim_error is None and lines[0] == 'PASS\n'):
 				runtime_ms = int(lines[1]) * 1.0 / (freq*1000)
 				print(bcolors.OKGREEN + 'PASSED (' + str(int(lines[1])) + ' cycles - ' + str(round(runtime_ms, 5)) + \
 					' ms - ' + str(round(self.ops/(runtime_ms/1000)/1000000000000, 2)) + ' TOPS)' + bcolors.RESET)
 				sim_time = int(lines[2])
 				print(bcolors.OKBLUE + 'C++ simulation took ' + str(round(sim_time, 3)) + ' sec' + bcolors.RESET)
+				if(cached_sim_result is not None):
+					print(bcolors.OKBLUE + 'C++ simulation result restored from the flow cache' + bcolors.RESET)
+				if(perf_estimation == 1):
+					deviation = (est_cycles - int(lines[1])) * 100.0 / int(lines[1])
+					print(bcolors.OKBLUE + 'Performance estimate is ' + str(round(deviation, 2)) + '% off the C++ simulation' + bcolors.RESET)
+				if(pipe_simulation == 1):
+					deviation = (pipe_cycles - int(lines[1])) * 100.0 / int(lines[1])
+					print(bcolors.OKBLUE + 'Pipeline simulation is ' + str(round(deviation, 2)) + '% off the C++ simulation' + bcolors.RESET)
 			else:
-				print(bcolors.FAIL + 'FAILED' + bcolors.RESET)
-
-			thread1.join()
+				report_failure(sim_error)
 
 		# -------------------------------------------------------------------------
 
-		subprocess.call('rm -r ./dump', shell=True)
+		if(in_memory == 0 and not cached):
+			subprocess.call('rm -r ./dump', shell=True)
 		subprocess.call('rm -rf __pycache__/', shell=True)
-		if(perf_simulation == 1):
+		if(perf_simulation == 1 and cached_sim_result is None):
 			subprocess.call('rm ../simulator/make_log', shell=True)
-			subprocess.call('rm ../simulator/make_clean_log', shell=True)
-			subprocess.call('rm ../simulator/gen_done', shell=True)
 			subprocess.call('rm ../simulator/sim_done', shell=True)
 			subprocess.call('rm ../simulator/register_files/*.txt', shell=True)
+			subprocess.call('rm ../simulator/register_files/*.bin', shell=True)
 		if(rtl_simulation == 1):
 			subprocess.call('rm ../rtl/*_done', shell=True)
 			subprocess.call('rm ../rtl/mif_files/*.mif', shell=True)
@@ -2493,335 +2129,65 @@ class bcolors:
 	UNDERLINE = '\033[4m'
 	RESET = "\033[0;0m"
 
-def transform_list_to_mif(num_lanes):
-	dump_dir = './pac_dump/'
-	num_dsps = int(num_lanes / 10)
-
-	for filename in os.listdir(dump_dir):
-		if((filename == 'top_sched') or (filename == 'input')):
-			dump_file = open(dump_dir+filename, 'r')
-			mif_file = open(dump_dir+filename+'.mif', 'w')
-			
-			depth = 0
-			for line in dump_file:
-				depth = depth + 1
-			width = int(len(line.strip()))
-			dump_file.close()
-
-			mif_file.write('DEPTH = ' + str(depth) + ';\n')
-			if((filename == 'input') or (filename == 'output')):
-				mif_file.write('WIDTH = ' + str(width*4) + ';\n')
-			else:
-				mif_file.write('WIDTH = ' + str(width) + ';\n')
-			mif_file.write('ADDRESS_RADIX = DEC;\n')
-			if((filename == 'input') or (filename == 'output')):
-				mif_file.write('DATA_RADIX = HEX;\n')
-			else:
-				mif_file.write('DATA_RADIX = BIN;\n')
-			mif_file.write('CONTENT\n')
-			mif_file.write('BEGIN\n')
-			
-			line_num = 0
-			dump_file = open(dump_dir+filename, 'r')
-			for line in dump_file:
-				mif_file.write(str(line_num) + ': ' + line.strip() + ';\n')
-				line_num = line_num + 1
-			mif_file.write('END;\n')
-			dump_file.close()
-			mif_file.close()
-
-			if((filename != 'input') and (filename != 'output')):
-				subprocess.call(['rm', dump_dir+filename], shell=False)
-
-		elif(filename == 'output'):
-			dump_file = open(dump_dir+filename, 'r')
-			mif_file_lower = open(dump_dir+filename+'_lower.mif', 'w')
-			mif_file_upper = open(dump_dir+filename+'_upper.mif', 'w')
-			mif_file = open(dump_dir+filename+'.mif', 'w')
-			
-			depth = 0
-			for line in dump_file:
-				depth = depth + 1
-			width = int(len(line.strip()))
-			dump_file.close()
-
-			mif_file_lower.write('DEPTH = ' + str(depth) + ';\n')
-			mif_file_lower.write('WIDTH = ' + str(width*2) + ';\n')
-			mif_file_lower.write('ADDRESS_RADIX = DEC;\n')
-			mif_file_lower.write('DATA_RADIX = HEX;\n')
-			mif_file_lower.write('CONTENT\n')
-			mif_file_lower.write('BEGIN\n')
-			mif_file_upper.write('DEPTH = ' + str(depth) + ';\n')
-			mif_file_upper.write('WIDTH = ' + str(width*2) + ';\n')
-			mif_file_upper.write('ADDRESS_RADIX = DEC;\n')
-			mif_file_upper.write('DATA_RADIX = HEX;\n')
-			mif_file_upper.write('CONTENT\n')
-			mif_file_upper.write('BEGIN\n')
-
-			mif_file.write('DEPTH = ' + str(depth) + ';\n')
-			mif_file.write('WIDTH = ' + str(width*4) + ';\n')
-			mif_file.write('ADDRESS_RADIX = DEC;\n')
-			mif_file.write('DATA_RADIX = HEX;\n')
-			mif_file.write('CONTENT\n')
-			mif_file.write('BEGIN\n')
-			
-			line_num = 0
-			dump_file = open(dump_dir+filename, 'r')
-			for line in dump_file:
-				line_str = line.strip()
-				mif_file_lower.write(str(line_num) + ': ' + line_str[int(width/2): width] + ';\n')
-				mif_file_upper.write(str(line_num) + ': ' + line_str[0: int(width/2)] + ';\n')
-				mif_file.write(str(line_num) + ': ' + line_str + ';\n')
-				line_num = line_num + 1
-			mif_file_lower.write('END;\n')
-			mif_file_upper.write('END;\n')
-			mif_file.write('END;\n')
-			dump_file.close()
-			mif_file_lower.close()
-			mif_file_upper.close()
-			mif_file.close()
-
-		elif(filename.find('mrf') != -1):
-			dump_file = open(dump_dir+filename, 'r')
-			mif_files = []
-			for i in range(num_dsps):
-				mif_files.append(open(dump_dir+filename+'_'+str(i)+'.mif', 'w'))
-			
-			depth = 0
-			for line in dump_file:
-				depth = depth + 1
-			width = len(line.strip())
-			dump_file.close()
-
-			for i in range(num_dsps):
-				mif_files[i].write('DEPTH = ' + str(depth) + ';\n')
-				mif_files[i].write('WIDTH = ' + str(int(width/4)) + ';\n')
-				mif_files[i].write('ADDRESS_RADIX = DEC;\n')
-				mif_files[i].write('DATA_RADIX = BIN;\n')
-				mif_files[i].write('CONTENT\n')
-				mif_files[i].write('BEGIN\n')
-			
-			line_num = 0
-			dump_file = open(dump_dir+filename, 'r')
-			flag_first = 1
-			for line in dump_file:
-				line_str = line.strip()
-				line_size = len(line_str)
-				line_stepsize = int(len(line_str)/num_dsps)
-				for i in range(num_dsps):
-					mif_files[i].write(str(line_num) + ': ' + line_str[(line_stepsize*i) : (line_stepsize*(i+1))] + ';\n')
-				line_num = line_num + 1
-				flag_first = 0
-
-			for i in range(num_dsps):
-				mif_files[i].write('END;\n')
-				mif_files[i].close()
-			dump_file.close()
-			
-			if((filename != 'input') and (filename != 'output')):
-				subprocess.call(['rm', dump_dir+filename], shell=False)
-
-def numericalSort(value):
-	numbers = re.compile(r'(\d+)')
-	parts = numbers.split(value)
-	parts[1::2] = map(int, parts[1::2])
-	return parts
-
-def RoundUp(x):
-	return ((x + 7) & (-8))
-
-def generate_header_file(filename):
-	depth = -1
-	width = -1
-	radix = ""
-	inst_depth = -1
-	inst_width = -1
-	inst_radix = ""
-	mif_path= './pac_dump/'
-	in_ = open(mif_path+'mvu-mrf0.mif','r') 
-	for line in in_:
-		if (depth != -1) and (width != -1):
-			break
-		mtx = re.match('DEPTH = (\d+);', line)
-		if mtx:
-			depth = int(mtx.groups()[0])
-			continue
-		mtx = re.match('WIDTH = (\d+);', line)
-		if mtx:
-			width = int(mtx.groups()[0]);
-			continue
-
-	in_ = open(mif_path+'top_sched.mif','r') 
-	for line in in_:
-		if (inst_depth != -1) and (inst_width != -1):
-			break
-		mtx = re.match('DEPTH = (\d+);', line)
-		if mtx:
-			inst_depth = int(mtx.groups()[0])
-			continue
-		mtx = re.match('WIDTH = (\d+);', line)
-		if mtx:
-			inst_width = int(mtx.groups()[0]);
-			continue
-
-	dre_src = '([0-9]+):\s+((0|1){' + str(width) + '})'
-	dre = re.compile(dre_src)
-
-	dre_src_inst = '([0-9]+):\s+((0|1){' + str(inst_width) + '})'
-	dre_inst = re.compile(dre_src_inst)
-
-	dre_input = re.compile(r"\L$")
-	total_mrf = 0
-
-	header_file = open(mif_path + filename + '.h', 'w')
-	variables_string = ''
-
-	#Files are sorted; careful while changing if-else order
-	for file in sorted(os.listdir(mif_path),key=numericalSort):
+# Progress callback of the flow stages, called once a step has finished (error is None if it succeeded)
+def report_step(step, error = None):
+	if(error is None):
+		print(step + ' ... ' + bcolors.OKGREEN + 'DONE' + bcolors.RESET)
+	else:
+		print(step + ' ... ' + bcolors.FAIL + 'FAILED (' + error + ')' + bcolors.RESET)
+
+# Ends the line of a simulation that did not pass (error is None if it ran and reported a failure)
+def report_failure(error = None):
+	if(error is None):
+		print(bcolors.FAIL + 'FAILED' + bcolors.RESET)
+	else:
+		print(bcolors.FAIL + 'FAILED (' + error + ')' + bcolors.RESET)
+
+# Run an external flow command with its output in a log file. Returns None if it exited with code 0 within the
+# timeout (in seconds, None to wait forever), an error message otherwise.
+def run_command(command, cwd, log_name, timeout = None):
+	with open(os.path.join(cwd, log_name), 'w') as log_file:
 		try:
-			if file.startswith("input"):		
-				data = []
-				tmp_vec = []
-				i=0
-				header_file.write('char input_vectors[] = \n')
-				with open(mif_path+'/'+file) as f:
-					for line in f:
-						line = line[:-2]
-						data.append(line)
-					for d in data:
-						bytes = []
-						rev_d = d[::-1]
-						if(len(rev_d)%8 != 0):
-							padded_zeros = RoundUp(len(rev_d))-len(rev_d)
-							tmp_str = "0" * padded_zeros 
-							rev_d = rev_d + tmp_str
-						
-						for i in range(0,len(rev_d),2):
-							curr_byte = rev_d[i:i+2]
-							rev_byte  = curr_byte[::-1]
-						bytes.append(int(rev_byte,16))
-
-						out = '"'
-						for b in bytes:
-							if(b<16):
-								out = out + '\\x0' + format(b, 'x')
-							else:
-								out = out + '\\x' + format(b, 'x')
-						for i in range(len(bytes),64):
-							out = out + '\\x00'
-
-						out = out + '"'
-						header_file.write(out + "\n")
-				header_file.write(';' + "\n")
-				variables_string = variables_string + 'uint32_t num_in = '+ str(len(data))+   ";\n"
-				header_file.write('char mrf_vector[] = \n')
-				
-			elif(file.startswith("mvu-mrf")):
-				data = []
-				with open(mif_path+'/'+file) as f:
-					total_mrf = total_mrf + 1
-					for line in f:
-						mtx = re.match(dre, line)
-						if mtx:
-							data.append(mtx.groups()[1])
-					for d in data:
-						bytes = []
-						rev_d = d[::-1]
-						for i in range(0,width,8):
-							curr_byte = rev_d[i:i+8]
-							rev_byte  = curr_byte[::-1]
-						bytes.append(int(rev_byte,2))
-
-						out = '"'
-						for b in bytes:
-							if(b<16):
-								out = out + '\\x0' + format(b, 'x')
-							else:
-								out = out + '\\x' + format(b, 'x')
-						for i in range(len(bytes),64):
-							out = out + '\\x00'
-
-						out = out + '"'
-						header_file.write(out + "\n")
-
-			elif file.startswith("output"):		
-				data = []
-				tmp_vec = []
-				i=0
-				header_file.write(';' + "\n")
-				variables_string = variables_string + 'uint32_t num_mrf = '+ str(total_mrf)+  ";\n"
-				variables_string = variables_string + 'uint32_t words_per_mrf = '+ str(depth) + ";\n"
-				header_file.write('char output_vectors [] = \n')
-				with open(mif_path+'/'+file) as f:
-					for line in f:
-						line = line[:-2]
-						data.append(line)
-					for d in data:
-						bytes = []
-						rev_d = d[::-1]
-						if(len(rev_d)%8 != 0):
-							padded_zeros = RoundUp(len(rev_d))-len(rev_d)
-							tmp_str = "0" * padded_zeros 
-							rev_d = rev_d + tmp_str
-						
-						for i in range(0,len(rev_d),2):
-							curr_byte = rev_d[i:i+2]
-							rev_byte  = curr_byte[::-1]
-						bytes.append(int(rev_byte,16))
-
-						out = '"'
-						for b in bytes:
-							if(b<16):
-								out = out + '\\x0' + format(b, 'x')
-							else:
-								out = out + '\\x' + format(b, 'x')
-						for i in range(len(bytes),64):
-							out = out + '\\x00'
-
-						out = out + '"\n'
-						header_file.write(out)
-			elif file.startswith("top"):
-				header_file.write(';' + "\n")
-				variables_string = variables_string + 'uint32_t num_out = '+ str(len(data))+   ";\n"
-				variables_string = variables_string + 'uint32_t num_inst = '+ str(inst_depth) + ";\n"
-				header_file.write('char instructions[] = \n')
-				data = []
-				with open(mif_path+'/'+file) as f:
-					for line in f:
-						mtx = re.match(dre_inst, line)
-						if mtx:
-							data.append(mtx.groups()[1])
-					for d in data:
-						bytes = []
-						rev_d = d[::-1]
-						for i in range(0,inst_width,8):
-							curr_byte = rev_d[i:i+8]
-							rev_byte  = curr_byte[::-1]
-						bytes.append(int(rev_byte,2))
-				   	
-						out = '"'
-						for b in bytes:
-							if(b<16):
-								out = out + '\\x0' + format(b, 'x')
-							else:
-								out = out + '\\x' + format(b, 'x')
-						for i in range(len(bytes),64):
-							out = out + '\\x00'
-
-						out = out + '"'
-						header_file.write(out + "\n")
-				header_file.write(';' + "\n")
-
-		except Exception as e:
-			raise e
-			print('No files found here!')
-
-	variables_string = variables_string + 'uint32_t total_mem_buff_alloc_on_fpga = 11;\n'
-	variables_string = variables_string + 'uint32_t pc_start = 0;\n'
-	header_file.write(variables_string)
-	header_file.close()
-
- 
+			result = subprocess.run(command, cwd = cwd, shell = isinstance(command, str), stdout = log_file, \
+				stderr = subprocess.STDOUT, timeout = timeout)
+		except subprocess.TimeoutExpired:
+			return 'timed out after ' + str(timeout) + ' sec'
+		except OSError as e:
+			return str(e)
+	if(result.returncode != 0):
+		return 'exit code ' + str(result.returncode) + ', see ' + log_name
+	return None
+
+# Progress step reported when an artifact family is generated
+artifact_steps = {
+	'pcie'    : 'Generating PCIe files',
+	'pac'     : 'Generating PAC header file',
+	'mif'     : 'Generating MIF files',
+	'perfsim' : 'Generating simulation files'
+}
+
+# (npu, checkpoint name, shared arrays) of the running artifact stage, inherited by the forked artifact workers
+artifact_job = None
+
+def run_artifact_job(family):
+	npu_obj, checkpoint_name, program = artifact_job
+	npu_obj.generate_artifact(family, checkpoint_name, program)
+
+# Rows of integers as text lines of space terminated decimal numbers, formatted with a lookup table of the distinct
+# values (NUL padded to the same width and squeezed out once the lines are assembled)
+def decimal_rows(values):
+	values = np.asarray(values).astype(np.int64)
+	keys, index = np.unique(values, return_inverse=True)
+	strs = [(str(key) + ' ').encode() for key in keys.tolist()]
+	width = max([len(key_str) for key_str in strs], default=1)
+	lut = np.zeros((len(strs), width), dtype=np.uint8)
+	for i, key_str in enumerate(strs):
+		lut[i, :len(key_str)] = np.frombuffer(key_str, dtype=np.uint8)
+	lines = np.zeros((len(values), values.shape[1] * width + 1), dtype=np.uint8)
+	lines[:, :-1] = lut[index.reshape(values.shape)].reshape(len(values), -1)
+	lines[:, -1] = ord('\n')
+	return lines[lines != 0].tobytes()
+
 def initialize_npu(argv):
 	# default compiler parameters
 	name = 'test'
@@ -2834,10 +2200,22 @@ def initialize_npu(argv):
 	pac_gen = 0
 	rtl_simulation = 0
 	perf_simulation = 0
+	perf_estimation = 0
+	pipe_simulation = 0
 	mif_gen = 0
 	pcie_gen = 0
 	program_loops = 1
 	freq = 300
+	fsim_ref = 0
+	fsim_dataflow = 0
+	check_tags = 0
+	alloc_policy = 'first_fit'
+	vrf_reuse = 0
+	sim_timeout = None
+	in_memory = 0
+	use_cache = 0
+	cache_size = 1024
+	seed = None
 
 	# Capture parameters from command line
 	if('-n' in sys.argv):
@@ -2963,12 +2341,63 @@ def initialize_npu(argv):
 	if('-perfsim' in sys.argv):
 		perf_simulation = 1
 
+	if('-perfest' in sys.argv):
+		perf_estimation = 1
+
+	if('-pipesim' in sys.argv):
+		pipe_simulation = 1
+
 	if('-mif' in sys.argv):
 		mif_gen = 1
 
 	if('-pcie' in sys.argv):
 		pcie_gen = 1
 
+	if('-fsimref' in sys.argv):
+		fsim_ref = 1
+
+	if('-fsimdataflow' in sys.argv):
+		fsim_dataflow = 1
+
+	if('-checktags' in sys.argv):
+		check_tags = 1
+
+	if('-bestfit' in sys.argv):
+		alloc_policy = 'best_fit'
+
+	if('-vrfreuse' in sys.argv):
+		vrf_reuse = 1
+
+	if('-nodump' in sys.argv):
+		in_memory = 1
+
+	if('-cache' in sys.argv):
+		use_cache = 1
+
+	if('-cachesize' in sys.argv):
+		try:
+			cache_size = int(sys.argv[sys.argv.index('-cachesize') + 1])
+		except (ValueError, IndexError):
+			print(bcolors.FAIL + "\nInvalid -cachesize argument!" + bcolors.RESET)
+			sys.exit(1)
+		if(cache_size <= 0):
+			print(bcolors.FAIL + "\nSpecified cache size must be a positive number of MB" + bcolors.RESET)
+			sys.exit(1)
+
+	# Seeding makes the random weights and inputs (and so the compiled program) the same on every run
+	if('-seed' in sys.argv):
+		try:
+			seed = int(sys.argv[sys.argv.index('-seed') + 1])
+		except (ValueError, IndexError):
+			print(bcolors.FAIL + "\nInvalid -seed argument!" + bcolors.RESET)
+			sys.exit(1)
+		np.random.seed(seed)
+
+	# The flow cache keys a model on the random generator its weights are drawn from, which only repeats with a seed
+	if(use_cache == 1 and seed is None):
+		print(bcolors.FAIL + "\n-cache needs -seed to draw the same weights on every run" + bcolors.RESET)
+		sys.exit(1)
+
 	if('-freq' in sys.argv):
 		try:
 			freq = int(sys.argv[sys.argv.index('-freq') + 1])
@@ -2980,6 +2409,16 @@ def initialize_npu(argv):
 		print(bcolors.FAIL + "\nSpecified frequency must be a positive integer" + bcolors.RESET)
 		sys.exit(1)
 
+	if('-timeout' in sys.argv):
+		try:
+			sim_timeout = int(sys.argv[sys.argv.index('-timeout') + 1])
+		except (ValueError, IndexError):
+			print(bcolors.FAIL + "\nInvalid -timeout argument!" + bcolors.RESET)
+			sys.exit(1)
+		if(sim_timeout <= 0):
+			print(bcolors.FAIL + "\nSpecified simulation timeout must be a positive number of seconds" + bcolors.RESET)
+			sys.exit(1)
+
 
 	# Assign program name as well as verbose and RTL simulation options
 	checkpoint_name = name + '_' + str(num_tiles) + '_' + str(num_dpes) + '_' + str(num_lanes)
@@ -3000,11 +2439,24 @@ def initialize_npu(argv):
 		'pac'  				    : pac_gen,
 		'rtl_sim' 			  : rtl_simulation,
 		'perf_sim' 			  : perf_simulation, 
+		'perf_est' 			  : perf_estimation,
+		'pipe_sim' 			  : pipe_simulation,
 		'verbose' 			  : verbose,
 		'mif_gen'			    : mif_gen,
 		'freq'				    : freq,
 		'pcie_gen'			  : pcie_gen,
-		'program_loops'   : program_loops
+		'program_loops'   : program_loops,
+		'fsim_ref'			  : fsim_ref,
+		'fsim_dataflow'	  : fsim_dataflow,
+		'check_tags'		  : check_tags,
+		'alloc_policy'	  : alloc_policy,
+		'vrf_reuse'			  : vrf_reuse,
+		'sim_timeout'		  : sim_timeout,
+		'in_memory'			  : in_memory,
+		'cache'				    : use_cache,
+		'cache_dir'			  : './flow_cache',
+		'cache_size'		  : cache_size,
+		'seed'				    : seed
 	}
 
 	return npu(arch_params, flow_opts)
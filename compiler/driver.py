@@ -5,7 +5,7 @@ from tensorflow import keras
 from tensorflow.keras import layers
 
 from compiler import *
-from npu_layers import *
+from npu_keras import *
 
 ###### START OF MODEL DEFINITION ######
 
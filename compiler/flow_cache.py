@@ -0,0 +1,103 @@
+import os
+import glob
+import shutil
+import hashlib
+import numpy as np
+
+from checkpoint import checkpoint, write_checkpoint
+
+### Content-addressed cache of compiled programs and their simulation results
+# An entry is a directory named after a hash of everything the compiled program depends on, computed before it is
+# compiled (the model configuration and test inputs, the state of the random generator the weights are drawn from, the
+# architecture and the compiler and FSim options), so a change to the model, its weights or the NPU configuration gives
+# a new entry. It holds the compiled program (instruction table, encoded words, MRF image up to the filled depth, input,
+# golden and FSim output vectors, as a checkpoint container) and the C++ simulator results, one per version of the
+# simulator sources. Entries are touched on every hit and the least recently used ones are removed once the cache grows
+# past its size bound.
+PROGRAM = 'program.ckpt'
+
+# Hash of arrays (contents, dtypes and shapes) and a dict of parameters
+def hash_arrays(arrays, params):
+   digest = hashlib.sha256(repr(sorted(params.items())).encode())
+   for array in arrays:
+      array = np.ascontiguousarray(array)
+      digest.update(repr((array.dtype.descr, array.shape)).encode())
+      digest.update(array.reshape(-1).view(np.uint8))
+   return digest.hexdigest()
+
+# Hash of the contents of the files matching the glob patterns
+def hash_files(patterns):
+   digest = hashlib.sha256()
+   for path in sorted(sum([glob.glob(pattern) for pattern in patterns], [])):
+      digest.update(path.encode())
+      with open(path, 'rb') as src_file:
+         digest.update(src_file.read())
+   return digest.hexdigest()
+
+def dir_size(path):
+   return sum([os.path.getsize(os.path.join(root, name)) for root, dirs, names in os.walk(path) for name in names])
+
+class flow_cache (object):
+   def __init__(self, path, max_bytes):
+      self.path = path
+      self.max_bytes = max_bytes
+      os.makedirs(path, exist_ok=True)
+
+   def entry(self, key):
+      return os.path.join(self.path, key)
+
+   # Path of a file in an entry if it is cached (the entry becomes the most recently used), None otherwise
+   def lookup(self, key, name):
+      path = os.path.join(self.entry(key), name)
+      if(not os.path.isfile(path)):
+         return None
+      os.utime(self.entry(key))
+      return path
+
+   # Files are written next to their final name and renamed, so readers never see a partial file
+   def store(self, key, name, write):
+      os.makedirs(self.entry(key), exist_ok=True)
+      path = os.path.join(self.entry(key), name)
+      write(path + '.tmp')
+      os.replace(path + '.tmp', path)
+      os.utime(self.entry(key))
+      self.evict(key)
+
+   # Arrays of a cached program by name, None if it is not cached
+   def load_program(self, key):
+      path = self.lookup(key, PROGRAM)
+      if(path is None):
+         return None
+      ckpt = checkpoint(path)
+      return {name: np.array(ckpt[name]) for name in ckpt.names()}
+
+   def store_program(self, key, arrays):
+      self.store(key, PROGRAM, lambda path: write_checkpoint(path, sorted(arrays.items())))
+
+   # Text results (e.g. the lines of the C++ simulator sim_done file)
+   def load_text(self, key, name):
+      path = self.lookup(key, name)
+      if(path is None):
+         return None
+      with open(path, 'r') as src_file:
+         return src_file.readlines()
+
+   def store_text(self, key, name, lines):
+      def write(path):
+         with open(path, 'w') as dst_file:
+            dst_file.writelines(lines)
+      self.store(key, name, write)
+
+   # Remove the least recently used entries (never the one in use) until the cache fits in max_bytes
+   def evict(self, in_use):
+      entries = []
+      for key in os.listdir(self.path):
+         if(os.path.isdir(self.entry(key))):
+            entries.append((os.path.getmtime(self.entry(key)), key, dir_size(self.entry(key))))
+      total = sum([size for mtime, key, size in entries])
+      for mtime, key, size in sorted(entries):
+         if(total <= self.max_bytes):
+            break
+         if(key != in_use):
+            shutil.rmtree(self.entry(key), ignore_errors=True)
+            total -= size
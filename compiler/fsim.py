@@ -1,8 +1,8 @@
 import numpy as np
-import re
 import sys
 import warnings
 import math
+from int_gemm import int_gemm
 
 if not sys.warnoptions:
     warnings.simplefilter("ignore")
@@ -28,101 +28,194 @@ def myTanh(x):
     # return output *
     return x 
 
-### Class to represent the input chains
-class chain (object):
-   def __init__(self, batch=3, mvu_mrf_rd_base=0, mvu_mrf_rd_sz=0, mvu_vrf_rd_base=0, mvu_vrf_rd_sz=0, mvu_words_per_row=0, mvu_op_type='nop', mvu_tag=0, 
-   	           extvrf_rd_base=0, extvrf_rd_sz=0, extvrf_op_type='nop', extvrf_tag=0,
-   	           mfu0_vrf0_rd_base=0, mfu0_vrf1_rd_base=0, mfu0_vrf_rd_size=0, mfu0_act_op_type='nop', mfu0_add_op_type='nop', mfu0_mul_op_type='nop', mfu0_tag=0,
-   	           mfu1_vrf0_rd_base=0, mfu1_vrf1_rd_base=0, mfu1_vrf_rd_size=0, mfu1_act_op_type='nop', mfu1_add_op_type='nop', mfu1_mul_op_type='nop', mfu1_tag=0,
-   	           vrf_id0_op='--', vrf_id0_wr_base=0, vrf_id0_wr_size=0, vrf_id1_op='--', vrf_id1_wr_base=0, vrf_id1_wr_size=0, loader_src='nop',
-               last_flag=0, write_to_obuf=1):
-
-      self.batch             = batch
-
-      self.mvu_mrf_rd_base   = mvu_mrf_rd_base		#integer
-      self.mvu_mrf_rd_sz     = mvu_mrf_rd_sz		#integer
-      self.mvu_vrf_rd_base   = [mvu_vrf_rd_base] * batch		#integer
-      self.mvu_vrf_rd_sz     = mvu_vrf_rd_sz		#integer
-      self.mvu_words_per_row = mvu_words_per_row
-      self.mvu_op_type       = mvu_op_type			#string {matvec, nop}
-      self.mvu_tag           = mvu_tag				#integer
-
-      self.extvrf_rd_base    = [extvrf_rd_base] * batch		#integer
-      self.extvrf_rd_sz      = extvrf_rd_sz			#integer
-      self.extvrf_op_type    = extvrf_op_type		#string {move, extvrf, nop}
-      self.extvrf_tag        = extvrf_tag			#integer
-
-      self.mfu0_vrf0_rd_base = [mfu0_vrf0_rd_base] * batch	#integer
-      self.mfu0_vrf1_rd_base = [mfu0_vrf1_rd_base] * batch	#integer
-      self.mfu0_vrf_rd_size  = mfu0_vrf_rd_size		#integer
-      self.mfu0_act_op_type  = mfu0_act_op_type		#string {nop, relu, sig, tanh}
-      self.mfu0_add_op_type  = mfu0_add_op_type		#string {nop, add, sub_a_b, sub_b_a, max}
-      self.mfu0_mul_op_type  = mfu0_mul_op_type		#string {nop, mul}
-      self.mfu0_tag          = mfu0_tag				#integer
-
-      self.mfu1_vrf0_rd_base = [mfu1_vrf0_rd_base] * batch	#integer
-      self.mfu1_vrf1_rd_base = [mfu1_vrf1_rd_base] * batch	#integer
-      self.mfu1_vrf_rd_size  = mfu1_vrf_rd_size		#integer
-      self.mfu1_act_op_type  = mfu1_act_op_type		#string {nop, relu, sig, tanh}
-      self.mfu1_add_op_type  = mfu1_add_op_type		#string {nop, add, sub_a_b, sub_b_a, max}
-      self.mfu1_mul_op_type  = mfu1_mul_op_type		#string {nop, mul}
-      self.mfu1_tag          = mfu1_tag				#integer
-
-      self.vrf_id0_op        = vrf_id0_op			#string {mvu#.vrf, mfu0.vrf0, mfu0.vrf1, mfu1.vrf0, mfu1.vrf1, extvrf}
-      self.vrf_id0_wr_base   = [vrf_id0_wr_base] * batch		#integer
-      self.vrf_id0_wr_size   = vrf_id0_wr_size		#integer
-      self.vrf_id1_op        = vrf_id1_op			#string {mvu#.vrf, mfu0.vrf0, mfu0.vrf1, mfu1.vrf0, mfu1.vrf1, extvrf}
-      self.vrf_id1_wr_base   = [vrf_id1_wr_base] * batch		#integer
-      self.vrf_id1_wr_size   = vrf_id1_wr_size		#integer
-      self.loader_src        = loader_src			#string {wb, in, flush, nop}
-
-      self.last_flag         = last_flag          	#boolean {0,1}
-      self.write_to_obuf     = write_to_obuf      	#boolean {0,1}
-
-      self.results = ['', '', '', '', '', '', '', '']
-      self.wb_so_far = 0
-      self.flags = [False, False, False, False, False, False, False, False]
-
-   def print_chain(self):
-      print('MVU mOP {mrf_base:' + str(self.mvu_mrf_rd_base) + ', mrf_sz:' + str(self.mvu_mrf_rd_sz) + ', vrf_base:' + str(self.mvu_vrf_rd_base) + ', vrf_sz:' + str(self.mvu_vrf_rd_sz) + ', op:' + self.mvu_op_type + ', tag:' + str(self.mvu_tag))
-      print('eVRF mOP {evrf_base:' + str(self.extvrf_rd_base) + ', evrf_sz:' + str(self.extvrf_rd_sz) + ', op:' + self.extvrf_op_type + ', tag:' + str(self.extvrf_tag))
-      print('MFU0 mOP {vrf0_base:' + str(self.mfu0_vrf0_rd_base) + ', vrf1_base:' + str(self.mfu0_vrf1_rd_base) + ', vrf_sz:' + str(self.mfu0_vrf_rd_size) + ', op:' + self.mfu0_act_op_type + ',' + self.mfu0_add_op_type + ',' + self.mfu0_mul_op_type + ', tag:' + str(self.mfu0_tag))
-      print('MFU1 mOP {vrf0_base:' + str(self.mfu1_vrf0_rd_base) + ', vrf1_base:' + str(self.mfu1_vrf1_rd_base) + ', vrf_sz:' + str(self.mfu1_vrf_rd_size) + ', op:' + self.mfu1_act_op_type + ',' + self.mfu1_add_op_type + ',' + self.mfu1_mul_op_type + ', tag:' + str(self.mfu1_tag))
-      print('LD mOP {vrf_id0:' + self.vrf_id0_op + ', vrf_id0_base:' + str(self.vrf_id0_wr_base) + ', vrf_id0_sz:' + str(self.vrf_id0_wr_size) + ', vrf_id1:' + self.vrf_id1_op + ', vrf_id1_base:' + str(self.vrf_id1_wr_base) + ', vrf_id1_sz:' + str(self.vrf_id1_wr_size) + ', src:' + self.loader_src)
-      print('-----------------------------------------')
-
-   def adjust_bypassed(self):
-      if(self.mfu0_act_op_type == 'nop'):
-        self.mfu0_act_op_type = 'move'
-      if(self.mfu0_add_op_type == 'nop'):
-        self.mfu0_add_op_type = 'move'
-      if(self.mfu0_mul_op_type == 'nop'):
-        self.mfu0_mul_op_type = 'move'
-
-      if(self.mfu0_act_op_type == 'move' and self.mfu0_add_op_type == 'move' and self.mfu0_mul_op_type == 'move'):    	
-        self.mfu0_vrf_rd_size = self.extvrf_rd_sz
-        self.mfu0_vrf0_rd_base = [0] * self.batch
-        self.mfu0_vrf1_rd_base = [0] * self.batch
-        self.mfu0_tag = self.extvrf_tag
-      
-      if(self.mfu1_act_op_type == 'nop'):
-        self.mfu1_act_op_type = 'move'
-      if(self.mfu1_add_op_type == 'nop'):
-        self.mfu1_add_op_type = 'move'
-      if(self.mfu1_mul_op_type == 'nop'):
-        self.mfu1_mul_op_type = 'move'
-
-      if(self.mfu1_act_op_type == 'move' and self.mfu1_add_op_type == 'move' and self.mfu1_mul_op_type == 'move'):
-        self.mfu1_vrf_rd_size = self.mfu0_vrf_rd_size
-        self.mfu1_vrf0_rd_base = [0] * self.batch
-        self.mfu1_vrf1_rd_base = [0] * self.batch
-        self.mfu1_tag = self.mfu0_tag
+### Integer opcodes of the chains in the instruction table
+MVU_NOP, MVU_MATVEC = 0, 1
+EVRF_NOP, EVRF_MOVE, EVRF_READ = 0, 1, 2
+MFU_NOP, MFU_MOVE, MFU_RELU, MFU_TANH, MFU_SIG, MFU_ADD, MFU_SUB_A_B, MFU_SUB_B_A, MFU_MAX, MFU_MUL = range(10)
+LD_NOP, LD_IN, LD_WB, LD_FLUSH = 0, 1, 2, 3
+
+# Destination VRF ids: 0..ntile-1 are the MVU tile VRFs, followed by the VRFs of these memory spaces (same numbering as
+# the perf simulator)
+VRF_NONE = -1
+vrf_spaces = ['evrf', 'mfu0_add', 'mfu0_mul', 'mfu1_add', 'mfu1_mul']
+
+mfu_op_codes    = {'nop': MFU_NOP, 'move': MFU_MOVE, 'relu': MFU_RELU, 'tanh': MFU_TANH, 'sig': MFU_SIG,
+                   'add': MFU_ADD, 'sub_a_b': MFU_SUB_A_B, 'sub_b_a': MFU_SUB_B_A, 'max': MFU_MAX, 'mul': MFU_MUL}
+mfu_op_names    = dict((code, name) for name, code in mfu_op_codes.items())
+
+### MFU operations applied to whole (size, batch, lanes) blocks
+mfu_act_ops = {MFU_NOP: None, MFU_MOVE: None, MFU_RELU: myReLU, MFU_TANH: myTanh, MFU_SIG: mySigmoid}
+mfu_add_ops = {MFU_NOP: None, MFU_MOVE: None,
+               MFU_ADD    : lambda vrf, x: vrf + x,
+               MFU_SUB_A_B: lambda vrf, x: x - vrf,
+               MFU_SUB_B_A: lambda vrf, x: vrf - x,
+               MFU_MAX    : np.maximum}
+mfu_mul_ops = {MFU_NOP: None, MFU_MOVE: None, MFU_MUL: lambda vrf, x: vrf * x}
+
+### Instruction table: one row per chain (integer opcodes, destination VRF ids and base addresses)
+# The compiler appends a row for every chain it emits and fills it in place, FSim, the instruction encoders and the
+# perf simulator dump read it. The rows live in one NumPy structured array, so a column is a view and a snapshot is a
+# single copy.
+MAX_BATCH = 3
+
+inst_dtype = np.dtype([
+   ('batch', np.int8),
+   ('mvu_op', np.int8), ('mvu_mrf_rd_base', np.int32), ('mvu_mrf_rd_sz', np.int32), ('mvu_vrf_rd_base', np.int32, (MAX_BATCH,)),
+   ('mvu_vrf_rd_sz', np.int32), ('mvu_words_per_row', np.int32), ('mvu_tag', np.int32),
+   ('extvrf_op', np.int8), ('extvrf_rd_base', np.int32, (MAX_BATCH,)), ('extvrf_rd_sz', np.int32), ('extvrf_tag', np.int32),
+   ('mfu0_act_op', np.int8), ('mfu0_add_op', np.int8), ('mfu0_mul_op', np.int8), ('mfu0_vrf0_rd_base', np.int32, (MAX_BATCH,)),
+   ('mfu0_vrf1_rd_base', np.int32, (MAX_BATCH,)), ('mfu0_vrf_rd_size', np.int32), ('mfu0_tag', np.int32),
+   ('mfu1_act_op', np.int8), ('mfu1_add_op', np.int8), ('mfu1_mul_op', np.int8), ('mfu1_vrf0_rd_base', np.int32, (MAX_BATCH,)),
+   ('mfu1_vrf1_rd_base', np.int32, (MAX_BATCH,)), ('mfu1_vrf_rd_size', np.int32), ('mfu1_tag', np.int32),
+   ('ld_src', np.int8), ('vrf_id0', np.int16), ('vrf_id0_wr_base', np.int32, (MAX_BATCH,)), ('vrf_id0_wr_size', np.int32),
+   ('vrf_id1', np.int16), ('vrf_id1_wr_base', np.int32, (MAX_BATCH,)), ('vrf_id1_wr_size', np.int32),
+   ('last_flag', np.int8), ('write_to_obuf', np.int8)
+])
+
+class inst_table (object):
+   def __init__(self, capacity=64):
+      self.array = np.zeros(max(capacity, 1), dtype=inst_dtype)
+      self.count = 0
+
+   def __len__(self):
+      return self.count
+
+   # Append a chain with all its units idle (NOP) and no destination VRF (the array doubles when it is full)
+   def append(self, batch):
+      assert batch <= MAX_BATCH, 'Batch ' + str(batch) + ' is larger than ' + str(MAX_BATCH)
+      if(self.count == len(self.array)):
+         self.array = np.concatenate((self.array, np.zeros(len(self.array), dtype=inst_dtype)))
+      row = self.array[self.count]
+      row['batch'] = batch
+      row['vrf_id0'] = VRF_NONE
+      row['vrf_id1'] = VRF_NONE
+      row['write_to_obuf'] = 1
+      self.count += 1
+
+   # One chain as a record whose fields are written in place (row.mvu_op = ...), valid until the next append
+   def row(self, idx):
+      if(idx < 0):
+         idx += self.count
+      assert 0 <= idx < self.count, 'Chain ' + str(idx) + ' does not exist'
+      return self.array.view(np.recarray)[idx]
+
+   # Rows as a structured array view
+   def data(self):
+      return self.array[:self.count]
+
+   def column(self, name):
+      return self.array[name][:self.count]
+
+   # Rows with attribute access (row.mvu_op, ...)
+   def rows(self):
+      return self.data().view(np.recarray)
+
+   def snapshot(self):
+      return self.data().copy()
+
+   # Table holding a copy of the given rows (e.g. the rows of a program restored from the flow cache)
+   @classmethod
+   def from_data(cls, rows):
+      table = cls(len(rows))
+      table.array[:len(rows)] = rows
+      table.count = len(rows)
+      return table
+
+# Unused MFU ops of a chain are bypassed (NOP -> move); a fully bypassed MFU passes the vector of the unit before it
+# through, with its size and tag
+def adjust_bypassed(row):
+   for mfu, prev_size, prev_tag in [('mfu0', 'extvrf_rd_sz', 'extvrf_tag'), ('mfu1', 'mfu0_vrf_rd_size', 'mfu0_tag')]:
+      ops = [mfu + '_act_op', mfu + '_add_op', mfu + '_mul_op']
+      for op in ops:
+         if(row[op] == MFU_NOP):
+            row[op] = MFU_MOVE
+      if(all(row[op] == MFU_MOVE for op in ops)):
+         row[mfu + '_vrf_rd_size'] = row[prev_size]
+         row[mfu + '_vrf0_rd_base'] = 0
+         row[mfu + '_vrf1_rd_base'] = 0
+         row[mfu + '_tag'] = row[prev_tag]
+
+def print_chain(row):
+   mvu_op = 'matvec' if row.mvu_op == MVU_MATVEC else 'nop'
+   extvrf_op = ['nop', 'move', 'extvrf'][row.extvrf_op]
+   loader_src = ['nop', 'in', 'wb', 'flush'][row.ld_src]
+   print('MVU mOP {mrf_base:' + str(row.mvu_mrf_rd_base) + ', mrf_sz:' + str(row.mvu_mrf_rd_sz) + ', vrf_base:' + str(row.mvu_vrf_rd_base) + ', vrf_sz:' + str(row.mvu_vrf_rd_sz) + ', op:' + mvu_op + ', tag:' + str(row.mvu_tag))
+   print('eVRF mOP {evrf_base:' + str(row.extvrf_rd_base) + ', evrf_sz:' + str(row.extvrf_rd_sz) + ', op:' + extvrf_op + ', tag:' + str(row.extvrf_tag))
+   print('MFU0 mOP {vrf0_base:' + str(row.mfu0_vrf0_rd_base) + ', vrf1_base:' + str(row.mfu0_vrf1_rd_base) + ', vrf_sz:' + str(row.mfu0_vrf_rd_size) + ', op:' + mfu_op_names[row.mfu0_act_op] + ',' + mfu_op_names[row.mfu0_add_op] + ',' + mfu_op_names[row.mfu0_mul_op] + ', tag:' + str(row.mfu0_tag))
+   print('MFU1 mOP {vrf0_base:' + str(row.mfu1_vrf0_rd_base) + ', vrf1_base:' + str(row.mfu1_vrf1_rd_base) + ', vrf_sz:' + str(row.mfu1_vrf_rd_size) + ', op:' + mfu_op_names[row.mfu1_act_op] + ',' + mfu_op_names[row.mfu1_add_op] + ',' + mfu_op_names[row.mfu1_mul_op] + ', tag:' + str(row.mfu1_tag))
+   print('LD mOP {vrf_id0:' + str(row.vrf_id0) + ', vrf_id0_base:' + str(row.vrf_id0_wr_base) + ', vrf_id0_sz:' + str(row.vrf_id0_wr_size) + ', vrf_id1:' + str(row.vrf_id1) + ', vrf_id1_base:' + str(row.vrf_id1_wr_base) + ', vrf_id1_sz:' + str(row.vrf_id1_wr_size) + ', src:' + loader_src)
+   print('-----------------------------------------')
+
+### Class to represent the FIFOs between the FSim stages
+# Ring buffer of rows (one row = one vector word of nlane elements) that is pushed and popped in whole blocks
+class fifo (object):
+  def __init__(self, width, depth=512, d_type=acc_d_type):
+    self.width     = width
+    self.data      = np.zeros((depth, width), dtype=d_type)
+    self.head      = 0		# index of the oldest row
+    self.count     = 0		# number of rows currently in the FIFO
+    self.max_count = 0		# occupancy high-water mark (rows)
+    self.pushed    = 0		# total rows pushed
+    self.popped    = 0		# total rows popped
+
+  def __len__(self):
+    return self.count
+
+  def __str__(self):
+    return str(self.peek(self.count).tolist())
+
+  # Move the live rows to the start of a (possibly larger) buffer
+  def realign(self, depth):
+    data = np.zeros((depth, self.width), dtype=self.data.dtype)
+    first = min(self.count, self.data.shape[0] - self.head)
+    data[:first] = self.data[self.head:self.head + first]
+    data[first:self.count] = self.data[:self.count - first]
+    self.data = data
+    self.head = 0
+
+  # Push a block of rows; any array with a multiple of width elements is accepted
+  def push(self, rows):
+    rows = np.asarray(rows).reshape(-1, self.width)
+    num_rows = rows.shape[0]
+    depth = self.data.shape[0]
+    if(self.count + num_rows > depth):
+      self.realign(max(2 * depth, self.count + num_rows))
+      depth = self.data.shape[0]
+    tail = (self.head + self.count) % depth
+    first = min(num_rows, depth - tail)
+    self.data[tail:tail + first] = rows[:first]
+    self.data[:num_rows - first] = rows[first:]
+    self.count += num_rows
+    self.pushed += num_rows
+    self.max_count = max(self.max_count, self.count)
+
+  # Zero-copy view of the oldest num_rows rows (the buffer is realigned once if they wrap around)
+  def peek(self, num_rows=1):
+    assert num_rows <= self.count, 'FIFO underflow'
+    if(self.head + num_rows > self.data.shape[0]):
+      self.realign(self.data.shape[0])
+    return self.data[self.head:self.head + num_rows]
+
+  # Discard the oldest num_rows rows
+  def drop(self, num_rows=1):
+    assert num_rows <= self.count, 'FIFO underflow'
+    self.head = (self.head + num_rows) % self.data.shape[0]
+    self.count -= num_rows
+    self.popped += num_rows
+    if(self.count == 0):
+      self.head = 0
+
+  # Pop a block of rows as a (num_rows, width) array
+  def pop(self, num_rows=1):
+    rows = self.peek(num_rows).copy()
+    self.drop(num_rows)
+    return rows
 
 ### Class for ISA simulator
 class npu_isa_sim (object):
-  def __init__(self,inst_q, ibuf_q, mvu_vrfs, ext_vrf, mfu0_vrf0, mfu0_vrf1, mfu1_vrf0, mfu1_vrf1, ntile, ndpe, nlane, vrf_init_sz):
+  def __init__(self,inst_q, ibuf_q, mvu_vrfs, ext_vrf, mfu0_vrf0, mfu0_vrf1, mfu1_vrf0, mfu1_vrf1, ntile, ndpe, nlane, vrf_init_sz, ref_mode=0, dataflow=0):
     '''
-    inst_q: inst queue
+    inst_q: 指令表 (编译器生成的 inst_table 的 rows())
     ibuf_q: input buffer queue
     mvu_vrfs: 二维的mvu数据
     ext_vrf: eVRF数据, 可跳过 MVU, 执行没有matrix-vector操作的指令
@@ -134,9 +227,13 @@ class npu_isa_sim (object):
     ndpe: DPE的数量
     nlane: lane的数量
     vrf_init_sz: VRF的初始化大小
+    ref_mode: 使用逐元素循环的参考实现 (用于和向量化实现逐位比对)
+    dataflow: 每条 chain 作为一条数组流水线执行, 各级之间不经过中间 FIFO (结果与 FIFO 模式相同)
     '''
     self.inst_q = inst_q
-    self.ibuf_q = ibuf_q
+    self.pc     = 0		# index of the next chain in inst_q
+    self.ibuf_q = fifo(nlane, max(len(ibuf_q), 1), acc_d_type)
+    self.ibuf_q.push(np.asarray(ibuf_q, dtype=acc_d_type))
     self.obuf_q = []
 
     # HW 
@@ -144,9 +241,11 @@ class npu_isa_sim (object):
     self.nlane  = nlane
     self.ntile  = ntile
     self.vrf_init_sz = vrf_init_sz
+    self.ref_mode = ref_mode
+    self.dataflow = dataflow
 
     # MVU states
-    self.mvu_ofifo = []
+    self.mvu_ofifo = fifo(nlane)
     self.mvu_mrfs  = []   
     self.mvu_accs  = [0] * self.ndpe
 
@@ -156,31 +255,64 @@ class npu_isa_sim (object):
 
     # extvrf states
     self.ext_vrf = ext_vrf
-    self.ext_vrf_ififo = []
-    self.ext_vrf_ofifo = []
+    self.ext_vrf_ififo = fifo(nlane)
+    self.ext_vrf_ofifo = fifo(nlane)
 
     # MFU0 states
     self.mfu0_vrf0  = mfu0_vrf0
     self.mfu0_vrf1  = mfu0_vrf1
-    self.mfu0_ififo = []
-    self.mfu0_ofifo = []
+    self.mfu0_ififo = fifo(nlane)
+    self.mfu0_ofifo = fifo(nlane)
 
     # MFU1 states
     self.mfu1_vrf0  = mfu1_vrf0
     self.mfu1_vrf1  = mfu1_vrf1
-    self.mfu1_ofifo = []
-    self.mfu1_ififo = []
+    self.mfu1_ofifo = fifo(nlane)
+    self.mfu1_ififo = fifo(nlane)
+
+    # Loader destinations indexed by the decoded VRF id
+    self.vrfs = list(self.mvu_vrfs) + [self.ext_vrf, self.mfu0_vrf0, self.mfu0_vrf1, self.mfu1_vrf0, self.mfu1_vrf1]
    
   #### MVU macro functionality ####
-  # MVU matvec
+  # MVU matvec: all tiles, DPEs, MRF words and batch entries of the chain are computed with a single contraction
+  def mvu_matvec_block(self, cur_chain):
+    words = cur_chain.mvu_vrf_rd_sz
+    num_steps = int(math.ceil(cur_chain.mvu_mrf_rd_sz / words))
+    batch = cur_chain.batch
+    mrf_base = cur_chain.mvu_mrf_rd_base
+
+    # MRF region of the chain viewed as (tiles, dpes, steps, words, lanes), reordered to (steps, dpes, tiles, words, lanes)
+    mrf_data = np.asarray(self.mvu_mrfs)[:, :, mrf_base:mrf_base + (num_steps * words), :]
+    mrf_data = mrf_data.reshape(self.ntile, self.ndpe, num_steps, words, self.nlane).transpose(2, 1, 0, 3, 4)
+    mrf_data = mrf_data.reshape(num_steps * self.ndpe, self.ntile * words * self.nlane)
+
+    # VRF rows of all batch entries gathered as (batch, tiles, words, lanes)
+    vrf_idx = np.asarray(cur_chain.mvu_vrf_rd_base[:batch])[:, None] + np.arange(words)
+    vrf_data = np.asarray(self.mvu_vrfs)[:, vrf_idx, :].transpose(1, 0, 2, 3)
+    vrf_data = vrf_data.reshape(batch, self.ntile * words * self.nlane)
+
+    # Exact GEMM wrapped to the accumulator width (same result as accumulating in int32)
+    mvu_result = int_gemm(mrf_data, vrf_data.T)
+
+    # Output FIFO order: step, DPE chunk, batch, lane
+    mvu_result = mvu_result.reshape(num_steps, self.ndpe // self.nlane, self.nlane, batch).transpose(0, 1, 3, 2)
+    return mvu_result.reshape(-1, self.nlane)
+
   def exe_mvu_m_inst_matvec(self, cur_chain, verbose):
+    self.mvu_ofifo.push(self.mvu_matvec_block(cur_chain))
+
+    if(verbose):
+      print("MVU Output FIFO: ", self.mvu_ofifo)
+
+  # MVU matvec (reference): walks tiles x DPEs x MRF words x batch one dot product at a time
+  def exe_mvu_m_inst_matvec_ref(self, cur_chain, verbose):
     num_steps = int(math.ceil(cur_chain.mvu_mrf_rd_sz / cur_chain.mvu_vrf_rd_sz))
     batch = cur_chain.batch
 
     mvu_result = [[([0] * batch) for d in range(self.ndpe)] for t in range(num_steps)]
     mrf_addr = cur_chain.mvu_mrf_rd_base
     for t in range(num_steps):
-      vrf_addr = cur_chain.mvu_vrf_rd_base[:]
+      vrf_addr = list(cur_chain.mvu_vrf_rd_base)
       while(vrf_addr[0] < cur_chain.mvu_vrf_rd_base[0] + cur_chain.mvu_vrf_rd_sz):
         for tile in range(self.ntile):
           for dpe in range(self.ndpe):
@@ -192,22 +324,27 @@ class npu_isa_sim (object):
         for b in range(batch):
           vrf_addr[b] += 1
 
+    mvu_ofifo_data = []
     for t in range(num_steps):
       for chunk in range(int(self.ndpe/self.nlane)):
         for b in range(batch):
           for lane in range(self.nlane):
-            self.mvu_ofifo.append(mvu_result[t][(chunk*self.nlane)+lane][b])
+            mvu_ofifo_data.append(mvu_result[t][(chunk*self.nlane)+lane][b])
+    self.mvu_ofifo.push(np.array(mvu_ofifo_data, dtype=acc_d_type))
 
     if(verbose):
       print("MVU Output FIFO: ", self.mvu_ofifo)
   
   # Complete MVU
   def exe_mvu_m_inst (self, cur_chain, verbose):
-    if cur_chain.mvu_op_type=='matvec':
+    if cur_chain.mvu_op==MVU_MATVEC:
       if(verbose):
         print('MVU performing matvec')    	
-      self.exe_mvu_m_inst_matvec(cur_chain, verbose)
-    elif cur_chain.mvu_op_type=='nop':
+      if(self.ref_mode):
+        self.exe_mvu_m_inst_matvec_ref(cur_chain, verbose)
+      else:
+        self.exe_mvu_m_inst_matvec(cur_chain, verbose)
+    elif cur_chain.mvu_op==MVU_NOP:
       if(verbose):	
         print('MVU performing nop')
     else:
@@ -217,92 +354,144 @@ class npu_isa_sim (object):
   # Extvrf move 
   def exe_extvrf_inst_move(self, cur_chain, verbose):
     batch = cur_chain.batch
-    for i in range(cur_chain.extvrf_rd_sz):
-      for b in range(batch):
-        for j in range(self.nlane):
-          self.mfu0_ififo.append((self.mvu_ofifo.pop(0)).astype(acc_d_type))
+    self.mfu0_ififo.push(self.mvu_ofifo.pop(cur_chain.extvrf_rd_sz * batch))
 
     if(verbose):
       print("eVRF Output FIFO: ", self.mfu0_ififo)
 
-  # Extvrf active: reading from external vrf 
+  # Extvrf active: reading from external vrf, word by word, interleaving the batch entries
+  def extvrf_read_block(self, cur_chain):
+    extvrf_rd_addr = np.arange(cur_chain.extvrf_rd_sz)[:, None] + cur_chain.extvrf_rd_base[:cur_chain.batch]
+    return self.ext_vrf[extvrf_rd_addr].reshape(-1, self.nlane)
+
   def exe_extvrf_inst_extvrf(self, cur_chain, verbose):
-    batch = cur_chain.batch
-    extvrf_rd_addr_tmp = cur_chain.extvrf_rd_base[:]
-    for i in range(cur_chain.extvrf_rd_sz):
-      for b in range(batch):
-        for j in range(self.nlane):
-          self.mfu0_ififo.append(self.ext_vrf[extvrf_rd_addr_tmp[b]][j])
-        extvrf_rd_addr_tmp[b] += 1  
+    self.mfu0_ififo.push(self.extvrf_read_block(cur_chain))
 
     if(verbose):
       print("eVRF Output FIFO: ", self.mfu0_ififo)
   
   # Complete Extvrf  
   def exe_extverf_m_inst (self, cur_chain, verbose):
-    if cur_chain.extvrf_op_type == 'move':
+    if cur_chain.extvrf_op == EVRF_MOVE:
       if(verbose):
         print('eVRF performing move')
       self.exe_extvrf_inst_move(cur_chain, verbose)
-    elif cur_chain.extvrf_op_type == 'extvrf':
+    elif cur_chain.extvrf_op == EVRF_READ:
       if(verbose):
         print('eVRF performing read')
       self.exe_extvrf_inst_extvrf(cur_chain, verbose)
-    elif cur_chain.extvrf_op_type == 'nop':
+    elif cur_chain.extvrf_op == EVRF_NOP:
       if(verbose):
         print('eVRF performing nop')
     else:
       raise AssertionError()
 
-  #### MFU0 macro functionality ####
-  def exe_mfu0_m_inst(self, cur_chain, verbose): 
+  #### MFU macro functionality ####
+  # Apply activation, then add/sub/max, then mul to the whole (size, batch, lanes) input block of the chain
+  def mfu_block(self, in_rows, vrf0, vrf1, vrf_rd_size, vrf0_rd_base, vrf1_rd_base, act_op, add_op, mul_op, batch):
+    if((act_op not in mfu_act_ops) or (add_op not in mfu_add_ops) or (mul_op not in mfu_mul_ops)):
+      raise AssertionError()
+
+    block = in_rows.reshape(vrf_rd_size, batch, self.nlane).astype(acc_d_type)
+    if(mfu_act_ops[act_op] is not None):
+      block = mfu_act_ops[act_op](block)
+
+    # VRF operands gathered once as (size, batch, lanes)
+    if(mfu_add_ops[add_op] is not None):
+      vrf0_idx = np.arange(vrf_rd_size)[:, None] + np.asarray(vrf0_rd_base[:batch])
+      block = mfu_add_ops[add_op](vrf0[vrf0_idx], block).astype(acc_d_type)
+    if(mfu_mul_ops[mul_op] is not None):
+      vrf1_idx = np.arange(vrf_rd_size)[:, None] + np.asarray(vrf1_rd_base[:batch])
+      block = mfu_mul_ops[mul_op](vrf1[vrf1_idx], block).astype(acc_d_type)
+    return block.reshape(-1, self.nlane)
+
+  def exe_mfu_m_inst_block(self, ififo, ofifo, vrf0, vrf1, vrf_rd_size, vrf0_rd_base, vrf1_rd_base, act_op, add_op, mul_op, batch):
+    num_rows = vrf_rd_size * batch
+    ofifo.push(self.mfu_block(ififo.peek(num_rows), vrf0, vrf1, vrf_rd_size, vrf0_rd_base, vrf1_rd_base, act_op, add_op, mul_op, batch))
+    ififo.drop(num_rows)
+
+  def exe_mfu0_m_inst(self, cur_chain, verbose):
+    if(self.ref_mode):
+      self.exe_mfu0_m_inst_ref(cur_chain, verbose)
+    elif(cur_chain.mfu0_act_op==MFU_NOP and cur_chain.mfu0_add_op==MFU_NOP and cur_chain.mfu0_mul_op==MFU_NOP):
+      if(verbose):
+        print('MFU0 performing nop')
+    else:
+      if(verbose):
+        print('MFU0 performing ' + mfu_op_names[cur_chain.mfu0_act_op] + ', ' + mfu_op_names[cur_chain.mfu0_add_op] + ', ' + mfu_op_names[cur_chain.mfu0_mul_op])
+      self.exe_mfu_m_inst_block(self.mfu0_ififo, self.mfu1_ififo, self.mfu0_vrf0, self.mfu0_vrf1, cur_chain.mfu0_vrf_rd_size, \
+        cur_chain.mfu0_vrf0_rd_base, cur_chain.mfu0_vrf1_rd_base, cur_chain.mfu0_act_op, cur_chain.mfu0_add_op, \
+        cur_chain.mfu0_mul_op, cur_chain.batch)
+      if(verbose):
+        print("MFU0 Output FIFO: ", self.mfu1_ififo)
+
+  def exe_mfu1_m_inst(self, cur_chain, verbose):
+    if(self.ref_mode):
+      self.exe_mfu1_m_inst_ref(cur_chain, verbose)
+    elif(cur_chain.mfu1_act_op==MFU_NOP and cur_chain.mfu1_add_op==MFU_NOP and cur_chain.mfu1_mul_op==MFU_NOP):
+      if(verbose):
+        print('MFU1 performing nop')
+    else:
+      if(verbose):
+        print('MFU1 performing ' + mfu_op_names[cur_chain.mfu1_act_op] + ', ' + mfu_op_names[cur_chain.mfu1_add_op] + ', ' + mfu_op_names[cur_chain.mfu1_mul_op])
+      self.exe_mfu_m_inst_block(self.mfu1_ififo, self.mfu1_ofifo, self.mfu1_vrf0, self.mfu1_vrf1, cur_chain.mfu1_vrf_rd_size, \
+        cur_chain.mfu1_vrf0_rd_base, cur_chain.mfu1_vrf1_rd_base, cur_chain.mfu1_act_op, cur_chain.mfu1_add_op, \
+        cur_chain.mfu1_mul_op, cur_chain.batch)
+      if(verbose):
+        print("MFU1 Output FIFO: ", self.mfu1_ofifo)
+
+  #### MFU0 macro functionality (reference, element by element) ####
+  def exe_mfu0_m_inst_ref(self, cur_chain, verbose): 
     batch = cur_chain.batch
-    mfu0_vrf0_idx = cur_chain.mfu0_vrf0_rd_base[:]
-    mfu0_vrf1_idx = cur_chain.mfu0_vrf1_rd_base[:]
+    mfu0_vrf0_idx = list(cur_chain.mfu0_vrf0_rd_base)
+    mfu0_vrf1_idx = list(cur_chain.mfu0_vrf1_rd_base)
 
-    if(cur_chain.mfu0_act_op_type=='nop' and cur_chain.mfu0_add_op_type=='nop' and cur_chain.mfu0_mul_op_type=='nop'):
+    if(cur_chain.mfu0_act_op==MFU_NOP and cur_chain.mfu0_add_op==MFU_NOP and cur_chain.mfu0_mul_op==MFU_NOP):
       if(verbose):
         print('MFU0 performing nop')
     else:
       if(verbose):
-        print('MFU0 performing ' + cur_chain.mfu0_act_op_type + ', ' + cur_chain.mfu0_add_op_type + ', ' + cur_chain.mfu0_mul_op_type)
+        print('MFU0 performing ' + mfu_op_names[cur_chain.mfu0_act_op] + ', ' + mfu_op_names[cur_chain.mfu0_add_op] + ', ' + mfu_op_names[cur_chain.mfu0_mul_op])
       for i in range (cur_chain.mfu0_vrf_rd_size):
         for b in range(batch):
+          in_row = self.mfu0_ififo.pop(1)[0]
+          out_row = np.zeros(self.nlane, dtype=acc_d_type)
           for j in range (self.nlane):
-            if(cur_chain.mfu0_act_op_type=='nop' or cur_chain.mfu0_act_op_type=='move'):
-              temp = (self.mfu0_ififo.pop(0)).astype(acc_d_type)
-            elif(cur_chain.mfu0_act_op_type=='relu'):
-              temp = myReLU((self.mfu0_ififo.pop(0)).astype(acc_d_type))
-            elif(cur_chain.mfu0_act_op_type=='tanh'):
-              temp = myTanh((self.mfu0_ififo.pop(0)).astype(acc_d_type))
-            elif(cur_chain.mfu0_act_op_type=='sig'):
-              temp = mySigmoid((self.mfu0_ififo.pop(0)).astype(acc_d_type))
+            if(cur_chain.mfu0_act_op==MFU_NOP or cur_chain.mfu0_act_op==MFU_MOVE):
+              temp = in_row[j].astype(acc_d_type)
+            elif(cur_chain.mfu0_act_op==MFU_RELU):
+              temp = myReLU(in_row[j].astype(acc_d_type))
+            elif(cur_chain.mfu0_act_op==MFU_TANH):
+              temp = myTanh(in_row[j].astype(acc_d_type))
+            elif(cur_chain.mfu0_act_op==MFU_SIG):
+              temp = mySigmoid(in_row[j].astype(acc_d_type))
             else:
               raise AssertionError()
 
-            if(cur_chain.mfu0_add_op_type=='nop' or cur_chain.mfu0_add_op_type=='move'):
+            if(cur_chain.mfu0_add_op==MFU_NOP or cur_chain.mfu0_add_op==MFU_MOVE):
               temp = temp
-            elif(cur_chain.mfu0_add_op_type=='add'):
+            elif(cur_chain.mfu0_add_op==MFU_ADD):
               temp = (self.mfu0_vrf0[mfu0_vrf0_idx[b]][j] + temp).astype(acc_d_type)
-            elif(cur_chain.mfu0_add_op_type=='sub_a_b'):
+            elif(cur_chain.mfu0_add_op==MFU_SUB_A_B):
               temp = (temp - self.mfu0_vrf0[mfu0_vrf0_idx[b]][j]).astype(acc_d_type)
-            elif(cur_chain.mfu0_add_op_type=='sub_b_a'):
+            elif(cur_chain.mfu0_add_op==MFU_SUB_B_A):
               temp = (self.mfu0_vrf0[mfu0_vrf0_idx[b]][j] - temp).astype(acc_d_type)
-            elif(cur_chain.mfu0_add_op_type=='max'):
+            elif(cur_chain.mfu0_add_op==MFU_MAX):
               temp = max(self.mfu0_vrf0[mfu0_vrf0_idx[b]][j],temp).astype(acc_d_type)
             else:
               raise AssertionError()
 
-            if(cur_chain.mfu0_mul_op_type=='nop' or cur_chain.mfu0_mul_op_type=='move'):
+            if(cur_chain.mfu0_mul_op==MFU_NOP or cur_chain.mfu0_mul_op==MFU_MOVE):
               temp = temp
-            elif(cur_chain.mfu0_mul_op_type=='mul'):
+            elif(cur_chain.mfu0_mul_op==MFU_MUL):
               temp = (self.mfu0_vrf1[mfu0_vrf1_idx[b]][j] * temp).astype(acc_d_type)
 
             else:
               raise AssertionError()
 
-            self.mfu1_ififo.append(temp)
+            out_row[j] = temp
 
+          self.mfu1_ififo.push(out_row)
           mfu0_vrf0_idx[b] = mfu0_vrf0_idx[b] + 1
           mfu0_vrf1_idx[b] = mfu0_vrf1_idx[b] + 1
 
@@ -310,55 +499,58 @@ class npu_isa_sim (object):
         print("MFU0 Output FIFO: ", self.mfu1_ififo)
 
 
-  #### MFU1 macro functionality ####
-  def exe_mfu1_m_inst(self, cur_chain, verbose): 
+  #### MFU1 macro functionality (reference, element by element) ####
+  def exe_mfu1_m_inst_ref(self, cur_chain, verbose): 
     batch = cur_chain.batch
-    mfu1_vrf0_idx = cur_chain.mfu1_vrf0_rd_base[:]
-    mfu1_vrf1_idx = cur_chain.mfu1_vrf1_rd_base[:]
+    mfu1_vrf0_idx = list(cur_chain.mfu1_vrf0_rd_base)
+    mfu1_vrf1_idx = list(cur_chain.mfu1_vrf1_rd_base)
 
-    if(cur_chain.mfu1_act_op_type=='nop' and cur_chain.mfu1_add_op_type=='nop' and cur_chain.mfu1_mul_op_type=='nop'):
+    if(cur_chain.mfu1_act_op==MFU_NOP and cur_chain.mfu1_add_op==MFU_NOP and cur_chain.mfu1_mul_op==MFU_NOP):
       if(verbose):
         print('MFU1 performing nop')
     else:
       if(verbose):
-        print('MFU1 performing ' + cur_chain.mfu1_act_op_type + ', ' + cur_chain.mfu1_add_op_type + ', ' + cur_chain.mfu1_mul_op_type)
+        print('MFU1 performing ' + mfu_op_names[cur_chain.mfu1_act_op] + ', ' + mfu_op_names[cur_chain.mfu1_add_op] + ', ' + mfu_op_names[cur_chain.mfu1_mul_op])
       for i in range (cur_chain.mfu1_vrf_rd_size):
         for b in range(batch):
+          in_row = self.mfu1_ififo.pop(1)[0]
+          out_row = np.zeros(self.nlane, dtype=acc_d_type)
           for j in range (self.nlane):
-            if(cur_chain.mfu1_act_op_type=='nop' or cur_chain.mfu1_act_op_type=='move'):
-              temp = (self.mfu1_ififo.pop(0)).astype(acc_d_type)
-            elif(cur_chain.mfu1_act_op_type=='relu'):
-              temp = myReLU((self.mfu1_ififo.pop(0)).astype(acc_d_type))
-            elif(cur_chain.mfu1_act_op_type=='tanh'):
-              temp = myTanh((self.mfu1_ififo.pop(0)).astype(acc_d_type))
-            elif(cur_chain.mfu1_act_op_type=='sig'):
-              temp = mySigmoid((self.mfu1_ififo.pop(0)).astype(acc_d_type))
+            if(cur_chain.mfu1_act_op==MFU_NOP or cur_chain.mfu1_act_op==MFU_MOVE):
+              temp = in_row[j].astype(acc_d_type)
+            elif(cur_chain.mfu1_act_op==MFU_RELU):
+              temp = myReLU(in_row[j].astype(acc_d_type))
+            elif(cur_chain.mfu1_act_op==MFU_TANH):
+              temp = myTanh(in_row[j].astype(acc_d_type))
+            elif(cur_chain.mfu1_act_op==MFU_SIG):
+              temp = mySigmoid(in_row[j].astype(acc_d_type))
             else:
               raise AssertionError()
 
-            if(cur_chain.mfu1_add_op_type=='nop' or cur_chain.mfu1_add_op_type=='move'):
+            if(cur_chain.mfu1_add_op==MFU_NOP or cur_chain.mfu1_add_op==MFU_MOVE):
               temp = temp
-            elif(cur_chain.mfu1_add_op_type=='add'):
+            elif(cur_chain.mfu1_add_op==MFU_ADD):
               temp = (self.mfu1_vrf0[mfu1_vrf0_idx[b]][j] + temp).astype(acc_d_type)
-            elif(cur_chain.mfu1_add_op_type=='sub_a_b'):
+            elif(cur_chain.mfu1_add_op==MFU_SUB_A_B):
               temp = (temp - self.mfu1_vrf0[mfu1_vrf0_idx[b]][j]).astype(acc_d_type)
-            elif(cur_chain.mfu1_add_op_type=='sub_b_a'):
+            elif(cur_chain.mfu1_add_op==MFU_SUB_B_A):
               temp = (self.mfu1_vrf0[mfu1_vrf0_idx[b]][j] - temp).astype(acc_d_type)
-            elif(cur_chain.mfu1_add_op_type=='max'):
+            elif(cur_chain.mfu1_add_op==MFU_MAX):
               temp = max(self.mfu1_vrf0[mfu1_vrf0_idx[b]][j],temp).astype(acc_d_type)
             else:
               raise AssertionError()
 
-            if(cur_chain.mfu1_mul_op_type=='nop' or cur_chain.mfu1_mul_op_type=='move'):
+            if(cur_chain.mfu1_mul_op==MFU_NOP or cur_chain.mfu1_mul_op==MFU_MOVE):
               temp = temp
-            elif(cur_chain.mfu1_mul_op_type=='mul'):
+            elif(cur_chain.mfu1_mul_op==MFU_MUL):
               temp = (self.mfu1_vrf1[mfu1_vrf1_idx[b]][j] * temp).astype(acc_d_type)
           
             else:
               raise AssertionError()
 
-            self.mfu1_ofifo.append(temp)
+            out_row[j] = temp
 
+          self.mfu1_ofifo.push(out_row)
           mfu1_vrf0_idx[b] = mfu1_vrf0_idx[b] + 1
           mfu1_vrf1_idx[b] = mfu1_vrf1_idx[b] + 1 
 
@@ -366,135 +558,131 @@ class npu_isa_sim (object):
         print("MFU1 Output FIFO: ", self.mfu1_ififo) 
 
   #### Loader macro functionality ####
+  # Write a (size, batch, lanes) block to the destination VRF of the chain, word i of batch entry b going to wr_base[b] + i
+  def write_vrf(self, vrf_id, vrf_wr_base, block, batch):
+    if(vrf_id == VRF_NONE):
+      return
+    vrf_wr_addr = np.arange(block.shape[0])[:, None] + vrf_wr_base[:batch]
+    self.vrfs[vrf_id][vrf_wr_addr] = block
+
+  # Write the loaded rows to both destinations (both use the size of the first one) and to the output buffer
+  def ld_write_block(self, cur_chain, rows):
+    batch = cur_chain.batch
+    block = rows.reshape(cur_chain.vrf_id0_wr_size, batch, self.nlane)
+    self.write_vrf(cur_chain.vrf_id0, cur_chain.vrf_id0_wr_base, block, batch)
+    self.write_vrf(cur_chain.vrf_id1, cur_chain.vrf_id1_wr_base, block, batch)
+    if(cur_chain.write_to_obuf == 1):
+      self.obuf_q.extend(rows)
+
   # Loader for the input   
   def exe_ld_inst_in(self, cur_chain):
-    curr_obuf_q = []
-    for i in range (cur_chain.vrf_id0_wr_size):
-      for b in range(cur_chain.batch):
-        vrf_addr = cur_chain.vrf_id0_wr_base[b] + i
-        wb_data = self.ibuf_q.pop(0)
-
-        # Loading to MVU VRFs
-        seprator = ''
-        id_str_0 = cur_chain.vrf_id0_op
-        src_0 = seprator.join(id_str_0[0:3])
-        id_str_1 = cur_chain.vrf_id1_op
-        src_1 = seprator.join(id_str_1[0:3])
-        if(src_0 == 'mvu'):
-          m = re.search('mvu(\d+)',id_str_0,re.IGNORECASE)
-          vrf_id = int(m.group(1))
-          self.mvu_vrfs[vrf_id][vrf_addr][:]= wb_data
-        if(src_1 == 'mvu'):
-          m = re.search('mvu(\d+)',id_str_0,re.IGNORECASE)
-          vrf_id = int(m.group(1))
-          self.mvu_vrfs[vrf_id][vrf_addr][:]= wb_data
-
-        # Loading to eVRF
-        if((cur_chain.vrf_id0_op=='extvrf') or (cur_chain.vrf_id1_op=='extvrf')):
-          self.ext_vrf[vrf_addr][:]= wb_data
-        # Loading to MFU0 VRF0
-        elif((cur_chain.vrf_id0_op=='mfu0.vrf0') or (cur_chain.vrf_id1_op=='mfu0.vrf0')):
-          self.mfu0_vrf0[vrf_addr][:]= wb_data
-        # Loading to MFU0 VRF1
-        elif((cur_chain.vrf_id0_op=='mfu0.vrf1') or (cur_chain.vrf_id1_op=='mfu0.vrf1')):
-          self.mfu0_vrf1[vrf_addr][:]= wb_data
-        # Loading to MFU1 VRF0
-        elif((cur_chain.vrf_id0_op=='mfu1.vrf0') or (cur_chain.vrf_id1_op=='mfu1.vrf0')):
-          self.mfu1_vrf0[vrf_addr][:]= wb_data
-        # Loading to MFU1 VRF1
-        elif((cur_chain.vrf_id0_op=='mfu1.vrf1') or (cur_chain.vrf_id1_op=='mfu1.vrf1')):
-          self.mfu1_vrf1[vrf_addr][:]= wb_data
-
-        if(cur_chain.write_to_obuf == 1):
-          self.obuf_q.append(wb_data)
+    self.ld_write_block(cur_chain, self.ibuf_q.pop(cur_chain.vrf_id0_wr_size * cur_chain.batch))
 
   # flush is used to make the fifo empty if loader wb instruction don't read all the data in fifo
   def exe_ld_inst_flush(self, cur_chain, verbose):
-    for i in range(cur_chain.vrf_id0_wr_size):
-      for b in range(cur_chain.batch):
-        for j in range (self.nlane):
-          temp_nul = self.mfu1_ofifo.pop(0)
+    self.mfu1_ofifo.drop(cur_chain.vrf_id0_wr_size * cur_chain.batch)
     if(verbose):
       print("Loader Output FIFO: ", self.mfu1_ofifo)
      
-  # Loader for write back 
+  # Loader for write back
   def exe_ld_inst_wb(self, cur_chain, verbose):
     if(verbose):
       print("Loader Output FIFO: ", self.mfu1_ofifo)
-    seprator = ''
-    id_str_0 = cur_chain.vrf_id0_op
-    id_str_1 = cur_chain.vrf_id1_op
-    curr_obuf_q = []
-    for i in range(cur_chain.vrf_id0_wr_size):
-      for b in range(cur_chain.batch):
-        curr_obuf_val = []
-        tmp_addr0 = cur_chain.vrf_id0_wr_base[b] + i
-        tmp_addr1 = cur_chain.vrf_id1_wr_base[b] + i
-        for j in range (self.nlane):
-          wb_data = self.mfu1_ofifo.pop(0)
-          curr_obuf_val.append(wb_data)
-          # wb0:write back to the first destination
-          if (seprator.join(id_str_0[0:3]) == 'mvu'):
-            m = re.search('mvu(\d+)',id_str_0,re.IGNORECASE)
-            id_int_0 = int(m.group(1))
-            self.mvu_vrfs[id_int_0][tmp_addr0][j]= wb_data
-            #if (self.mvu_vrfs[id_int_0][tmp_addr0][j] == -128):
-            #  self.mvu_vrfs[id_int_0][tmp_addr0][j] = 0
-          if(cur_chain.vrf_id0_op=='mfu0.vrf0'):
-            self.mfu0_vrf0[tmp_addr0][j]= wb_data
-          if(cur_chain.vrf_id0_op=='mfu0.vrf1'):
-            self.mfu0_vrf1[tmp_addr0][j] = wb_data 
-          if(cur_chain.vrf_id0_op=='mfu1.vrf0'):
-            self.mfu1_vrf0[tmp_addr0][j] = wb_data
-          if(cur_chain.vrf_id0_op=='mfu1.vrf1'):
-            self.mfu1_vrf1[tmp_addr0][j] = wb_data 
-          if(cur_chain.vrf_id0_op=='extvrf'):
-            self.ext_vrf[tmp_addr0][j] = wb_data 
-          # wb1:write back to the second destination 
-          if (seprator.join(id_str_1[0:3]) == 'mvu'):
-            m = re.search('mvu(\d+)',id_str_1,re.IGNORECASE)
-            id_int_1 = int(m.group(1))
-            self.mvu_vrfs[id_int_1][tmp_addr1][j]= wb_data
-            #if (self.mvu_vrfs[id_int_1][tmp_addr1][j] == -128):
-            #  self.mvu_vrfs[id_int_1][tmp_addr1][j] = 0
-          if(cur_chain.vrf_id1_op=='mfu0.vrf0'):
-            self.mfu0_vrf0[tmp_addr1][j] = wb_data
-          if(cur_chain.vrf_id1_op=='mfu0.vrf1'):
-            self.mfu0_vrf1[tmp_addr1][j] = wb_data 
-          if(cur_chain.vrf_id1_op=='mfu1.vrf0'):
-            self.mfu1_vrf0[tmp_addr1][j] = wb_data
-          if(cur_chain.vrf_id1_op=='mfu1.vrf1'):
-            self.mfu1_vrf1[tmp_addr1][j] = wb_data 
-          if(cur_chain.vrf_id1_op=='extvrf'):
-            self.ext_vrf[tmp_addr1][j] = wb_data 
-        if(cur_chain.write_to_obuf == 1):
-          self.obuf_q.append(curr_obuf_val)
+    self.ld_write_block(cur_chain, self.mfu1_ofifo.pop(cur_chain.vrf_id0_wr_size * cur_chain.batch))
 
   # Complete loader 
   def exe_ld_m_inst (self, cur_chain, verbose):
-    if cur_chain.loader_src == 'in':
+    if cur_chain.ld_src == LD_IN:
       if(verbose):
         print('Loader performing input load')
       self.exe_ld_inst_in(cur_chain)
-    elif(cur_chain.loader_src =='wb'):
+    elif(cur_chain.ld_src == LD_WB):
       if(verbose):
         print('Loader performing write back')
       self.exe_ld_inst_wb(cur_chain, verbose)
-    elif(cur_chain.loader_src =='flush'):
+    elif(cur_chain.ld_src == LD_FLUSH):
       if(verbose):
         print('Loader performing flush')
       self.exe_ld_inst_flush(cur_chain, verbose)
-    elif(cur_chain.loader_src =='nop'):
+    elif(cur_chain.ld_src == LD_NOP):
       if(verbose):
         print('Loader performing nop')
     else:
       raise AssertionError()
   
+  #### Dataflow execution ####
+  # Rows produced by the previous stage of the chain are handed to the next stage directly. They only go through
+  # the FIFO between the two stages if it still holds older rows, or if the next stage is not part of the chain.
+  def dataflow_take(self, pending, ififo, num_rows):
+    if(pending is not None):
+      pending_fifo, rows = pending
+      if((pending_fifo is ififo) and (len(ififo) == 0) and (rows.shape[0] >= num_rows)):
+        if(rows.shape[0] > num_rows):
+          ififo.push(rows[num_rows:])
+        return rows[:num_rows]
+      pending_fifo.push(rows)
+    return ififo.pop(num_rows)
+
+  def dataflow_flush(self, pending):
+    if(pending is not None):
+      pending[0].push(pending[1])
+    return None
+
+  # execute all macro insts in the chain as one array pipeline: MVU -> eVRF -> MFU0 -> MFU1 -> loader
+  def step_dataflow(self, cur_chain, verbose):
+    batch = cur_chain.batch
+    pending = None
+
+    if(cur_chain.mvu_op == MVU_MATVEC):
+      pending = (self.mvu_ofifo, self.mvu_matvec_block(cur_chain))
+    elif(cur_chain.mvu_op != MVU_NOP):
+      raise AssertionError()
+
+    if(cur_chain.extvrf_op == EVRF_MOVE):
+      pending = (self.mfu0_ififo, self.dataflow_take(pending, self.mvu_ofifo, cur_chain.extvrf_rd_sz * batch))
+    elif(cur_chain.extvrf_op == EVRF_READ):
+      pending = self.dataflow_flush(pending)
+      pending = (self.mfu0_ififo, self.extvrf_read_block(cur_chain))
+    elif(cur_chain.extvrf_op != EVRF_NOP):
+      raise AssertionError()
+
+    if(not (cur_chain.mfu0_act_op == MFU_NOP and cur_chain.mfu0_add_op == MFU_NOP and cur_chain.mfu0_mul_op == MFU_NOP)):
+      in_rows = self.dataflow_take(pending, self.mfu0_ififo, cur_chain.mfu0_vrf_rd_size * batch)
+      pending = (self.mfu1_ififo, self.mfu_block(in_rows, self.mfu0_vrf0, self.mfu0_vrf1, cur_chain.mfu0_vrf_rd_size, \
+        cur_chain.mfu0_vrf0_rd_base, cur_chain.mfu0_vrf1_rd_base, cur_chain.mfu0_act_op, cur_chain.mfu0_add_op, \
+        cur_chain.mfu0_mul_op, batch))
+
+    if(not (cur_chain.mfu1_act_op == MFU_NOP and cur_chain.mfu1_add_op == MFU_NOP and cur_chain.mfu1_mul_op == MFU_NOP)):
+      in_rows = self.dataflow_take(pending, self.mfu1_ififo, cur_chain.mfu1_vrf_rd_size * batch)
+      pending = (self.mfu1_ofifo, self.mfu_block(in_rows, self.mfu1_vrf0, self.mfu1_vrf1, cur_chain.mfu1_vrf_rd_size, \
+        cur_chain.mfu1_vrf0_rd_base, cur_chain.mfu1_vrf1_rd_base, cur_chain.mfu1_act_op, cur_chain.mfu1_add_op, \
+        cur_chain.mfu1_mul_op, batch))
+
+    if(cur_chain.ld_src == LD_WB):
+      self.ld_write_block(cur_chain, self.dataflow_take(pending, self.mfu1_ofifo, cur_chain.vrf_id0_wr_size * batch))
+      pending = None
+    elif(cur_chain.ld_src == LD_FLUSH):
+      self.dataflow_take(pending, self.mfu1_ofifo, cur_chain.vrf_id0_wr_size * batch)
+      pending = None
+    elif(cur_chain.ld_src == LD_IN):
+      self.exe_ld_inst_in(cur_chain)
+    elif(cur_chain.ld_src != LD_NOP):
+      raise AssertionError()
+
+    # Rows not consumed inside the chain stay in their FIFO for the following chains
+    self.dataflow_flush(pending)
+    if(verbose):
+      print('Chain executed in dataflow mode')
+
   # execute all macro insts in the chain
   def step(self, verbose=0):
-    cur_chain = self.inst_q.pop(0)
+    cur_chain = self.inst_q[self.pc]
+    self.pc += 1
     if(verbose):
-      cur_chain.print_chain()
+      print_chain(cur_chain)
+    if(self.dataflow and not self.ref_mode):
+      self.step_dataflow(cur_chain, verbose)
+      return
     self.exe_mvu_m_inst(cur_chain, verbose)
     self.exe_extverf_m_inst(cur_chain, verbose)
     self.exe_mfu0_m_inst(cur_chain, verbose)
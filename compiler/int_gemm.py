@@ -0,0 +1,32 @@
+import numpy as np
+
+acc_d_type = np.int32
+
+### Exact integer GEMM through floating point BLAS
+# Every partial sum of a dot product of length k is an integer bounded by k * max|a| * max|b|. As long as that bound
+# fits in the significand (2^24 for float32, 2^53 for float64) every product and every addition is exact, whatever
+# the order or blocking the BLAS library uses, so the float result is the exact integer result.
+FP32_EXACT_BOUND = 2 ** 24
+FP64_EXACT_BOUND = 2 ** 53
+
+def max_abs(x):
+   if(x.size == 0):
+      return 0
+   return max(-int(x.min()), int(x.max()))
+
+def exact_bound(a, b):
+   return a.shape[-1] * max_abs(a) * max_abs(b)
+
+# a (m, k) x b (k, n) or b (k,) for integer a and b, wrapped to int32 (the same result as accumulating in int32)
+def int_gemm(a, b):
+   a = np.asarray(a)
+   b = np.asarray(b)
+   bound = exact_bound(a, b)
+   if(bound <= FP32_EXACT_BOUND):
+      result = np.dot(a.astype(np.float32), b.astype(np.float32))
+   elif(bound <= FP64_EXACT_BOUND):
+      result = np.dot(a.astype(np.float64), b.astype(np.float64))
+   else:
+      # Bound exceeded: exact modulo 2^64, which is enough for the int32 wrap below
+      result = np.dot(a.astype(np.int64), b.astype(np.int64))
+   return result.astype(np.int64).astype(acc_d_type)
@@ -0,0 +1,80 @@
+import os
+import numpy as np
+
+### MIF files written straight from the program arrays
+# Every line is formatted with lookup tables on whole arrays and each file is written at once.
+
+# ASCII characters of every byte value, most significant bit / nibble first
+BIN_CHARS = np.array([[ord('1') if (b >> (7 - i)) & 1 else ord('0') for i in range(8)] for b in range(256)], dtype=np.uint8)
+HEX_CHARS = np.array([[ord(c) for c in format(b, '02x')] for b in range(256)], dtype=np.uint8)
+
+# Lanes packed into one word per row (lane 0 in the lowest byte), as a bytes array with the highest lane first
+def lane_bytes(values):
+   return (np.asarray(values).astype(np.int64) & 0xFF).astype(np.uint8)[:, ::-1]
+
+# Binary / hex digits of every row of a bytes array, as an (n, 8 * bytes) / (n, 2 * bytes) array of characters
+def bin_chars(data):
+   return BIN_CHARS[data].reshape(len(data), -1)
+
+def hex_chars(data):
+   return HEX_CHARS[data].reshape(len(data), -1)
+
+# MIF content lines '<address>: <data>;' of an (n, width) array of characters
+def mif_lines(data):
+   num_lines, width = data.shape
+   chunks = []
+   start = 0
+   digits = 1
+   # Addresses with the same number of digits give lines of the same length
+   while(start < num_lines):
+      end = min(num_lines, 10 ** digits)
+      addrs = np.arange(start, end)
+      lines = np.empty((end - start, digits + width + 4), dtype=np.uint8)
+      for d in range(digits):
+         lines[:, d] = ord('0') + (addrs // (10 ** (digits - 1 - d))) % 10
+      lines[:, digits:digits + 2] = np.frombuffer(b': ', dtype=np.uint8)
+      lines[:, digits + 2:digits + 2 + width] = data[start:end]
+      lines[:, -2:] = np.frombuffer(b';\n', dtype=np.uint8)
+      chunks.append(lines.tobytes())
+      start = end
+      digits += 1
+   return b''.join(chunks)
+
+def write_mif(path, data, width, radix):
+   header = 'DEPTH = ' + str(len(data)) + ';\nWIDTH = ' + str(width) + ';\nADDRESS_RADIX = DEC;\nDATA_RADIX = ' + radix + \
+      ';\nCONTENT\nBEGIN\n'
+   with open(path, 'wb') as mif_file:
+      mif_file.write(header.encode() + mif_lines(data) + b'END;\n')
+
+'''
+Write the MRF (split per DSP block), input, output (also as lower/upper halves) and instruction MIF files to dump_dir.
+mrfs is (tiles, dpes, depth, lanes), inputs and outputs are (vectors, lanes) and words are the encoded instructions
+(encode_program) of inst_width bits.
+'''
+def write_mif_files(dump_dir, mrfs, inputs, outputs, words, inst_width):
+   num_tiles, num_dpes, mrf_depth, num_lanes = mrfs.shape
+   num_dsps = int(num_lanes / 10)
+
+   # MRFs: 8 bits per lane, highest lane first, split in equal chunks for the DSP blocks of a DPE
+   mrf_width = num_lanes * 8
+   step = int(mrf_width / num_dsps)
+   for t in range(num_tiles):
+      for d in range(num_dpes):
+         chars = bin_chars(lane_bytes(mrfs[t][d]))
+         name = os.path.join(dump_dir, 'mvu-mrf' + format(t * num_dpes + d, '03d'))
+         for i in range(num_dsps):
+            write_mif(name + '_' + str(i) + '.mif', chars[:, step * i:step * (i + 1)], int(mrf_width / 4), 'BIN')
+
+   # Inputs and outputs: 2 hex digits per lane, highest lane first
+   chars = hex_chars(lane_bytes(inputs).reshape(-1, num_lanes))
+   write_mif(os.path.join(dump_dir, 'input.mif'), chars, chars.shape[1] * 4, 'HEX')
+   chars = hex_chars(lane_bytes(outputs).reshape(-1, num_lanes))
+   half = int(chars.shape[1] / 2)
+   write_mif(os.path.join(dump_dir, 'output_lower.mif'), chars[:, half:], chars.shape[1] * 2, 'HEX')
+   write_mif(os.path.join(dump_dir, 'output_upper.mif'), chars[:, :half], chars.shape[1] * 2, 'HEX')
+   write_mif(os.path.join(dump_dir, 'output.mif'), chars, chars.shape[1] * 4, 'HEX')
+
+   # Instructions (most significant bit first) followed by an all-ones end marker
+   bits = np.unpackbits(words, axis=1, bitorder='little')[:, inst_width - 1::-1]
+   chars = np.concatenate((bits + ord('0'), np.full((1, inst_width), ord('1'), dtype=np.uint8))).astype(np.uint8)
+   write_mif(os.path.join(dump_dir, 'top_sched.mif'), chars, inst_width, 'BIN')
@@ -0,0 +1,35 @@
+import os
+os.environ['TF_CPP_MIN_LOG_LEVEL'] = "2"
+from tensorflow import keras
+
+import npu_model
+
+### Keras frontend: an NPUSequential model is compiled through the equivalent npu_model.NPUModel
+class NPUSequential(keras.Sequential):
+    def __init__(self, layers=None, name=None):
+        super(NPUSequential, self).__init__(layers, name)
+
+    # NPU model description of the Keras layers
+    def to_npu_model(self):
+        model_layers = []
+        for layer in self.layers:
+            config = layer.get_config()
+            if isinstance(layer, keras.layers.Dense):
+                model_layers.append(npu_model.Dense(config['units'], config['activation'], layer.name))
+            elif isinstance(layer, keras.layers.Embedding):
+                model_layers.append(npu_model.Embedding(config['input_dim'], config['output_dim'], layer.name))
+            elif isinstance(layer, keras.layers.SimpleRNN):
+                model_layers.append(npu_model.SimpleRNN(config['units'], config['activation'], layer.name))
+            elif isinstance(layer, keras.layers.GRU):
+                model_layers.append(npu_model.GRU(config['units'], config['activation'], config['recurrent_activation'], layer.name))
+            elif isinstance(layer, keras.layers.LSTM):
+                model_layers.append(npu_model.LSTM(config['units'], config['activation'], config['recurrent_activation'], layer.name))
+            elif isinstance(layer, keras.layers.experimental.preprocessing.TextVectorization):
+                model_layers.append(npu_model.TextVectorization(config['max_tokens'], config['output_sequence_length'], layer.name))
+            else:
+                print(layer.name+' type is not supported by NPU')
+                exit(0)
+        return npu_model.NPUModel(model_layers, self.name)
+
+    def compile_for_npu(self, npu, inputs):
+        self.to_npu_model().compile_for_npu(npu, inputs)
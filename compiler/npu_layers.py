@@ -1,10 +1,4 @@
-import math
 import numpy as np
-import os
-os.environ['TF_CPP_MIN_LOG_LEVEL'] = "2"
-import tensorflow as tf
-from tensorflow import keras
-from keras import layers
 
 from compiler import *  # noqa: F403
 
@@ -421,145 +415,3 @@ def npu_preprocessing(npu, max_tokens, seq_length, num_inputs):
                 x[t][k][i] = npu.malloc(layer_name, input_size, None, 'mvu_vrf', input_data)
 
     npu.operands.append(x)
-
-class NPUSequential(keras.Sequential):
-    def __init__(self, layers=None, name=None):
-        super(NPUSequential, self).__init__(layers, name)
-
-    def compile_for_npu(self, npu, inputs):
-        unsupported_layers = []
-        ops = 0
-        for i in range(len(self.layers)):
-            config = self.layers[i].get_config()
-            layer_name = self.layers[i].name
-            layer_idx = i
-            weights = self.layers[i].get_weights()
-
-            if isinstance(self.layers[i], keras.layers.Dense):
-                w_data = np.transpose(weights[0])
-                input_size = int(w_data.shape[1])
-                output_size = int(w_data.shape[0])
-                w_data = np.random.randint(0, 127, size=(output_size, input_size), dtype=np.int8)
-                if (i == 0):
-                    num_inputs = int(math.ceil(int(inputs.shape[0]) / 6.0)) * 6
-                else:
-                    num_inputs = len(npu.operands[i-1][0]) * 6
-                input_data = np.random.randint(-128, 127, size=(num_inputs, input_size), dtype=np.int8)
-                dest_memspace = 'mvu_vrf'
-                activation = config['activation']
-                style = 'normal'
-                npu_dense(npu, layer_name, layer_idx, num_inputs, 1, input_size, output_size, w_data, dest_memspace, input_data, activation, style, i==len(self.layers)-1)
-                ops = ops + (num_inputs * input_size * output_size * 2)
-            
-            elif isinstance(self.layers[i], keras.layers.Embedding):
-                w_data = np.transpose(weights[0])
-                input_size = config['input_dim']
-                output_size = config['output_dim']
-                dest_memspace = 'mvu_vrf'
-                if(i == 0):
-                    num_inputs = int(math.ceil(int(inputs.shape[0]) / 6.0)) * 6
-                    time_steps = inputs.shape[1]
-                else:
-                    num_inputs = len(npu.operands[i-1][0]) * 6
-                    time_steps = len(npu.operands[i-1])
-                activation = None
-                style = 'embedding'
-                npu_dense(npu, layer_name, layer_idx, num_inputs, time_steps, input_size, output_size, w_data, dest_memspace, inputs, activation, style)
-                ops = ops + (num_inputs * time_steps * input_size * output_size * 2)
-
-            elif isinstance(self.layers[i], keras.layers.SimpleRNN):
-                wx_data = weights[0]
-                wh_data = weights[1]
-                input_size = int(wx_data.shape[0])
-                units = config['units']
-                output_size = int(wx_data.shape[1])
-                wx_data = np.random.randint(0, 127, size=(output_size, input_size), dtype=np.int8)
-                wh_data = np.random.randint(0, 127, size=(output_size, input_size), dtype=np.int8)
-                if(i == 0):
-                    time_steps = inputs.shape[0]
-                    num_inputs = int(math.ceil(int(inputs.shape[1]) / 6.0)) * 6
-                    assert input_size == int(inputs.shape[2]), 'Incompatible input dimensions for ('+layer_name+')'
-                else:
-                    time_steps = len(npu.operands[i-1])
-                    num_inputs = len(npu.operands[i-1][0]) * 6
-                input_data = np.random.randint(-128, 127, size=(time_steps, num_inputs, input_size), dtype=np.int8)
-                dest_memspace = 'mvu_vrf'
-                activation = config['activation']
-                assert activation in ['relu', 'sigmoid', 'tanh'], 'Specified activation function for ('+layer_name+') is not supported by NPU'
-                npu_rnn(npu, layer_name, layer_idx, time_steps, num_inputs, input_size, units, output_size, wx_data, wh_data, dest_memspace, input_data, activation)
-                ops = ops + (time_steps * num_inputs * input_size * output_size * 2 * 2)
-
-            elif isinstance(self.layers[i], keras.layers.GRU):
-                # Dimensions 
-                input_size = int(weights[0].shape[0])
-                output_size = int(int(weights[0].shape[1]) / 3)
-                units = config['units']
-                if(i == 0):
-                    time_steps = int(inputs.shape[0])
-                    num_inputs = int(math.ceil(int(inputs.shape[1]) / 6.0)) * 6
-                    assert input_size == int(inputs.shape[2]), 'Incompatible input dimensions for ('+layer_name+')'
-                else:
-                    time_steps = len(npu.operands[i-1])
-                    num_inputs = len(npu.operands[i-1][0]) * 6
-                # Weight Matrices
-                uz_data = np.random.randint(0, 127, size=(output_size, input_size), dtype=np.int8)
-                uc_data = np.random.randint(0, 127, size=(output_size, input_size), dtype=np.int8)
-                ur_data = np.random.randint(0, 127, size=(output_size, input_size), dtype=np.int8)
-                wz_data = np.random.randint(0, 127, size=(output_size, input_size), dtype=np.int8)
-                wc_data = np.random.randint(0, 127, size=(output_size, input_size), dtype=np.int8)
-                wr_data = np.random.randint(0, 127, size=(output_size, input_size), dtype=np.int8)
-                input_data = np.random.randint(-128, 127, size=(time_steps, num_inputs, input_size), dtype=np.int8)
-                # Other params
-                dest_memspace = 'mvu_vrf'
-                activation = config['activation']
-                assert activation in ['relu', 'sigmoid', 'tanh'], 'Specified activation function for ('+layer_name+') is not supported by NPU'
-                recurrent_activation = config['recurrent_activation']
-                assert recurrent_activation in ['relu', 'sigmoid', 'tanh'], 'Specified recurrent activation function for ('+layer_name+') is not supported by NPU'
-                npu_gru(npu, layer_name, layer_idx, time_steps, num_inputs, input_size, units, output_size, uz_data, uc_data, ur_data, \
-                    wz_data, wc_data, wr_data, dest_memspace, input_data, activation, recurrent_activation)
-                ops = ops + (time_steps * num_inputs * input_size * output_size * 6 * 2)
-
-            elif isinstance(self.layers[i], keras.layers.LSTM):
-                # Dimensions 
-                input_size = int(weights[0].shape[0])
-                output_size = int(int(weights[0].shape[1]) / 4)
-                units = config['units']
-                if(i == 0):
-                    time_steps = int(inputs.shape[0])
-                    num_inputs = int(math.ceil(int(inputs.shape[1]) / 6.0)) * 6
-                    assert input_size == int(inputs.shape[2]), 'Incompatible input dimensions for ('+layer_name+')'
-                else:
-                    time_steps = len(npu.operands[i-1])
-                    num_inputs = len(npu.operands[i-1][0]) * 6
-                # Weight Matrices
-                uf_data = np.random.randint(0, 127, size=(output_size, input_size), dtype=np.int8) 
-                uc_data = np.random.randint(0, 127, size=(output_size, input_size), dtype=np.int8) 
-                ui_data = np.random.randint(0, 127, size=(output_size, input_size), dtype=np.int8) 
-                uo_data = np.random.randint(0, 127, size=(output_size, input_size), dtype=np.int8) 
-                wf_data = np.random.randint(0, 127, size=(output_size, input_size), dtype=np.int8) 
-                wc_data = np.random.randint(0, 127, size=(output_size, input_size), dtype=np.int8) 
-                wi_data = np.random.randint(0, 127, size=(output_size, input_size), dtype=np.int8) 
-                wo_data = np.random.randint(0, 127, size=(output_size, input_size), dtype=np.int8)
-                input_data = np.random.randint(-128, 127, size=(time_steps, num_inputs, input_size), dtype=np.int8) 
-                # Other params
-                dest_memspace = 'mvu_vrf'
-                activation = config['activation']
-                assert activation in ['relu', 'sigmoid', 'tanh'], 'Specified activation function for ('+layer_name+') is not supported by NPU'
-                recurrent_activation = config['recurrent_activation']
-                assert recurrent_activation in ['relu', 'sigmoid', 'tanh'], 'Specified recurrent activation function for ('+layer_name+') is not supported by NPU'
-                npu_lstm(npu, layer_name, layer_idx, time_steps, num_inputs, input_size, units, output_size, uf_data, uc_data, ui_data, uo_data, \
-                    wf_data, wc_data, wi_data, wo_data, dest_memspace, input_data, activation, recurrent_activation)
-                ops = ops + (time_steps * num_inputs * input_size * output_size * 8 * 2)
-
-            elif isinstance(self.layers[i], keras.layers.experimental.preprocessing.TextVectorization):
-                max_tokens = config['max_tokens']
-                seq_length = config['output_sequence_length']
-                num_inputs = int(math.ceil(len(inputs) / 6.0)) * 6
-                npu_preprocessing(npu, max_tokens, seq_length, num_inputs)
-
-            else:
-                print(layer_name+' type is not supported by NPU')
-                exit(0)
-
-        npu.unsupported_layers = unsupported_layers
-        npu.ops = ops
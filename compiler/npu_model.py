@@ -0,0 +1,189 @@
+import math
+import json
+import numpy as np
+
+from npu_layers import npu_dense, npu_rnn, npu_gru, npu_lstm, npu_preprocessing
+
+### TensorFlow-free model frontend
+# A model is a list of layer descriptions (type, sizes and activations, named after the Keras layers they stand for)
+# that is compiled straight to the NPU layer functions. Weights and inputs are generated by the layer functions, so
+# nothing but the layer sizes is needed. Models can also be described as JSON ({"name": ..., "layers": [{"class_name":
+# "Dense", "config": {"units": 512, ...}}, ...]}) and NPUSequential (npu_keras.py) maps Keras models onto it.
+SUPPORTED_ACTIVATIONS = ['relu', 'sigmoid', 'tanh']
+
+class Layer(object):
+    def __init__(self, name=None):
+        self.name = name
+
+    def get_config(self):
+        return dict(vars(self))
+
+    # Size of the vectors the layer produces
+    def output_size(self):
+        return self.units
+
+class Dense(Layer):
+    def __init__(self, units, activation=None, name=None):
+        super(Dense, self).__init__(name)
+        self.units = units
+        self.activation = activation
+
+class Embedding(Layer):
+    def __init__(self, input_dim, output_dim, name=None):
+        super(Embedding, self).__init__(name)
+        self.input_dim = input_dim
+        self.output_dim = output_dim
+
+    def output_size(self):
+        return self.output_dim
+
+class SimpleRNN(Layer):
+    def __init__(self, units, activation='tanh', name=None):
+        super(SimpleRNN, self).__init__(name)
+        self.units = units
+        self.activation = activation
+
+class GRU(Layer):
+    def __init__(self, units, activation='tanh', recurrent_activation='sigmoid', name=None):
+        super(GRU, self).__init__(name)
+        self.units = units
+        self.activation = activation
+        self.recurrent_activation = recurrent_activation
+
+class LSTM(Layer):
+    def __init__(self, units, activation='tanh', recurrent_activation='sigmoid', name=None):
+        super(LSTM, self).__init__(name)
+        self.units = units
+        self.activation = activation
+        self.recurrent_activation = recurrent_activation
+
+class TextVectorization(Layer):
+    def __init__(self, max_tokens=None, output_sequence_length=None, name=None):
+        super(TextVectorization, self).__init__(name)
+        self.max_tokens = max_tokens
+        self.output_sequence_length = output_sequence_length
+
+    def output_size(self):
+        return self.max_tokens
+
+layer_classes = {cls.__name__: cls for cls in [Dense, Embedding, SimpleRNN, GRU, LSTM, TextVectorization]}
+
+class NPUModel(object):
+    def __init__(self, layers=None, name=None):
+        self.name = name if name is not None else 'npu_model'
+        self.layers = []
+        for layer in (layers or []):
+            self.add(layer)
+
+    def add(self, layer):
+        assert type(layer).__name__ in layer_classes, type(layer).__name__ + ' type is not supported by NPU'
+        # Unnamed layers are named after their type and position like Keras layers
+        if(layer.name is None):
+            layer.name = type(layer).__name__.lower() + '_' + str(len(self.layers))
+        self.layers.append(layer)
+
+    def get_config(self):
+        return {'name': self.name, 'layers': [{'class_name': type(layer).__name__, 'config': layer.get_config()} for layer in self.layers]}
+
+    @classmethod
+    def from_config(cls, config):
+        layers = []
+        for layer in config['layers']:
+            assert layer['class_name'] in layer_classes, layer['class_name'] + ' type is not supported by NPU'
+            layers.append(layer_classes[layer['class_name']](**layer['config']))
+        return cls(layers, config.get('name'))
+
+    def to_json(self):
+        return json.dumps(self.get_config(), indent=2)
+
+    @classmethod
+    def from_json(cls, json_str):
+        return cls.from_config(json.loads(json_str))
+
+    def summary(self):
+        print('Model: "' + self.name + '"')
+        print('{:<30}{:<20}{:<10}'.format('Layer', 'Type', 'Units'))
+        for layer in self.layers:
+            print('{:<30}{:<20}{:<10}'.format(layer.name, type(layer).__name__, str(layer.output_size())))
+
+    def compile_for_npu(self, npu, inputs):
+        # With -cache a model compiled before is restored instead. The layers only read the shape of the test inputs
+        # (Embedding layers look their values up), the weights come from the random generator the key covers
+        read_values = any(isinstance(layer, Embedding) for layer in self.layers)
+        config = {'model': self.get_config(), 'input_shape': np.shape(inputs)}
+        if(npu.restore_compiled(config, [inputs] if read_values else [])):
+            return
+
+        unsupported_layers = []
+        ops = 0
+        input_size = None
+        for i in range(len(self.layers)):
+            layer = self.layers[i]
+            layer_name = layer.name
+            layer_idx = i
+            # The first layer takes the test inputs, the next ones the vectors of the previous layer
+            if(i > 0):
+                input_size = self.layers[i-1].output_size()
+
+            if isinstance(layer, Dense):
+                if (i == 0):
+                    input_size = int(inputs.shape[-1])
+                    num_inputs = int(math.ceil(int(inputs.shape[0]) / 6.0)) * 6
+                else:
+                    num_inputs = len(npu.operands[i-1][0]) * 6
+                output_size = layer.units
+                w_data = np.random.randint(0, 127, size=(output_size, input_size), dtype=np.int8)
+                input_data = np.random.randint(-128, 127, size=(num_inputs, input_size), dtype=np.int8)
+                npu_dense(npu, layer_name, layer_idx, num_inputs, 1, input_size, output_size, w_data, 'mvu_vrf', input_data, layer.activation, 'normal', i==len(self.layers)-1)
+                ops = ops + (num_inputs * input_size * output_size * 2)
+
+            elif isinstance(layer, Embedding):
+                input_size = layer.input_dim
+                output_size = layer.output_dim
+                if(i == 0):
+                    num_inputs = int(math.ceil(int(inputs.shape[0]) / 6.0)) * 6
+                    time_steps = inputs.shape[1]
+                else:
+                    num_inputs = len(npu.operands[i-1][0]) * 6
+                    time_steps = len(npu.operands[i-1])
+                npu_dense(npu, layer_name, layer_idx, num_inputs, time_steps, input_size, output_size, None, 'mvu_vrf', inputs, None, 'embedding')
+                ops = ops + (num_inputs * time_steps * input_size * output_size * 2)
+
+            elif isinstance(layer, (SimpleRNN, GRU, LSTM)):
+                output_size = layer.units
+                if(i == 0):
+                    input_size = int(inputs.shape[2])
+                    time_steps = int(inputs.shape[0])
+                    num_inputs = int(math.ceil(int(inputs.shape[1]) / 6.0)) * 6
+                else:
+                    time_steps = len(npu.operands[i-1])
+                    num_inputs = len(npu.operands[i-1][0]) * 6
+                assert layer.activation in SUPPORTED_ACTIVATIONS, 'Specified activation function for ('+layer_name+') is not supported by NPU'
+                if isinstance(layer, SimpleRNN):
+                    wx_data = np.random.randint(0, 127, size=(output_size, input_size), dtype=np.int8)
+                    wh_data = np.random.randint(0, 127, size=(output_size, input_size), dtype=np.int8)
+                    input_data = np.random.randint(-128, 127, size=(time_steps, num_inputs, input_size), dtype=np.int8)
+                    npu_rnn(npu, layer_name, layer_idx, time_steps, num_inputs, input_size, layer.units, output_size, wx_data, wh_data, 'mvu_vrf', input_data, layer.activation)
+                    ops = ops + (time_steps * num_inputs * input_size * output_size * 2 * 2)
+                else:
+                    assert layer.recurrent_activation in SUPPORTED_ACTIVATIONS, 'Specified recurrent activation function for ('+layer_name+') is not supported by NPU'
+                    # Weight matrices (6 for a GRU, 8 for an LSTM), then the inputs
+                    num_matrices = 6 if isinstance(layer, GRU) else 8
+                    w_data = [np.random.randint(0, 127, size=(output_size, input_size), dtype=np.int8) for m in range(num_matrices)]
+                    input_data = np.random.randint(-128, 127, size=(time_steps, num_inputs, input_size), dtype=np.int8)
+                    layer_func = npu_gru if isinstance(layer, GRU) else npu_lstm
+                    layer_func(npu, layer_name, layer_idx, time_steps, num_inputs, input_size, layer.units, output_size, *w_data, \
+                        'mvu_vrf', input_data, layer.activation, layer.recurrent_activation)
+                    ops = ops + (time_steps * num_inputs * input_size * output_size * num_matrices * 2)
+
+            elif isinstance(layer, TextVectorization):
+                num_inputs = int(math.ceil(len(inputs) / 6.0)) * 6
+                npu_preprocessing(npu, layer.max_tokens, layer.output_sequence_length, num_inputs)
+
+        npu.unsupported_layers = unsupported_layers
+        npu.ops = ops
+
+# Model described in a JSON file
+def load_npu_model(path):
+    with open(path, 'r') as model_file:
+        return NPUModel.from_json(model_file.read())
@@ -0,0 +1,57 @@
+import numpy as np
+
+### PAC C header written straight from the program arrays
+# Every input vector, MRF word, output vector and instruction is one C string literal of (at least) 64 bytes, least
+# significant byte first, zero padded. The literals are formatted with a lookup table on whole arrays and the file is
+# streamed one section (one tile for the MRFs) at a time.
+PAC_ROW_BYTES = 64
+
+# '\xNN' escape of every byte value
+ESCAPE_CHARS = np.array([[ord(c) for c in '\\x' + format(b, '02x')] for b in range(256)], dtype=np.uint8)
+
+# C string literal lines of an (n, bytes) uint8 array, one row per line
+def pac_rows(data):
+   num_rows, num_bytes = data.shape
+   padded = np.zeros((num_rows, max(num_bytes, PAC_ROW_BYTES)), dtype=np.uint8)
+   padded[:, :num_bytes] = data
+   lines = np.empty((num_rows, padded.shape[1] * 4 + 3), dtype=np.uint8)
+   lines[:, 0] = ord('"')
+   lines[:, 1:-2] = ESCAPE_CHARS[padded].reshape(num_rows, -1)
+   lines[:, -2] = ord('"')
+   lines[:, -1] = ord('\n')
+   return lines.tobytes()
+
+# Lanes of every vector as bytes, lane 0 first
+def pac_lane_bytes(values, num_lanes):
+   return (np.asarray(values).astype(np.int64) & 0xFF).astype(np.uint8).reshape(-1, num_lanes)
+
+'''
+Write the PAC header to path. mrfs is (tiles, dpes, depth, lanes), inputs and outputs are (vectors, lanes) and words
+are the encoded instructions (encode_program) of inst_width bits; an all-ones end marker instruction is appended.
+'''
+def write_pac_header(path, mrfs, inputs, outputs, words, inst_width):
+   num_tiles, num_dpes, mrf_depth, num_lanes = mrfs.shape
+   inputs = pac_lane_bytes(inputs, num_lanes)
+   outputs = pac_lane_bytes(outputs, num_lanes)
+   end_marker = np.packbits(np.ones((1, inst_width), dtype=np.uint8), axis=1, bitorder='little')
+   insts = np.concatenate((words, end_marker))
+
+   with open(path, 'wb') as header_file:
+      header_file.write(b'char input_vectors[] = \n' + pac_rows(inputs) + b';\n')
+      header_file.write(b'char mrf_vector[] = \n')
+      for t in range(num_tiles):
+         header_file.write(pac_rows(pac_lane_bytes(mrfs[t], num_lanes)))
+      header_file.write(b';\n')
+      header_file.write(b'char output_vectors [] = \n' + pac_rows(outputs) + b';\n')
+      header_file.write(b'char instructions[] = \n' + pac_rows(insts) + b';\n')
+
+      variables = [
+         ('num_in', len(inputs)),
+         ('num_mrf', num_tiles * num_dpes),
+         ('words_per_mrf', mrf_depth),
+         ('num_out', len(outputs)),
+         ('num_inst', len(insts)),
+         ('total_mem_buff_alloc_on_fpga', 11),
+         ('pc_start', 0)
+      ]
+      header_file.write(''.join(['uint32_t ' + name + ' = ' + str(value) + ';\n' for name, value in variables]).encode())
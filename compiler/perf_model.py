@@ -0,0 +1,372 @@
+import math
+import bisect
+import heapq
+import numpy as np
+
+from fsim import MVU_NOP, EVRF_NOP, EVRF_MOVE, MFU_NOP, LD_NOP, LD_WB, LD_FLUSH
+
+### Latency parameters of the C++ performance simulator
+# These are the values launch_perf_sim writes to the simulator config file (MFU_LATENCY is derived there), so the
+# Python models below and the C++ simulator always agree on the architecture they are timing.
+def perf_params(num_tiles, num_dpes, num_lanes, vrf_depth, mrf_depth):
+   params = {
+      'TILES'                 : num_tiles,
+      'DPES'                  : num_dpes,
+      'LANES'                 : num_lanes,
+      'MVU_VRF_DEPTH'         : vrf_depth,
+      'MVU_MRF_DEPTH'         : mrf_depth,
+      'EVRF_DEPTH'            : vrf_depth,
+      'MFU_VRF0_DEPTH'        : vrf_depth,
+      'MFU_VRF1_DEPTH'        : vrf_depth,
+      'FIFO_DEPTH'            : 512,
+      'DPE_MULT_LATENCY'      : 2,
+      'DPE_ADDER_LATENCY'     : 1,
+      'RF_WRITE_LATENCY'      : 1,
+      'RF_READ_LATENCY'       : 1,
+      'MRF_TO_DPE_LATENCY'    : 8,
+      'VRF_TO_DPE_LATENCY'    : 8,
+      'MVU_ACCUM_LATENCY'     : 4,
+      'MFU_ACT_LATENCY'       : 3,
+      'MFU_ADD_LATENCY'       : 3,
+      'MFU_MUL_LATENCY'       : 3,
+      'LD_WB_LATENCY'         : 5
+   }
+   params['MVU_REDUCTION_LATENCY'] = int(math.ceil(math.log2(num_tiles))) + 5
+   params['MFU_LATENCY'] = params['MFU_ACT_LATENCY'] + params['MFU_ADD_LATENCY'] + params['MFU_MUL_LATENCY']
+   return params
+
+# Cycles from an instruction entering the NPU to its first uOP reaching the units
+FRONT_END_LATENCY = 2
+
+# Names of the five chain stages, in pipeline order
+STAGES = ['mvu', 'evrf', 'mfu0', 'mfu1', 'ld']
+
+### Pipeline latency of every stage: cycles from a uOP issuing on a unit to the next unit being able to issue on its result
+def stage_latencies(params):
+   prime_dsps = max(1, int(math.ceil(params['LANES'] / 10.0)))
+   dpe = (3 * (1 + prime_dsps)) + 2 + (int(math.ceil(math.log2(prime_dsps))) * params['DPE_ADDER_LATENCY'])
+   return {
+      'mvu'  : params['RF_READ_LATENCY'] + params['MRF_TO_DPE_LATENCY'] + dpe + params['MVU_ACCUM_LATENCY'] + \
+         params['MVU_REDUCTION_LATENCY'] + 1,
+      'evrf' : params['RF_READ_LATENCY'] + 2,
+      'mfu0' : params['RF_READ_LATENCY'] + params['MFU_LATENCY'],
+      'mfu1' : params['RF_READ_LATENCY'] + params['MFU_LATENCY'],
+      'ld'   : params['LD_WB_LATENCY'] + 2
+   }
+
+### Per-chain work of every stage, read column-wise from an inst_table
+# Returns (active, uops, tags, consumes): active masks, uOP counts and tags per stage, and whether the stage takes its
+# operands from the stage before it (an eVRF move, every MFU operation and a loader write-back do).
+def chain_work(table, params):
+   col = lambda name: table.column(name).astype(np.int64)
+   batch = col('batch')
+   mfu_active = lambda mfu: (col(mfu + '_act_op') != MFU_NOP) | (col(mfu + '_add_op') != MFU_NOP) | \
+      (col(mfu + '_mul_op') != MFU_NOP)
+   active = {
+      'mvu'  : col('mvu_op') != MVU_NOP,
+      'evrf' : col('extvrf_op') != EVRF_NOP,
+      'mfu0' : mfu_active('mfu0'),
+      'mfu1' : mfu_active('mfu1'),
+      'ld'   : col('ld_src') != LD_NOP
+   }
+   uops = {
+      'mvu'  : col('mvu_mrf_rd_sz'),
+      'evrf' : col('extvrf_rd_sz') * batch,
+      'mfu0' : col('mfu0_vrf_rd_size') * batch,
+      'mfu1' : col('mfu1_vrf_rd_size') * batch,
+      'ld'   : col('vrf_id0_wr_size') * batch
+   }
+   tags = {
+      'mvu'  : col('mvu_tag'),
+      'evrf' : col('extvrf_tag'),
+      'mfu0' : col('mfu0_tag'),
+      'mfu1' : col('mfu1_tag'),
+      'ld'   : np.zeros(len(table), dtype=np.int64)
+   }
+   consumes = {
+      'mvu'  : np.zeros(len(table), dtype=bool),
+      'evrf' : col('extvrf_op') == EVRF_MOVE,
+      'mfu0' : active['mfu0'],
+      'mfu1' : active['mfu1'],
+      'ld'   : (col('ld_src') == LD_WB) | (col('ld_src') == LD_FLUSH)
+   }
+   for stage in STAGES:
+      uops[stage] = np.where(active[stage], np.maximum(uops[stage], 1), 1)
+   return active, uops, tags, consumes
+
+### Number of output rows the MVU interleaves in its accumulators, as the decoder picks it
+# Groups of 3*LANES/10 rows are interleaved, and the last group takes all the rows left if they are fewer than two groups.
+def mvu_accum_rows(rows, params):
+   group = 3 * params['LANES'] // 10
+   return np.where(rows > (2 * group) - 1, group, rows)
+
+### Groups of output rows of an MVU operation: (index of the uOP that completes the first row, rows) per group
+# The MVU works through the rows one interleaved group at a time. The first row of a group completes after (v_size-1)
+# rounds over its rows and the other rows of the group on the following uOPs.
+def mvu_row_groups(m_size, v_size, params):
+   groups = []
+   rows = m_size // max(v_size, 1)
+   first = 0
+   while(rows > 0):
+      accum_rows = int(mvu_accum_rows(rows, params))
+      groups.append((first + ((v_size - 1) * accum_rows), accum_rows))
+      first += v_size * accum_rows
+      rows -= accum_rows
+   return groups
+
+### Indices of the uOPs of an MVU operation that complete an output row
+def mvu_row_ends(m_size, v_size, params):
+   ends = set()
+   for first_end, accum_rows in mvu_row_groups(m_size, v_size, params):
+      ends.update(range(first_end, first_end + accum_rows))
+   return ends
+
+### Cycles at which a sequence of vectors is handed over between two stages
+# Kept as segments (first vector, count, first cycle, last cycle), assuming an even spread of the vectors over each.
+class timeline (object):
+   def __init__(self):
+      self.segments = []
+      self.firsts = []
+
+   # Number of vectors in all segments
+   def total(self):
+      return self.segments[-1][0] + self.segments[-1][1] if self.segments else 0
+
+   def add(self, count, t_first, t_last):
+      self.firsts.append(self.total())
+      self.segments.append((self.total(), count, t_first, t_last))
+
+   # Cycle of the given vector, or None if it is not in the timeline yet
+   def time_of(self, index):
+      if(index < 0):
+         return 0
+      seg = bisect.bisect_right(self.firsts, index) - 1
+      if(seg < 0 or index >= self.segments[seg][0] + self.segments[seg][1]):
+         return None
+      first, count, t_first, t_last = self.segments[seg]
+      if(count == 1):
+         return t_last
+      return t_first + ((t_last - t_first) * (index - first)) // (count - 1)
+
+   # Cycle after a stage that takes one vector per cycle has taken count vectors from the given one: the latest arrival
+   # plus the vectors still to take after it. The arrivals are linear within a segment, so only the first and last
+   # vector of every segment can be the latest. None if not all the vectors are in the timeline yet.
+   def drain_end(self, index, count):
+      last = index + count - 1
+      if(self.time_of(last) is None):
+         return None
+      end = 0
+      seg = max(bisect.bisect_right(self.firsts, index) - 1, 0)
+      while(seg < len(self.segments) and self.segments[seg][0] <= last):
+         first, num = self.segments[seg][0], self.segments[seg][1]
+         for k in [max(first, index), min(first + num - 1, last)]:
+            end = max(end, self.time_of(k) + last - k + 1)
+         seg += 1
+      return end
+
+### Analytical estimate of the cycles the C++ simulator takes to run a program
+# Every stage issues one uOP per cycle and works through its part of the chains in order. A chain starts on a stage
+# once the stage is done with the previous chain, the tag it waits for has been written back and the first vector it
+# consumes from the previous stage has arrived, and it takes them one per cycle as they arrive. A
+# stage cannot run more than a FIFO ahead of the stage that consumes its results. The MVU hands over the results of
+# every interleaved row group as it completes, one vector per row and batch slot. Returns (total cycles, per-stage start
+# and finish arrays indexed by chain).
+def estimate_cycles(table, params):
+   num = len(table)
+   latency = stage_latencies(params)
+   active, uops, tags, consumes = chain_work(table, params)
+   mvu_words = table.column('mvu_vrf_rd_sz').astype(np.int64)
+   start = {stage: np.zeros(num, dtype=np.int64) for stage in STAGES}
+   finish = {stage: np.zeros(num, dtype=np.int64) for stage in STAGES}
+   # When the results of every stage but the loader become available and when the next stage takes them
+   produced = {stage: timeline() for stage in STAGES[:-1]}
+   consumed = {stage: timeline() for stage in STAGES[:-1]}
+   # Cycle at which the n-th write-back has updated the tags of all units (index 0: no write-back needed)
+   tag_ready = [0]
+   free = {stage: 0 for stage in STAGES}
+
+   for i in range(num):
+      for stage in STAGES:
+         n = int(uops[stage][i])
+         begin = max(free[stage], i + FRONT_END_LATENCY)
+         if(active[stage][i]):
+            tag = int(tags[stage][i])
+            assert tag < len(tag_ready), 'Chain ' + str(i) + ' waits for write-back ' + str(tag) + \
+               ' that is not issued before it'
+            begin = max(begin, tag_ready[tag])
+            if(stage != 'ld'):
+               # Back-pressure from the FIFO between this stage and the next
+               taken = consumed[stage].time_of(produced[stage].total() - params['FIFO_DEPTH'])
+               if(taken is not None):
+                  begin = max(begin, taken)
+         end = begin + n
+         if(active[stage][i] and consumes[stage][i]):
+            src = STAGES[STAGES.index(stage) - 1]
+            first = consumed[src].total()
+            arrive_first = produced[src].time_of(first)
+            drained = produced[src].drain_end(first, n)
+            assert drained is not None, 'Chain ' + str(i) + ' consumes ' + stage + ' operands that are not produced before it'
+            begin = max(begin, arrive_first)
+            end = max(begin + n, drained)
+            consumed[src].add(n, begin, end - 1)
+         if(active[stage][i] and stage != 'ld'):
+            if(stage == 'mvu'):
+               for first_end, accum_rows in mvu_row_groups(n, int(mvu_words[i]), params):
+                  produced[stage].add(accum_rows * 3, begin + first_end + latency[stage], \
+                     begin + first_end + accum_rows - 1 + latency[stage])
+            else:
+               produced[stage].add(n, begin + latency[stage], end - 1 + latency[stage])
+         start[stage][i] = begin
+         finish[stage][i] = end
+         free[stage] = end
+      if(active['ld'][i]):
+         tag_ready.append(int(finish['ld'][i]) + latency['ld'])
+
+   # The simulation ends with the last vector written to the output FIFO
+   outputs = active['ld'] & (table.column('write_to_obuf') != 0)
+   total = int(finish['ld'][outputs].max()) if outputs.any() else 0
+   return total, start, finish
+
+### Discrete-event model of the five-stage chain pipeline
+# Every stage is a server that works through its part of the chains in order and issues one uOP per cycle. It passes its
+# results to the next stage through a FIFO of FIFO_DEPTH vectors. A stage that has to wait (for the front-end to
+# deliver the chain, for the write-back of its tag, for an operand or for room in its output FIFO) only runs again
+# when that happens. Pending wake-ups are kept on a heap, so idle stretches cost nothing. Each stage keeps a timeline of
+# [start, end, state, chain] intervals, where the state is 'busy' or the reason of a stall: 'tag', 'input' or 'output'.
+class pipeline_sim (object):
+   def __init__(self, table, params):
+      self.num = len(table)
+      self.params = params
+      self.latency = stage_latencies(params)
+      self.active, self.uops, self.tags, self.consumes = chain_work(table, params)
+      self.mvu_words = table.column('mvu_vrf_rd_sz').astype(np.int64)
+      self.outputs = table.column('write_to_obuf') != 0
+      # Cycles at which the vectors each stage but the loader hands to the next arrive there, and when they are taken
+      self.produced = {stage: [] for stage in STAGES[:-1]}
+      self.consumed = {stage: [] for stage in STAGES[:-1]}
+      # Cycle at which the n-th write-back has updated the tags of all units (index 0: no write-back needed)
+      self.tag_ready = [0]
+      # Chain, uOPs issued of it and MVU row ends of it for every stage
+      self.chain = {stage: 0 for stage in STAGES}
+      self.issued = {stage: 0 for stage in STAGES}
+      self.row_ends = set()
+      # Stage -> (event list, index, stall reason, cycle) for stages blocked until an event list grows
+      self.blocked = {}
+      self.events = []
+      self.seq = 0
+      self.timelines = {stage: [] for stage in STAGES}
+      self.cycles = 0
+
+   def schedule(self, stage, cycle):
+      heapq.heappush(self.events, (cycle, self.seq, stage))
+      self.seq += 1
+
+   def record(self, stage, start, end, state):
+      chain = self.chain[stage]
+      timeline = self.timelines[stage]
+      if(timeline and timeline[-1][1] == start and timeline[-1][2] == state and timeline[-1][3] == chain):
+         timeline[-1][1] = end
+      elif(end > start):
+         timeline.append([start, end, state, chain])
+
+   # Cycle at which event index of the list has happened, or None (and the stage is blocked) if it is yet to happen
+   def wait_for(self, stage, cycle, events, index, reason):
+      if(index < 0):
+         return cycle
+      if(index >= len(events)):
+         self.blocked[stage] = (events, index, reason, cycle)
+         return None
+      ready = max(cycle, events[index])
+      self.record(stage, cycle, ready, reason)
+      return ready
+
+   # Wake up the stages blocked on the given event list if their event has happened
+   def notify(self, events):
+      for stage, (waited, index, reason, cycle) in list(self.blocked.items()):
+         if(waited is events and index < len(events)):
+            del self.blocked[stage]
+            ready = max(cycle, events[index])
+            self.record(stage, cycle, ready, reason)
+            self.schedule(stage, ready)
+
+   # Run a stage from the given cycle until it blocks, runs out of chains or gets ahead of another pending event
+   def step(self, stage, cycle):
+      upstream = STAGES[STAGES.index(stage) - 1]
+      while(self.chain[stage] < self.num):
+         i = self.chain[stage]
+         cycle = max(cycle, i + FRONT_END_LATENCY)
+         if(not self.active[stage][i]):
+            # A NOP is read and dropped in one cycle
+            self.chain[stage] += 1
+            cycle += 1
+            continue
+
+         uop = self.issued[stage]
+         if(uop == 0):
+            cycle = self.wait_for(stage, cycle, self.tag_ready, int(self.tags[stage][i]), 'tag')
+            if(cycle is None):
+               return
+            if(stage == 'mvu'):
+               self.row_ends = mvu_row_ends(int(self.uops[stage][i]), int(self.mvu_words[i]), self.params)
+         if(self.consumes[stage][i]):
+            cycle = self.wait_for(stage, cycle, self.produced[upstream], len(self.consumed[upstream]), 'input')
+            if(cycle is None):
+               return
+         results = 0
+         if(stage != 'ld'):
+            results = (3 if uop in self.row_ends else 0) if stage == 'mvu' else 1
+            room = len(self.produced[stage]) + results - 1 - self.params['FIFO_DEPTH']
+            cycle = self.wait_for(stage, cycle, self.consumed[stage], room, 'output')
+            if(cycle is None):
+               return
+
+         # Issue the uOP
+         self.record(stage, cycle, cycle + 1, 'busy')
+         if(self.consumes[stage][i]):
+            self.consumed[upstream].append(cycle)
+            self.notify(self.consumed[upstream])
+         if(results > 0):
+            self.produced[stage].extend([cycle + self.latency[stage]] * results)
+            self.notify(self.produced[stage])
+         if(stage == 'ld' and self.outputs[i]):
+            self.cycles = max(self.cycles, cycle + 1)
+         cycle += 1
+         self.issued[stage] += 1
+         if(self.issued[stage] == self.uops[stage][i]):
+            self.issued[stage] = 0
+            self.chain[stage] += 1
+            if(stage == 'ld'):
+               self.tag_ready.append(cycle + self.latency['ld'])
+               self.notify(self.tag_ready)
+
+         # Let the other stages catch up
+         if(self.events and self.events[0][0] < cycle):
+            self.schedule(stage, cycle)
+            return
+
+   # Returns the cycles until the last vector is written to the output FIFO
+   def run(self):
+      for stage in STAGES:
+         self.schedule(stage, 0)
+      while(self.events):
+         cycle, _, stage = heapq.heappop(self.events)
+         self.step(stage, cycle)
+      assert not self.blocked, 'Pipeline deadlock: ' + ', '.join(stage + ' waits for ' + reason + ' in chain ' + \
+         str(self.chain[stage]) for stage, (_, _, reason, _) in self.blocked.items())
+      return self.cycles
+
+   # Cycles every stage spent in every state
+   def stage_summary(self):
+      summary = {}
+      for stage in STAGES:
+         summary[stage] = {'busy': 0, 'tag': 0, 'input': 0, 'output': 0}
+         for start, end, state, _ in self.timelines[stage]:
+            summary[stage][state] += end - start
+      return summary
+
+   def write_timelines(self, path):
+      with open(path, 'w') as f:
+         f.write('stage,start,end,state,chain\n')
+         for stage in STAGES:
+            for start, end, state, chain in self.timelines[stage]:
+               f.write(stage + ',' + str(start) + ',' + str(end) + ',' + state + ',' + str(chain) + '\n')
@@ -0,0 +1,121 @@
+import numpy as np
+
+from fsim import MVU_MATVEC, EVRF_NOP, EVRF_READ, MFU_NOP, MFU_TANH, MFU_SIG, MFU_RELU, MFU_ADD, MFU_SUB_A_B, MFU_SUB_B_A
+from fsim import MFU_MUL, LD_IN, LD_WB, LD_FLUSH, VRF_NONE
+
+### Binary program image handed to the C++ performance simulator
+# One little-endian file: a fixed header followed by four sections (MRF words up to the filled depth, input vectors,
+# golden output vectors and the instruction words). The simulator mmaps it and reads the sections in place, so the
+# layout here must match simulator/inc/program_image.h.
+SIM_IMAGE_MAGIC   = b'NPUSIMG\0'
+SIM_IMAGE_VERSION = 1
+SIM_IMAGE_ALIGN   = 64
+
+# Instruction words per chain in the order the simulator decodes them: MVU (8), eVRF (8), MFU0 (13), MFU1 (13), LD (15)
+MVU_WORDS  = 8
+EVRF_WORDS = 8
+MFU_WORDS  = 13
+LD_WORDS   = 15
+INST_WORDS = MVU_WORDS + EVRF_WORDS + 2 * MFU_WORDS + LD_WORDS
+
+sim_image_header = np.dtype([
+   ('magic', 'S8'), ('version', '<u4'), ('tiles', '<u4'), ('dpes', '<u4'), ('lanes', '<u4'), ('mrf_depth', '<u4'),
+   ('num_inputs', '<u4'), ('num_outputs', '<u4'), ('num_insts', '<u4'), ('inst_words', '<u4'), ('reserved', '<u4'),
+   ('mrf_offset', '<u8'), ('inputs_offset', '<u8'), ('outputs_offset', '<u8'), ('insts_offset', '<u8')
+])
+
+# Simulator codes of the MFU activation and add/sub operations, indexed by table op code
+mfu_act_codes = np.zeros(MFU_MUL + 1, dtype=np.int32)
+mfu_act_codes[[MFU_TANH, MFU_SIG, MFU_RELU]] = [1, 2, 3]
+mfu_add_codes = np.zeros(MFU_MUL + 1, dtype=np.int32)
+mfu_add_codes[[MFU_ADD, MFU_SUB_A_B, MFU_SUB_B_A]] = [1, 2, 3]
+
+# Instruction words of every chain of a decoded instruction table, one row per chain
+def sim_instruction_words(table):
+   num = len(table)
+   col = table.column
+   words = np.zeros((num, INST_WORDS), dtype=np.int32)
+
+   # MVU macro-op
+   mvu = words[:, :MVU_WORDS]
+   mvu[:, 0] = col('mvu_op') == MVU_MATVEC
+   mvu[:, 1:4] = col('mvu_vrf_rd_base')
+   mvu[:, 4] = col('mvu_vrf_rd_sz')
+   mvu[:, 5] = col('mvu_mrf_rd_base')
+   mvu[:, 6] = col('mvu_mrf_rd_sz')
+   mvu[:, 7] = col('mvu_tag')
+
+   # eVRF macro-op
+   evrf = words[:, MVU_WORDS:MVU_WORDS + EVRF_WORDS]
+   evrf[:, 0] = col('extvrf_op') != EVRF_NOP
+   evrf[:, 1] = col('extvrf_op') == EVRF_READ
+   evrf[:, 2:5] = col('extvrf_rd_base')
+   evrf[:, 5] = col('extvrf_rd_sz')
+   evrf[:, 6] = col('batch')
+   evrf[:, 7] = col('extvrf_tag')
+
+   # MFU macro-ops
+   offset = MVU_WORDS + EVRF_WORDS
+   for mfu in ['mfu0', 'mfu1']:
+      act_op = col(mfu + '_act_op')
+      add_op = col(mfu + '_add_op')
+      mul_op = col(mfu + '_mul_op')
+      words_mfu = words[:, offset:offset + MFU_WORDS]
+      words_mfu[:, 0] = (act_op != MFU_NOP) | (add_op != MFU_NOP) | (mul_op != MFU_NOP)
+      words_mfu[:, 1] = col(mfu + '_vrf_rd_size')
+      words_mfu[:, 2] = mfu_act_codes[act_op]
+      words_mfu[:, 3] = mfu_add_codes[add_op]
+      words_mfu[:, 4:7] = col(mfu + '_vrf0_rd_base')
+      words_mfu[:, 7] = mul_op == MFU_MUL
+      words_mfu[:, 8:11] = col(mfu + '_vrf1_rd_base')
+      words_mfu[:, 11] = col('batch')
+      words_mfu[:, 12] = col(mfu + '_tag')
+      offset += MFU_WORDS
+
+   # LD macro-op (op, src, size, then valid/id/base x3 for each destination)
+   ld_src = col('ld_src')
+   ld = words[:, offset:]
+   ld[:, 0] = np.where(ld_src == LD_FLUSH, 2, (ld_src == LD_WB) | (ld_src == LD_IN))
+   ld[:, 1] = ld_src == LD_IN
+   ld[:, 2] = col('vrf_id0_wr_size')
+   for i, dst in enumerate(['vrf_id0', 'vrf_id1']):
+      vrf_id = col(dst)
+      ld[:, 3 + 5 * i] = (col(dst + '_wr_size') != 0) & (ld_src != LD_FLUSH)
+      ld[:, 4 + 5 * i] = np.where(vrf_id == VRF_NONE, 0, vrf_id)
+      ld[:, 5 + 5 * i:8 + 5 * i] = col(dst + '_wr_base')
+   ld[:, 13] = col('batch')
+   ld[:, 14] = col('write_to_obuf') != 0
+   return words
+
+# Write the image with one bulk write; mrfs is (tiles, dpes, depth, lanes) and only needs to cover the filled depth
+def write_sim_image(path, mrfs, inputs, outputs, table):
+   tiles, dpes, mrf_depth, lanes = mrfs.shape
+   sections = [
+      np.ascontiguousarray(mrfs, dtype='<i4'),
+      np.asarray(inputs, dtype='<i4').reshape(-1, lanes),
+      np.asarray(outputs, dtype='<i4').reshape(-1, lanes),
+      sim_instruction_words(table).astype('<i4')
+   ]
+
+   header = np.zeros(1, dtype=sim_image_header)
+   header['magic'] = SIM_IMAGE_MAGIC
+   header['version'] = SIM_IMAGE_VERSION
+   header['tiles'], header['dpes'], header['lanes'], header['mrf_depth'] = tiles, dpes, lanes, mrf_depth
+   header['num_inputs'] = len(sections[1])
+   header['num_outputs'] = len(sections[2])
+   header['num_insts'] = len(sections[3])
+   header['inst_words'] = INST_WORDS
+
+   # Every section starts on an aligned offset so the simulator can read it in place
+   chunks = [None]
+   offset = sim_image_header.itemsize
+   for name, section in zip(['mrf_offset', 'inputs_offset', 'outputs_offset', 'insts_offset'], sections):
+      padding = -offset % SIM_IMAGE_ALIGN
+      chunks += [b'\0' * padding, section.tobytes()]
+      offset += padding
+      header[name] = offset
+      offset += section.nbytes
+   chunks[0] = header.tobytes()
+
+   with open(path, 'wb') as image_file:
+      image_file.write(b''.join(chunks))
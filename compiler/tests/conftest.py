@@ -0,0 +1,19 @@
+import os
+import sys
+
+import pytest
+
+# The compiler modules import each other as top-level modules (the flow runs from the compiler directory)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from compiler import initialize_npu
+
+
+# Builds an npu the way a workload script does, from its command line flags, on a small architecture
+@pytest.fixture
+def make_npu(monkeypatch):
+    def make(*flags, seed=1):
+        seed_flags = [] if seed is None else ['-seed', str(seed)]
+        monkeypatch.setattr(sys, 'argv', ['test', '-t', '2', '-d', '10', '-l', '10'] + seed_flags + list(flags))
+        return initialize_npu(sys.argv)
+    return make
@@ -0,0 +1,84 @@
+import pytest
+
+from allocator import mem_allocator
+
+
+def test_first_fit_takes_lowest_address():
+    mem = mem_allocator(100)
+    assert [mem.alloc(10), mem.alloc(20), mem.alloc(30)] == [0, 10, 30]
+    mem.free(10)
+    assert mem.alloc(5) == 10
+    assert mem.alloc(40) == 60
+    assert mem.alloc(1) == 15
+    assert mem.alloc(100) == -1
+
+
+def test_best_fit_takes_smallest_hole():
+    mem = mem_allocator(100, 'best_fit')
+    blocks = [mem.alloc(size) for size in [10, 30, 10, 5, 10]]
+    assert blocks == [0, 10, 40, 50, 55]
+    mem.free(10)
+    mem.free(50)
+    # Free: [10, 40) of 30 words, [50, 55) of 5 words and [65, 100) of 35 words
+    assert mem.alloc(4) == 50
+    assert mem.alloc(30) == 10
+    assert mem.alloc(35) == 65
+    assert mem.alloc(1) == 54
+
+
+def test_free_coalesces_neighbours():
+    mem = mem_allocator(64)
+    a, b, c = mem.alloc(16), mem.alloc(16), mem.alloc(16)
+    mem.free(a)
+    mem.free(c)
+    assert mem.stats()['free_intervals'] == 2
+    mem.free(b)
+    assert mem.stats()['free_intervals'] == 1
+    assert mem.free_starts == [0]
+    assert mem.free_sizes == {0: 64}
+    assert mem.free_by_size == [(64, 0)]
+    assert mem.alloc(64) == 0
+    with pytest.raises(AssertionError):
+        mem.free(16)
+
+
+@pytest.mark.parametrize('policy', ['first_fit', 'best_fit'])
+def test_alignment(policy):
+    mem = mem_allocator(64, policy)
+    assert mem.alloc(3) == 0
+    assert mem.alloc(8, align=8) == 8
+    # The gap left by the alignment is still free
+    assert mem.alloc(5) == 3
+    assert mem.alloc(4, align=16) == 16
+    assert mem.alloc(64, align=4) == -1
+
+
+def test_stats_and_fragmentation():
+    mem = mem_allocator(100)
+    blocks = [mem.alloc(10) for i in range(5)]
+    mem.free(blocks[1])
+    mem.free(blocks[3])
+    stats = mem.stats()
+    assert stats['used'] == 30
+    assert stats['peak_used'] == 50
+    assert stats['high_water'] == 50
+    assert stats['free_intervals'] == 3
+    assert stats['largest_free'] == 50
+    # 70 free words, 20 of them outside the largest interval
+    assert stats['fragmentation'] == pytest.approx(20.0 / 70)
+    full = mem_allocator(10)
+    full.alloc(10)
+    assert full.stats()['fragmentation'] == 0.0
+
+
+# npu.free releases a vector so its space can be allocated again; -bestfit selects the best-fit policy
+def test_npu_free(make_npu):
+    npu = make_npu('-bestfit')
+    assert npu.mem_space['mvu_vrf'].policy == 'best_fit'
+    a = npu.malloc('a', 20, None, 'mvu_vrf')
+    b = npu.malloc('b', 10, None, 'mvu_vrf')
+    npu.free(a)
+    c = npu.malloc('c', 10, None, 'mvu_vrf')
+    assert c.alloc_addr == a.alloc_addr
+    assert npu.mem_space['mvu_vrf'].stats()['used'] == b.word_count + c.word_count
+    assert make_npu().mem_space['mvu_vrf'].policy == 'first_fit'
@@ -0,0 +1,105 @@
+import numpy as np
+import pytest
+
+from fsim import MVU_NOP, EVRF_NOP, EVRF_MOVE, MFU_NOP, MFU_ADD, MFU_SUB_A_B, MFU_SUB_B_A, MFU_MAX, MFU_MUL
+from fsim import LD_NOP, LD_WB, LD_FLUSH, VRF_NONE
+from npu_model import NPUModel, Dense, SimpleRNN, GRU, LSTM
+
+MODELS = {
+    'mlp': (lambda: NPUModel([Dense(30, name='layer1'), Dense(20, name='layer2')]), (6, 20)),
+    'rnn': (lambda: NPUModel([SimpleRNN(20, name='layer1')]), (3, 6, 20)),
+    'gru': (lambda: NPUModel([GRU(20, name='layer1')]), (3, 6, 20)),
+    'lstm': (lambda: NPUModel([LSTM(20, name='layer1'), LSTM(20, name='layer2')]), (3, 6, 20)),
+}
+
+
+# Reference encoder: one chain at a time with Python integers, field by field as the original set_*_minst functions
+def pack(fields):
+    minst, shift = 0, 0
+    for value, width in fields:
+        minst += int(value) << shift
+        shift += width
+    return minst
+
+
+def mvu_minst(npu, row):
+    if (row.mvu_op == MVU_NOP):
+        return 0
+    base = row.mvu_vrf_rd_base
+    return pack([(1, 1), (row.mvu_tag, npu.NTAGW), (row.mvu_words_per_row, npu.NSIZEW), (row.mvu_mrf_rd_sz, npu.NSIZEW),
+                 (row.mvu_mrf_rd_base, npu.MRFAW), (row.mvu_vrf_rd_sz, npu.NSIZEW),
+                 (base[2], npu.VRFAW), (base[1], npu.VRFAW), (base[0], npu.VRFAW)])
+
+
+def evrf_minst(npu, row):
+    if (row.extvrf_op == EVRF_NOP):
+        return 0
+    base = row.extvrf_rd_base
+    return pack([(row.batch, 2), (1, 1), (row.extvrf_tag, npu.NTAGW), (row.extvrf_op != EVRF_MOVE, 1),
+                 (row.extvrf_rd_sz, npu.NSIZEW), (base[2], npu.VRFAW), (base[1], npu.VRFAW), (base[0], npu.VRFAW)])
+
+
+def mfu_minst(npu, row, mfu):
+    ops = [row[mfu + '_act_op'], row[mfu + '_add_op'], row[mfu + '_mul_op']]
+    if (MFU_NOP in ops):
+        return 0
+    op = 0x40 + {MFU_ADD: 0x02, MFU_SUB_A_B: 0x04, MFU_SUB_B_A: 0x06, MFU_MAX: 0x08}.get(ops[1], 0)
+    op += 0x01 if ops[2] == MFU_MUL else 0
+    base0, base1 = row[mfu + '_vrf0_rd_base'], row[mfu + '_vrf1_rd_base']
+    return pack([(row.batch, 2), (op, 7), (row[mfu + '_tag'], npu.NTAGW), (row[mfu + '_vrf_rd_size'], npu.NSIZEW),
+                 (base1[2], npu.VRFAW), (base1[1], npu.VRFAW), (base1[0], npu.VRFAW),
+                 (base0[2], npu.VRFAW), (base0[1], npu.VRFAW), (base0[0], npu.VRFAW)])
+
+
+def ld_minst(npu, row):
+    if (row.ld_src == LD_NOP):
+        return 0
+    base0, base1 = row.vrf_id0_wr_base, row.vrf_id1_wr_base
+    minst = pack([(row.write_to_obuf, 1), (row.last_flag, 1), (row.batch, 2), (1, 1), (row.ld_src in (LD_WB, LD_FLUSH), 1),
+                  (row.vrf_id0_wr_size, npu.NSIZEW), (base1[2], npu.VRFAW), (base1[1], npu.VRFAW), (base1[0], npu.VRFAW),
+                  (base0[2], npu.VRFAW), (base0[1], npu.VRFAW), (base0[0], npu.VRFAW)])
+    shift = 6 + npu.NSIZEW + 6 * npu.VRFAW
+    if (row.vrf_id0 != VRF_NONE):
+        minst += 0x1 << (2 * int(row.vrf_id0) + shift)
+    if (row.vrf_id1 != VRF_NONE):
+        minst += 0x3 << (2 * int(row.vrf_id1) + shift)
+    return minst
+
+
+def chain_minst(npu, row):
+    return pack([(ld_minst(npu, row), npu.MIW_LD), (mfu_minst(npu, row, 'mfu1'), npu.MIW_MFU),
+                 (mfu_minst(npu, row, 'mfu0'), npu.MIW_MFU), (evrf_minst(npu, row), npu.MIW_EVRF), (mvu_minst(npu, row), npu.MIW_MVU)])
+
+
+# The vectorized encoder must produce exactly the bytes of the per-chain encoding
+@pytest.mark.parametrize('model_name', sorted(MODELS))
+def test_encode_program_matches_per_chain_encoding(make_npu, model_name):
+    npu = make_npu()
+    build_model, input_shape = MODELS[model_name]
+    build_model().compile_for_npu(npu, np.random.randint(-128, 127, size=input_shape))
+    npu.end_npu_program()
+    npu.set_inst_params()
+    insts = npu.inst_table.data()
+    words = npu.encode_program(insts)
+    width = words.shape[1]
+    assert width == (npu.MICW + 7) // 8
+    expected = [chain_minst(npu, row) for row in insts.view(np.recarray)]
+    assert all(minst < (1 << npu.MICW) for minst in expected)
+    expected = np.array([list(minst.to_bytes(width, 'little')) for minst in expected], dtype=np.uint8)
+    assert np.array_equal(words, expected)
+    # Every unit is active somewhere in the program
+    for field in ['mvu_op', 'extvrf_op', 'mfu0_add_op', 'mfu1_add_op', 'ld_src']:
+        assert np.any(insts[field] != 0)
+    assert np.any(insts['ld_src'] == LD_WB)
+
+
+# Negative fields are rejected instead of being wrapped into the neighbouring fields
+def test_encode_program_rejects_negative_fields(make_npu):
+    npu = make_npu()
+    NPUModel([Dense(30, name='layer1')]).compile_for_npu(npu, np.random.randint(-128, 127, size=(6, 20)))
+    npu.end_npu_program()
+    npu.set_inst_params()
+    insts = npu.inst_table.snapshot()
+    insts['mvu_tag'][insts['mvu_op'] != MVU_NOP] = -1
+    with pytest.raises(AssertionError):
+        npu.encode_program(insts)
@@ -0,0 +1,84 @@
+import os
+
+import numpy as np
+import pytest
+
+import compiler
+import npu_model
+from flow_cache import dir_size
+from npu_model import NPUModel, SimpleRNN
+
+
+def run_flow(make_npu, seed=1, cache_bytes=None):
+    npu = make_npu('-cache', '-pac', seed=seed)
+    if(cache_bytes is not None):
+        npu.flow_opts['cache_size'] = cache_bytes / (1024.0 * 1024.0)
+    NPUModel([SimpleRNN(20, name='layer1')]).compile_for_npu(npu, np.zeros((3, 6, 20)))
+    assert npu.run_flow()
+    return npu
+
+
+def pac_header(npu):
+    with open('./pac_dump/' + npu.flow_opts['checkpoint_name'] + '.h') as header_file:
+        return header_file.read()
+
+
+@pytest.fixture
+def flow_dir(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    os.mkdir('pac_dump')
+
+
+def test_second_run_hits(make_npu, monkeypatch, flow_dir):
+    first = run_flow(make_npu)
+    assert first.cached_program is None
+    header = pac_header(first)
+
+    # A hit neither compiles the model, nor simulates it, nor dumps its checkpoints
+    def fail(*args, **kwargs):
+        raise AssertionError('Not skipped on a flow cache hit')
+    monkeypatch.setattr(npu_model, 'npu_rnn', fail)
+    monkeypatch.setattr(compiler.npu, 'fsim_npu_program', fail)
+    monkeypatch.setattr(compiler.npu, 'generate_fsim_checkpoints', fail)
+    second = run_flow(make_npu)
+    assert second.cached_program is not None
+    assert second.cache_key == first.cache_key
+
+    assert np.array_equal(second.cached_program['outputs'], first.fsim.obuf_q)
+    assert np.array_equal(second.golden_obuf_q, first.golden_obuf_q)
+    assert np.array_equal(second.inst_table.data(), first.inst_table.data())
+    assert np.array_equal(second.mrfs, first.mrfs)
+    assert second.ops == first.ops
+    assert second.estimate_perf() == first.estimate_perf()
+    assert pac_header(second) == header
+
+
+def test_other_seed_misses(make_npu, flow_dir):
+    first = run_flow(make_npu, seed=1)
+    second = run_flow(make_npu, seed=2)
+    assert second.cached_program is None
+    assert second.cache_key != first.cache_key
+
+
+def test_cache_needs_seed(make_npu):
+    with pytest.raises(SystemExit):
+        make_npu('-cache', seed=None)
+
+
+# Entries are evicted least recently used first, down to the -cachesize bound
+def test_lru_eviction(make_npu, flow_dir):
+    npu = run_flow(make_npu, seed=1)
+    cache_bytes = int(2.5 * dir_size(npu.cache.entry(npu.cache_key)))
+
+    keys = {}
+    for seed in [1, 2]:
+        keys[seed] = run_flow(make_npu, seed, cache_bytes).cache_key
+    # Seed 1 is used again, so seed 2 is the least recently used entry when seed 3 is added
+    assert run_flow(make_npu, 1, cache_bytes).cached_program is not None
+    npu = run_flow(make_npu, 3, cache_bytes)
+    keys[3] = npu.cache_key
+
+    assert dir_size(npu.cache.path) <= cache_bytes
+    assert sorted(os.listdir(npu.cache.path)) == sorted([keys[1], keys[3]])
+    assert run_flow(make_npu, 1, cache_bytes).cached_program is not None
+    assert run_flow(make_npu, 2, cache_bytes).cached_program is None
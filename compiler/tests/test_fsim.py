@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+
+from npu_model import NPUModel, Dense, SimpleRNN, GRU, LSTM
+
+MODELS = {
+    'dense': (lambda: NPUModel([Dense(30, name='layer1')]), (6, 20)),
+    'rnn': (lambda: NPUModel([SimpleRNN(20, name='layer1')]), (3, 6, 20)),
+    'gru': (lambda: NPUModel([GRU(20, name='layer1')]), (3, 6, 20)),
+    'lstm': (lambda: NPUModel([LSTM(20, name='layer1')]), (3, 6, 20)),
+}
+
+
+def simulate(npu, model_name):
+    build_model, input_shape = MODELS[model_name]
+    build_model().compile_for_npu(npu, np.random.randint(-128, 127, size=input_shape))
+    npu.end_npu_program()
+    npu.fsim_npu_program()
+    return np.asarray(npu.fsim.obuf_q)
+
+
+# The loop reference MVU (-fsimref) and the fused dataflow mode (-fsimdataflow) must produce exactly the same outputs
+# as the vectorized MVU in FIFO mode
+@pytest.mark.parametrize('mode', [['-fsimref'], ['-fsimdataflow'], ['-fsimref', '-fsimdataflow']])
+@pytest.mark.parametrize('model_name', sorted(MODELS))
+def test_modes_match_fifo_mode(make_npu, model_name, mode):
+    npu = make_npu()
+    outputs = simulate(npu, model_name)
+    mode_outputs = simulate(make_npu(*mode), model_name)
+    assert len(outputs) > 0
+    assert np.array_equal(outputs, mode_outputs)
+    assert np.array_equal(outputs, npu.golden_obuf_q)
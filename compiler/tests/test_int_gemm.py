@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from int_gemm import int_gemm, exact_bound, FP32_EXACT_BOUND, FP64_EXACT_BOUND
+
+
+def reference(a, b):
+    return (np.asarray(a).astype(np.int64) @ np.asarray(b).astype(np.int64)).astype(np.int32)
+
+
+# (a, b) value ranges that take the float32, float64 and int64 paths
+PATHS = {
+    'float32': (127, 127, 512),
+    'float64': (2**15, 2**15, 1024),
+    'int64': (2**30, 2**30, 64),
+}
+
+
+@pytest.mark.parametrize('path', sorted(PATHS))
+@pytest.mark.parametrize('vector', [False, True])
+def test_int_gemm_is_exact(path, vector):
+    a_max, b_max, k = PATHS[path]
+    rng = np.random.RandomState(0)
+    a = rng.randint(-a_max, a_max + 1, size=(40, k), dtype=np.int64)
+    b = rng.randint(-b_max, b_max + 1, size=(k,) if vector else (k, 3), dtype=np.int64)
+    # The extreme values make the bound of the path tight
+    a[0, 0], b[0, ...] = -a_max, b_max
+    bound = exact_bound(a, b)
+    if (path == 'float32'):
+        assert bound <= FP32_EXACT_BOUND
+    elif (path == 'float64'):
+        assert FP32_EXACT_BOUND < bound <= FP64_EXACT_BOUND
+    else:
+        assert bound > FP64_EXACT_BOUND
+    result = int_gemm(a, b)
+    assert result.dtype == np.int32
+    assert np.array_equal(result, reference(a, b))
+
+
+# Sums past the int32 range wrap like an int32 accumulator
+def test_int_gemm_wraps_to_int32():
+    a = np.full((2, 8), 2**15, dtype=np.int64)
+    b = np.full((8,), 2**15 - 1, dtype=np.int64)
+    expected = reference(a, b)
+    assert (a.astype(np.int64) @ b)[0] > np.iinfo(np.int32).max
+    assert np.array_equal(int_gemm(a, b), expected)
+    assert np.array_equal(int_gemm(-a, b), reference(-a, b))
+
+
+def test_int_gemm_int8_operands():
+    rng = np.random.RandomState(1)
+    a = rng.randint(-128, 128, size=(30, 20)).astype(np.int8)
+    b = rng.randint(-128, 128, size=(20, 3)).astype(np.int8)
+    assert np.array_equal(int_gemm(a, b), reference(a, b))
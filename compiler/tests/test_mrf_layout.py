@@ -0,0 +1,49 @@
+import sys
+
+import numpy as np
+import pytest
+
+from compiler import initialize_npu
+from npu_model import NPUModel, Dense
+
+
+def check_round_trip(npu, mtx):
+    # The MRF image read back through the element index must match the padded matrix as well
+    assert np.array_equal(npu.gather_matrix(mtx), mtx.data)
+    assert np.array_equal(npu.mrfs[npu.mrf_index(mtx)], mtx.data)
+
+
+# Shapes that do not divide evenly into tiles, DPEs and lanes
+@pytest.mark.parametrize('arch', [('2', '10', '10'), ('3', '20', '20')])
+@pytest.mark.parametrize('shape', [(17, 33), (33, 17), (3, 2), (40, 20), (200, 120)])
+def test_place_gather_round_trip(monkeypatch, shape, arch):
+    tiles, dpes, lanes = arch
+    monkeypatch.setattr(sys, 'argv', ['test', '-t', tiles, '-d', dpes, '-l', lanes, '-seed', '1'])
+    npu = initialize_npu(sys.argv)
+    dimension_x, dimension_y = shape
+    first = npu.malloc('first', 5, 7, 'mvu_mrf', np.random.randint(-128, 127, size=(7, 5)))
+    values = np.random.randint(-128, 127, size=(dimension_y, dimension_x))
+    mtx = npu.malloc('mtx', dimension_x, dimension_y, 'mvu_mrf', values)
+    assert np.array_equal(npu.gather_matrix(mtx)[:dimension_y, :dimension_x], values)
+    check_round_trip(npu, mtx)
+    # Placing the second matrix must not overwrite the first one
+    check_round_trip(npu, first)
+
+
+def test_compiled_dense_round_trip(make_npu, monkeypatch):
+    npu = make_npu()
+    matrices = []
+    malloc = npu.malloc
+
+    def record_malloc(name, dimension_x, dimension_y, space_name, values=[]):
+        allocated_mem = malloc(name, dimension_x, dimension_y, space_name, values)
+        if (space_name == 'mvu_mrf'):
+            matrices.append(allocated_mem)
+        return allocated_mem
+
+    monkeypatch.setattr(npu, 'malloc', record_malloc)
+    NPUModel([Dense(33, name='layer1'), Dense(17, name='layer2')]).compile_for_npu(npu, np.random.randint(-128, 127, size=(6, 17)))
+    npu.end_npu_program()
+    assert len(matrices) == 2
+    for mtx in matrices:
+        check_round_trip(npu, mtx)
@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+keras = pytest.importorskip('tensorflow').keras
+
+from npu_keras import NPUSequential  # noqa: E402
+from npu_model import NPUModel, Dense, SimpleRNN, GRU, LSTM  # noqa: E402
+
+
+def compiled(npu, model, inputs):
+    model.compile_for_npu(npu, inputs)
+    npu.end_npu_program()
+    return npu
+
+
+# Keras models and the NPUModel they stand for, with test inputs of the right shape
+MODELS = {
+    'mlp': (lambda: NPUSequential([keras.layers.Dense(40, activation='relu', name='layer1'), keras.layers.Dense(20, name='layer2')]),
+            lambda: NPUModel([Dense(40, 'relu', name='layer1'), Dense(20, name='layer2')]),
+            (6, 20)),
+    'rnn': (lambda: NPUSequential([keras.layers.SimpleRNN(20, name='layer1')]),
+            lambda: NPUModel([SimpleRNN(20, name='layer1')]),
+            (3, 6, 20)),
+    'gru': (lambda: NPUSequential([keras.layers.GRU(20, name='layer1')]),
+            lambda: NPUModel([GRU(20, name='layer1')]),
+            (3, 6, 20)),
+    'lstm': (lambda: NPUSequential([keras.layers.LSTM(20, name='layer1')]),
+             lambda: NPUModel([LSTM(20, name='layer1')]),
+             (3, 6, 20)),
+}
+
+
+# The Keras adapter compiles to the same program as the equivalent NPUModel
+@pytest.mark.parametrize('name', sorted(MODELS))
+def test_sequential_matches_npu_model(make_npu, name):
+    make_sequential, make_model, input_shape = MODELS[name]
+    inputs = np.zeros(input_shape, dtype=np.int32)
+    sequential, model = make_sequential(), make_model()
+    from_keras = compiled(make_npu(), sequential, inputs)
+    from_model = compiled(make_npu(), model, inputs)
+
+    assert np.array_equal(from_keras.inst_table.data(), from_model.inst_table.data())
+    assert np.array_equal(from_keras.mrfs, from_model.mrfs)
+    assert np.array_equal(from_keras.ibuf_q, from_model.ibuf_q)
+    assert np.array_equal(from_keras.golden_obuf_q, from_model.golden_obuf_q)
+    assert from_keras.ops == from_model.ops
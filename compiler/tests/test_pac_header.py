@@ -0,0 +1,63 @@
+import re
+
+import numpy as np
+
+from mif_writer import write_mif_files
+from pac_header import write_pac_header
+
+TILES, DPES, DEPTH, LANES = 2, 10, 4, 10
+INST_WIDTH = 75
+
+
+# Byte rows of every C array in the header
+def header_arrays(path):
+    with open(path, 'r') as header_file:
+        text = header_file.read()
+    arrays = {}
+    for name, body in re.findall(r'char (\w+) ?\[\] = \n(.*?);\n', text, re.S):
+        rows = [bytes(int(b, 16) for b in re.findall(r'\\x([0-9a-f]{2})', line)) for line in body.splitlines()]
+        arrays[name] = np.array([list(row) for row in rows], dtype=np.uint8)
+    return arrays
+
+
+# Data of every line of a MIF file, as characters
+def mif_data(path):
+    with open(path, 'r') as mif_file:
+        return re.findall(r'^\d+: (\w+);$', mif_file.read(), re.M)
+
+
+def hex_row(data):
+    return np.array([int(data[i:i + 2], 16) for i in range(0, len(data), 2)], dtype=np.uint8)
+
+
+# The header replaces the MIF files on the PAC: both must hold the same data, the header least significant byte first
+def test_header_matches_mif_files(tmp_path):
+    rng = np.random.RandomState(0)
+    mrfs = rng.randint(-128, 128, size=(TILES, DPES, DEPTH, LANES)).astype(np.int8)
+    inputs = rng.randint(-128, 128, size=(6, LANES))
+    outputs = rng.randint(-2**20, 2**20, size=(6, LANES))
+    words = rng.randint(0, 256, size=(5, (INST_WIDTH + 7) // 8)).astype(np.uint8)
+    words[:, -1] &= (1 << (INST_WIDTH % 8)) - 1
+    write_mif_files(str(tmp_path), mrfs, inputs, outputs, words, INST_WIDTH)
+    write_pac_header(str(tmp_path / 'test.h'), mrfs, inputs, outputs, words, INST_WIDTH)
+    header = header_arrays(tmp_path / 'test.h')
+    assert sorted(header) == ['input_vectors', 'instructions', 'mrf_vector', 'output_vectors']
+
+    for name, mif_name in [('input_vectors', 'input.mif'), ('output_vectors', 'output.mif')]:
+        mif_rows = np.array([hex_row(data)[::-1] for data in mif_data(tmp_path / mif_name)])
+        assert np.array_equal(header[name][:, :LANES], mif_rows)
+        assert not header[name][:, LANES:].any()
+
+    mrf_rows = []
+    for i in range(TILES * DPES):
+        chunks = [mif_data(tmp_path / ('mvu-mrf' + format(i, '03d') + '_' + str(d) + '.mif')) for d in range(LANES // 10)]
+        for line in zip(*chunks):
+            bits = ''.join(line)
+            mrf_rows.append([int(bits[k:k + 8], 2) for k in range(0, len(bits), 8)][::-1])
+    assert np.array_equal(header['mrf_vector'][:, :LANES], np.array(mrf_rows, dtype=np.uint8))
+
+    # Instructions (and the all-ones end marker): the MIF lines are the bits, most significant first
+    insts = np.unpackbits(header['instructions'], axis=1, bitorder='little')
+    mif_insts = np.array([[int(c) for c in data[::-1]] for data in mif_data(tmp_path / 'top_sched.mif')])
+    assert np.array_equal(insts[:, :INST_WIDTH], mif_insts)
+    assert not insts[:, INST_WIDTH:].any()
@@ -0,0 +1,58 @@
+import csv
+
+import numpy as np
+
+from npu_model import NPUModel, Dense
+from perf_model import STAGES, timeline
+
+
+# One Dense layer whose matvecs hand their results over in several interleaved row groups
+def compile_dense(make_npu):
+    npu = make_npu()
+    np.random.seed(1)
+    NPUModel([Dense(80, name='layer1')]).compile_for_npu(npu, np.random.randint(-128, 127, size=(3, 80)))
+    return npu
+
+
+def test_cycle_counts(make_npu):
+    npu = compile_dense(make_npu)
+    assert npu.estimate_perf() == 126
+    assert npu.simulate_pipeline().cycles == 126
+
+
+def test_stage_summary_covers_timelines(make_npu):
+    sim = compile_dense(make_npu).simulate_pipeline()
+    summary = sim.stage_summary()
+    assert summary['mvu'] == {'busy': 32, 'tag': 29, 'input': 0, 'output': 0}
+    for stage in STAGES:
+        # Intervals are in order, do not overlap and end by the last cycle
+        intervals = sim.timelines[stage]
+        for (_, end, _, _), (start, _, _, _) in zip(intervals, intervals[1:]):
+            assert end <= start
+        assert intervals[-1][1] <= sim.cycles
+        for state in summary[stage]:
+            assert summary[stage][state] == sum(end - start for start, end, s, _ in intervals if s == state)
+
+
+def test_write_timelines(make_npu, tmp_path):
+    sim = compile_dense(make_npu).simulate_pipeline()
+    path = tmp_path / 'timelines.csv'
+    sim.write_timelines(str(path))
+    with open(str(path)) as f:
+        rows = list(csv.DictReader(f))
+    assert len(rows) == sum(len(sim.timelines[stage]) for stage in STAGES)
+    assert [row['stage'] for row in rows] == [stage for stage in STAGES for _ in sim.timelines[stage]]
+    assert set(row['state'] for row in rows) <= {'busy', 'tag', 'input', 'output'}
+    busy_mvu = sum(int(row['end']) - int(row['start']) for row in rows if row['stage'] == 'mvu' and row['state'] == 'busy')
+    assert busy_mvu == sim.stage_summary()['mvu']['busy']
+
+
+# A consumer taking one vector per cycle finishes a burst that arrives at once only after taking all of it
+def test_timeline_drain_end():
+    handover = timeline()
+    handover.add(6, 10, 11)
+    handover.add(9, 20, 22)
+    assert handover.drain_end(0, 6) == 16
+    assert handover.drain_end(0, 15) == 29
+    assert handover.drain_end(3, 12) == 29
+    assert handover.drain_end(0, 16) is None
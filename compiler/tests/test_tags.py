@@ -0,0 +1,23 @@
+import numpy as np
+import pytest
+
+from npu_model import NPUModel, Dense, SimpleRNN, GRU, LSTM
+
+MODELS = {
+    'mlp': (lambda: NPUModel([Dense(30, name='layer1'), Dense(20, name='layer2')]), (6, 20)),
+    'rnn': (lambda: NPUModel([SimpleRNN(20, name='layer1')]), (3, 6, 20)),
+    'gru': (lambda: NPUModel([GRU(20, name='layer1')]), (3, 6, 20)),
+    'lstm': (lambda: NPUModel([LSTM(20, name='layer1')]), (3, 6, 20)),
+}
+
+
+# With -checktags every indexed tag lookup is compared with the instruction queue scan while compiling
+@pytest.mark.parametrize('model_name', sorted(MODELS))
+def test_indexed_tags_match_scan(make_npu, model_name):
+    npu = make_npu('-checktags')
+    build_model, input_shape = MODELS[model_name]
+    build_model().compile_for_npu(npu, np.random.randint(-128, 127, size=input_shape))
+    assert npu.highest_tag_so_far > 0
+    # The compiled program as a whole: the last writer of every vector gives the same tag as the scan
+    for name in npu.last_writer:
+        assert npu.find_tag([name]) == npu.scan_tag([name])
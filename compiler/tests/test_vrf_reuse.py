@@ -0,0 +1,60 @@
+import numpy as np
+
+from fsim import MVU_MATVEC, LD_IN, LD_WB, LD_FLUSH
+from test_fsim import simulate
+
+SIM_BATCH = 3
+
+
+def words(vec):
+    return set(range(vec.alloc_addr, vec.alloc_addr + vec.word_count))
+
+
+# x is loaded and read by a matvec whose result is written back to h, then y is loaded and written back to z
+def load_after_last_read(npu):
+    W = npu.malloc('W', 20, 20, 'mvu_mrf', np.random.randint(0, 127, size=(20, 20), dtype=np.int8))
+    x = [npu.malloc('x', 20, None, 'mvu_vrf', np.random.randint(-128, 127, size=20)) for i in range(SIM_BATCH)]
+    h = [npu.malloc('h', 20, None, 'mvu_vrf') for i in range(SIM_BATCH)]
+    y = [npu.malloc('y', 20, None, 'mvu_vrf', np.random.randint(-128, 127, size=20)) for i in range(SIM_BATCH)]
+    z = [npu.malloc('z', 20, None, 'mvu_vrf') for i in range(SIM_BATCH)]
+    npu.load(x, batch=SIM_BATCH)
+    npu.write_back(npu.matvec_mult(x, W, batch=SIM_BATCH), h, write_to_obuf=1, batch=SIM_BATCH)
+    npu.load(y, batch=SIM_BATCH)
+    npu.write_back(npu.matvec_mult(y, W, batch=SIM_BATCH), z, write_to_obuf=1, batch=SIM_BATCH)
+    npu.end_npu_program()
+    return x, h, y, z
+
+
+def test_write_back_waits_for_last_read(make_npu):
+    npu = make_npu('-vrfreuse')
+    x, h, y, z = load_after_last_read(npu)
+    # The matvec may still be reading x while its results are written back to h
+    for b in range(SIM_BATCH):
+        for vec in x:
+            assert not (words(h[b]) & words(vec))
+    # Once the write back to h has retired, the loader can only reach the load of y after all reads of x
+    assert set().union(*[words(vec) for vec in y]) & set().union(*[words(vec) for vec in x])
+    npu.fsim_npu_program()
+    assert np.array_equal(npu.fsim.obuf_q, npu.golden_obuf_q)
+
+
+# The chains that write back the results of a chain retire together with it
+def test_retired_chains(make_npu):
+    npu = make_npu('-vrfreuse')
+    load_after_last_read(npu)
+    retired = npu.retired_chains()
+    insts = npu.inst_table.rows()
+    for i, inst in enumerate(insts):
+        if (inst.mvu_op == MVU_MATVEC):
+            assert retired[i] > i
+            assert all(insts[k].ld_src in (LD_WB, LD_FLUSH) for k in range(i + 1, retired[i] + 1))
+            assert retired[i] + 1 == len(insts) or insts[retired[i] + 1].ld_src == LD_IN
+        elif (inst.ld_src == LD_IN):
+            assert retired[i] == i
+
+
+def test_models_match_golden_with_reuse(make_npu):
+    for model_name in ['dense', 'rnn', 'gru']:
+        npu = make_npu('-vrfreuse')
+        outputs = simulate(npu, model_name)
+        assert np.array_equal(outputs, npu.golden_obuf_q)
@@ -1,13 +1,8 @@
-import os
-os.environ['TF_CPP_MIN_LOG_LEVEL'] = "2"
-import tensorflow as tf
-from tensorflow import keras
-from tensorflow.keras import layers
 #import sys
 #sys.path.append('../compiler/')
 
 from compiler import *
-from npu_layers import *
+from npu_model import *
 
 ###### START OF MODEL DEFINITION ######
 
@@ -15,16 +10,13 @@ from npu_layers import *
 INPUT_SIZE = 1152
 L1_SIZE = 1152
 
-# Define model architecture using Keras Sequential Model
-model = NPUSequential([
-	layers.Dense(L1_SIZE, name="layer1"),
+# Define model architecture (TensorFlow-free NPU model frontend)
+model = NPUModel([
+	Dense(L1_SIZE, name="layer1"),
 ])
 
 # Random test inputs for different types of layers
-test_input = tf.random.uniform(shape=[6, INPUT_SIZE], dtype=tf.int32, minval=-128, maxval=127)
-
-# Call model on example input
-y = model(test_input)
+test_input = np.random.randint(-128, 127, size=(6, INPUT_SIZE))
 
 # Print model summary
 model.summary()
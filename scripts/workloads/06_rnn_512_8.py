@@ -1,13 +1,8 @@
-import os
-os.environ['TF_CPP_MIN_LOG_LEVEL'] = "2"
-import tensorflow as tf
-from tensorflow import keras
-from tensorflow.keras import layers
 #import sys
 #sys.path.append('../compiler/')
 
 from compiler import *
-from npu_layers import *
+from npu_model import *
 
 ###### START OF MODEL DEFINITION ######
 
@@ -16,16 +11,13 @@ INPUT_SIZE = 512
 HIDDEN_UNITS = 512
 TIME_STEPS = 8
 
-# Define model architecture using Keras Sequential Model
-model = NPUSequential([
-	layers.SimpleRNN(HIDDEN_UNITS, name="layer1"),
+# Define model architecture (TensorFlow-free NPU model frontend)
+model = NPUModel([
+	SimpleRNN(HIDDEN_UNITS, name="layer1"),
 ])
 
 # Random test inputs for different types of layers
-test_input = tf.random.uniform(shape=[TIME_STEPS, 6, INPUT_SIZE], minval=-128, maxval=127)
-
-# Call model on example input
-y = model(test_input)
+test_input = np.random.randint(-128, 127, size=(TIME_STEPS, 6, INPUT_SIZE))
 
 # Print model summary
 model.summary()
@@ -1,11 +1,5 @@
-import os
-os.environ['TF_CPP_MIN_LOG_LEVEL'] = "2"
-import tensorflow as tf
-from tensorflow import keras
-from tensorflow.keras import layers
-
 from compiler import *
-from npu_layers import *
+from npu_model import *
 
 ###### START OF MODEL DEFINITION ######
 
@@ -15,18 +9,15 @@ DENSE_L1_SIZE = 512
 DENSE_L2_SIZE = 256
 DENSE_L3_SIZE = 256
 
-# Define model architecture using Keras Sequential Model
-model = NPUSequential([
-	layers.Dense(DENSE_L1_SIZE, activation="relu", name="layer1"),
-	layers.Dense(DENSE_L2_SIZE, activation="relu", name="layer2"),
-	layers.Dense(DENSE_L3_SIZE, activation="relu", name="layer3"),
+# Define model architecture (TensorFlow-free NPU model frontend)
+model = NPUModel([
+	Dense(DENSE_L1_SIZE, activation="relu", name="layer1"),
+	Dense(DENSE_L2_SIZE, activation="relu", name="layer2"),
+	Dense(DENSE_L3_SIZE, activation="relu", name="layer3"),
 ])
 
 # Random test inputs for different types of layers
-test_input = tf.random.uniform(shape=[18, INPUT_VEC_SIZE], minval=-128, maxval=127)
-
-# Call model on example input
-y = model(test_input)
+test_input = np.random.randint(-128, 127, size=(18, INPUT_VEC_SIZE))
 
 # Print model summary
 model.summary()
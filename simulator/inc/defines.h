@@ -9,31 +9,34 @@
 #define VERBOSE_MVU 1
 #define VERBOSE_LD_OUT 0
 
-// Architecture Parameters
-#define TILES 7
-#define DPES 40
-#define LANES 40
-#define MVU_VRF_DEPTH 512
-#define MVU_MRF_DEPTH 1024
-#define EVRF_DEPTH 512
-#define MFU_VRF0_DEPTH 512
-#define MFU_VRF1_DEPTH 512
-#define FIFO_DEPTH 512
-
-// Latency Parameters
-#define DPE_MULT_LATENCY 2
-#define DPE_ADDER_LATENCY 1
-#define RF_WRITE_LATENCY 1
-#define RF_READ_LATENCY 1
-#define MRF_TO_DPE_LATENCY 8
-#define VRF_TO_DPE_LATENCY 8
-#define MVU_ACCUM_LATENCY 4
-#define MVU_REDUCTION_LATENCY (unsigned int)(ceil(log2(TILES))+5)
-#define MFU_ACT_LATENCY 3
-#define MFU_ADD_LATENCY 3
-#define MFU_MUL_LATENCY 3
-#define MFU_LATENCY MFU_ACT_LATENCY+MFU_ADD_LATENCY+MFU_MUL_LATENCY
-#define LD_WB_LATENCY 5
+// Architecture Parameters (read at startup by readConfigFile, defaults in config.cpp)
+extern unsigned int TILES;
+extern unsigned int DPES;
+extern unsigned int LANES;
+extern unsigned int MVU_VRF_DEPTH;
+extern unsigned int MVU_MRF_DEPTH;
+extern unsigned int EVRF_DEPTH;
+extern unsigned int MFU_VRF0_DEPTH;
+extern unsigned int MFU_VRF1_DEPTH;
+extern unsigned int FIFO_DEPTH;
+
+// Latency Parameters (read at startup by readConfigFile, defaults in config.cpp)
+extern unsigned int DPE_MULT_LATENCY;
+extern unsigned int DPE_ADDER_LATENCY;
+extern unsigned int RF_WRITE_LATENCY;
+extern unsigned int RF_READ_LATENCY;
+extern unsigned int MRF_TO_DPE_LATENCY;
+extern unsigned int VRF_TO_DPE_LATENCY;
+extern unsigned int MVU_ACCUM_LATENCY;
+extern unsigned int MVU_REDUCTION_LATENCY;
+extern unsigned int MFU_ACT_LATENCY;
+extern unsigned int MFU_ADD_LATENCY;
+extern unsigned int MFU_MUL_LATENCY;
+extern unsigned int MFU_LATENCY;
+extern unsigned int LD_WB_LATENCY;
+
+// Used for setting the architecture and latency parameters from a file of "NAME value" lines
+void readConfigFile(const std::string &file_name);
 
 // Precision
 #define TYPE int
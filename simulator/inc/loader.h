@@ -8,6 +8,7 @@
 #include "output.h"
 #include "inst.h"
 #include "utils.h"
+#include "program_image.h"
 #include "defines.h"
 
 /* 
@@ -0,0 +1,64 @@
+#ifndef PROGRAM_IMAGE_H_
+#define PROGRAM_IMAGE_H_
+
+#include <string>
+#include <vector>
+#include <queue>
+#include <stdint.h>
+#include "inst.h"
+#include "defines.h"
+
+/*
+ * This header file declares the binary program image written by the compiler (compiler/sim_image.py). The file has
+ * a fixed header followed by the MRF contents (up to the filled depth), the input vectors, the golden output vectors
+ * and the instruction words. It is mapped into memory once and every section is read in place.
+ */
+struct ProgramImageHeader {
+	char magic[8];
+	uint32_t version;
+	uint32_t tiles;
+	uint32_t dpes;
+	uint32_t lanes;
+	uint32_t mrf_depth;
+	uint32_t num_inputs;
+	uint32_t num_outputs;
+	uint32_t num_insts;
+	uint32_t inst_words;
+	uint32_t reserved;
+	uint64_t mrf_offset;
+	uint64_t inputs_offset;
+	uint64_t outputs_offset;
+	uint64_t insts_offset;
+};
+
+class ProgramImage {
+public:
+	// Constructor
+	ProgramImage(const std::string &file_name);
+	// Getter functions
+	unsigned int getNumInputs() { return header->num_inputs; }
+	unsigned int getNumOutputs() { return header->num_outputs; }
+	unsigned int getNumInstructions() { return header->num_insts; }
+	// Helper functions for reading the image sections
+	void readMRF(unsigned int tile_id, unsigned int dpe_id, std::vector<std::vector<TYPE>> &mrf);
+	void readInputs(std::queue<std::vector<TYPE>> &inputs);
+	void readOutputs(std::vector<std::vector<TYPE>> &outputs);
+	void readInstruction(unsigned int inst_id, npu_instruction &vliw);
+	// Destructor
+	~ProgramImage();
+
+private:
+	const int32_t* section(uint64_t offset);
+	// Mapped file
+	void *data;
+	size_t size;
+	const ProgramImageHeader *header;
+};
+
+// Used for opening the image that the NPU modules are initialized from
+void openProgramImage(const std::string &file_name);
+
+// Image opened by openProgramImage
+ProgramImage* getProgramImage();
+
+#endif
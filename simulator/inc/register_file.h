@@ -28,7 +28,7 @@ template<class T>
 class RegisterFile : public Module { 
 public:
 	// Constructor
-	RegisterFile(std::string t_name, unsigned int t_depth, std::string *t_file_name = nullptr);
+	RegisterFile(std::string t_name, unsigned int t_depth, const std::vector<T> *t_contents = nullptr);
 	// Clock function
 	void clock() override;
 	// Getter functions
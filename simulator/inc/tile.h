@@ -10,6 +10,7 @@
 #include "register_file.h"
 #include "accumulator.h"
 #include "inst.h"
+#include "program_image.h"
 #include "defines.h"
 
 /* 
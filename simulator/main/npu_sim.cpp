@@ -19,6 +19,7 @@
 #include "../inc/mfu.h"
 #include "../inc/datapath.h"
 #include "../inc/npu.h"
+#include "../inc/program_image.h"
 
 using namespace std;
 
@@ -31,155 +32,18 @@ void print_vector(vector<TYPE> v){
 }
 
 void read_npu_instructions(unsigned int &cycle_count, Channel<npu_instruction> *inst_q, NPU *npu){
-	string file_name = "./register_files/instructions.txt";
-	ifstream in(file_name);
-	if(!in) assert(0 && "Cannot Open File!");
-	string line;
-	unsigned int line_num = 0;
+	ProgramImage *image = getProgramImage();
 	npu_instruction vliw;
-	unsigned int temp;
-	while(getline(in, line)){
-		stringstream line_stream(line);
-		// Read MVU Instruction
-		if(line_num == 0){
-			// Read MVU instruction
-			line_stream >> temp;
-			vliw.mvu_inst.op = temp;
-			line_stream >> temp; 
-			vliw.mvu_inst.vrf_addr0 = temp;
-			line_stream >> temp; 
-			vliw.mvu_inst.vrf_addr1 = temp;
-			line_stream >> temp; 
-			vliw.mvu_inst.vrf_addr2 = temp;
-			line_stream >> temp; 
-			vliw.mvu_inst.v_size = temp;
-			line_stream >> temp;
-			vliw.mvu_inst.mrf_addr = temp;
-			line_stream >> temp; 
-			vliw.mvu_inst.m_size = temp;
-			line_stream >> temp;
-			vliw.mvu_inst.tag = temp;
-			vliw.mvu_inst.print(cycle_count);
-		} else if (line_num == 1){
-			// Read eVRF Instruction
-			line_stream >> temp;
-			vliw.evrf_inst.op = temp;
-			line_stream >> temp; 
-			vliw.evrf_inst.src = temp;
-			line_stream >> temp;
-			vliw.evrf_inst.vrf_addr0 = temp;
-			line_stream >> temp;
-			vliw.evrf_inst.vrf_addr1 = temp;
-			line_stream >> temp;
-			vliw.evrf_inst.vrf_addr2 = temp;
-			line_stream >> temp; 
-			vliw.evrf_inst.v_size = temp;
-			line_stream >> temp; 
-			vliw.evrf_inst.batch = temp;
-			line_stream >> temp; 
-			vliw.evrf_inst.tag = temp;
-			vliw.evrf_inst.print(cycle_count);
-		} else if (line_num == 2){
-			// Read MFU0 Instruction
-			line_stream >> temp;
-			vliw.mfu0_inst.op = temp;
-			line_stream >> temp; 
-			vliw.mfu0_inst.v_size = temp; 
-			line_stream >> temp;
-			vliw.mfu0_inst.act_op = temp;
-			line_stream >> temp; 
-			vliw.mfu0_inst.add_op = temp;
-			line_stream >> temp;
-			vliw.mfu0_inst.vrf0_addr0 = temp;
-			line_stream >> temp;
-			vliw.mfu0_inst.vrf0_addr1 = temp;
-			line_stream >> temp;
-			vliw.mfu0_inst.vrf0_addr2 = temp;
-			line_stream >> temp; 
-			vliw.mfu0_inst.mul_op = temp;
-			line_stream >> temp;
-			vliw.mfu0_inst.vrf1_addr0 = temp;
-			line_stream >> temp;
-			vliw.mfu0_inst.vrf1_addr1 = temp;
-			line_stream >> temp;
-			vliw.mfu0_inst.vrf1_addr2 = temp;
-			line_stream >> temp; 
-			vliw.mfu0_inst.batch = temp;
-			line_stream >> temp; 
-			vliw.mfu0_inst.tag = temp;
-			vliw.mfu0_inst.print(cycle_count);
-		} else if (line_num == 3){
-			// Read MFU1 Instruction
-			line_stream >> temp;
-			vliw.mfu1_inst.op = temp;
-			line_stream >> temp;
-			vliw.mfu1_inst.v_size = temp;
-			line_stream >> temp;
-			vliw.mfu1_inst.act_op = temp;
-			line_stream >> temp;
-			vliw.mfu1_inst.add_op = temp;
-			line_stream >> temp;
-			vliw.mfu1_inst.vrf0_addr0 = temp;
-			line_stream >> temp;
-			vliw.mfu1_inst.vrf0_addr1 = temp;
-			line_stream >> temp;
-			vliw.mfu1_inst.vrf0_addr2 = temp;
- 			line_stream >> temp;
-			vliw.mfu1_inst.mul_op = temp;
-			line_stream >> temp;
-			vliw.mfu1_inst.vrf1_addr0 = temp;
-			line_stream >> temp;
-			vliw.mfu1_inst.vrf1_addr1 = temp;
-			line_stream >> temp;
-			vliw.mfu1_inst.vrf1_addr2 = temp;
-			line_stream >> temp; 
-			vliw.mfu1_inst.batch = temp;
-			line_stream >> temp; 
-			vliw.mfu1_inst.tag = temp;
-			vliw.mfu1_inst.print(cycle_count);
-		} else if (line_num == 4){
-			// Read Loader Instruction
-			line_stream >> temp;
-			vliw.ld_inst.op = temp;
-			line_stream >> temp; 
-			vliw.ld_inst.src = temp;
-			line_stream >> temp; 
-			vliw.ld_inst.v_size = temp;
-			line_stream >> temp;
-			vliw.ld_inst.dst0_valid = temp;
-			line_stream >> temp; 
-			vliw.ld_inst.dst0_id = temp;
-			line_stream >> temp; 
-			vliw.ld_inst.dst0_addr0 = temp;
-			line_stream >> temp; 
-			vliw.ld_inst.dst0_addr1 = temp;
-			line_stream >> temp; 
-			vliw.ld_inst.dst0_addr2 = temp;
-			line_stream >> temp;
-			vliw.ld_inst.dst1_valid = temp;
-			line_stream >> temp; 
-			vliw.ld_inst.dst1_id = temp;
-			line_stream >> temp; 
-			vliw.ld_inst.dst1_addr0 = temp;
-			line_stream >> temp; 
-			vliw.ld_inst.dst1_addr1 = temp;
-			line_stream >> temp; 
-			vliw.ld_inst.dst1_addr2 = temp;
-			line_stream >> temp;
-			vliw.ld_inst.batch = temp;
-			line_stream >> temp;
-			vliw.ld_inst.wr_to_output = temp;
-			vliw.ld_inst.print(cycle_count);
-		}
-
-		if(line_num == 4){
-			inst_q->write(vliw);
-			npu->clock(cycle_count);
-			cycle_count++;
-			line_num = 0;
-		} else {
-			line_num++;
-		}
+	for(unsigned int i = 0; i < image->getNumInstructions(); i++){
+		image->readInstruction(i, vliw);
+		vliw.mvu_inst.print(cycle_count);
+		vliw.evrf_inst.print(cycle_count);
+		vliw.mfu0_inst.print(cycle_count);
+		vliw.mfu1_inst.print(cycle_count);
+		vliw.ld_inst.print(cycle_count);
+		inst_q->write(vliw);
+		npu->clock(cycle_count);
+		cycle_count++;
 	}
 }
 
@@ -198,8 +62,7 @@ void simulate_compiler_code(unsigned int& cycle_count){
 	// Write instructions
 	cout << "Performance simulation starting" << endl;	
 	vector<vector<TYPE>> golden_results;
-	string golden_out_file = "./register_files/py_output.txt";
-	readVectorFile(golden_out_file, golden_results);
+	getProgramImage()->readOutputs(golden_results);
 	unsigned int num_outputs = golden_results.size();
 
 	vector<vector<TYPE>> npu_results;
@@ -266,7 +129,16 @@ void simulate_compiler_code(unsigned int& cycle_count){
 	delete tester_npu_output;
 }
 
-int main() {
+int main(int argc, char *argv[]) {
+	// Architecture and latency parameters come from the config file given as the first argument, or the one the
+	// compiler writes next to the register files (built-in defaults otherwise)
+	string config_file = (argc > 1)? argv[1]: "./register_files/config.txt";
+	if(argc > 1 || ifstream(config_file)){
+		readConfigFile(config_file);
+	}
+	// MRF contents, inputs, golden outputs and instructions come from the program image the compiler writes
+	string image_file = (argc > 2)? argv[2]: "./register_files/npu_program.bin";
+	openProgramImage(image_file);
 	unsigned int cycle_count = 0;
 	simulate_compiler_code(cycle_count);
 	return 0;
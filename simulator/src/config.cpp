@@ -0,0 +1,67 @@
+#include <map>
+#include <fstream>
+#include <sstream>
+#include <math.h>
+#include <assert.h>
+#include "../inc/defines.h"
+
+// Architecture Parameters
+unsigned int TILES = 7;
+unsigned int DPES = 40;
+unsigned int LANES = 40;
+unsigned int MVU_VRF_DEPTH = 512;
+unsigned int MVU_MRF_DEPTH = 1024;
+unsigned int EVRF_DEPTH = 512;
+unsigned int MFU_VRF0_DEPTH = 512;
+unsigned int MFU_VRF1_DEPTH = 512;
+unsigned int FIFO_DEPTH = 512;
+
+// Latency Parameters
+unsigned int DPE_MULT_LATENCY = 2;
+unsigned int DPE_ADDER_LATENCY = 1;
+unsigned int RF_WRITE_LATENCY = 1;
+unsigned int RF_READ_LATENCY = 1;
+unsigned int MRF_TO_DPE_LATENCY = 8;
+unsigned int VRF_TO_DPE_LATENCY = 8;
+unsigned int MVU_ACCUM_LATENCY = 4;
+unsigned int MVU_REDUCTION_LATENCY = (unsigned int)(ceil(log2(7))+5);
+unsigned int MFU_ACT_LATENCY = 3;
+unsigned int MFU_ADD_LATENCY = 3;
+unsigned int MFU_MUL_LATENCY = 3;
+unsigned int MFU_LATENCY = 9;
+unsigned int LD_WB_LATENCY = 5;
+
+// Used for setting the architecture and latency parameters from a file of "NAME value" lines
+void readConfigFile(const std::string &file_name) {
+    std::map<std::string, unsigned int*> params = {
+        {"TILES", &TILES}, {"DPES", &DPES}, {"LANES", &LANES},
+        {"MVU_VRF_DEPTH", &MVU_VRF_DEPTH}, {"MVU_MRF_DEPTH", &MVU_MRF_DEPTH}, {"EVRF_DEPTH", &EVRF_DEPTH},
+        {"MFU_VRF0_DEPTH", &MFU_VRF0_DEPTH}, {"MFU_VRF1_DEPTH", &MFU_VRF1_DEPTH}, {"FIFO_DEPTH", &FIFO_DEPTH},
+        {"DPE_MULT_LATENCY", &DPE_MULT_LATENCY}, {"DPE_ADDER_LATENCY", &DPE_ADDER_LATENCY},
+        {"RF_WRITE_LATENCY", &RF_WRITE_LATENCY}, {"RF_READ_LATENCY", &RF_READ_LATENCY},
+        {"MRF_TO_DPE_LATENCY", &MRF_TO_DPE_LATENCY}, {"VRF_TO_DPE_LATENCY", &VRF_TO_DPE_LATENCY},
+        {"MVU_ACCUM_LATENCY", &MVU_ACCUM_LATENCY}, {"MVU_REDUCTION_LATENCY", &MVU_REDUCTION_LATENCY},
+        {"MFU_ACT_LATENCY", &MFU_ACT_LATENCY}, {"MFU_ADD_LATENCY", &MFU_ADD_LATENCY},
+        {"MFU_MUL_LATENCY", &MFU_MUL_LATENCY}, {"LD_WB_LATENCY", &LD_WB_LATENCY}
+    };
+    std::ifstream in(file_name);
+    if (!in) assert(0 && "Cannot Open Config File!");
+    bool reduction_set = false;
+    std::string line;
+    while(std::getline(in, line)) {
+        std::stringstream line_stream(line);
+        std::string name;
+        unsigned int value;
+        if (!(line_stream >> name) || name[0] == '#') continue;
+        if (!(line_stream >> value) || params.find(name) == params.end()) {
+            std::cerr << "Invalid config line: " << line << std::endl;
+            assert(0 && "Invalid Config File!");
+        }
+        *params[name] = value;
+        reduction_set = reduction_set || (name == "MVU_REDUCTION_LATENCY");
+    }
+    // Derived latencies
+    if (!reduction_set)
+        MVU_REDUCTION_LATENCY = (unsigned int)(ceil(log2(TILES))+5);
+    MFU_LATENCY = MFU_ACT_LATENCY+MFU_ADD_LATENCY+MFU_MUL_LATENCY;
+}
@@ -142,7 +142,7 @@ void Decoder::clock(unsigned int &cycle_count){
         if(remaining_rows == -1){
             remaining_rows = m1.m_size / m1.v_size;
         }
-        acc_size = (remaining_rows > (2*3*LANES/10)-1)? (3*LANES/10): remaining_rows;
+        acc_size = (remaining_rows > (int)(2*3*LANES/10)-1)? (3*LANES/10): remaining_rows;
         u1.op = m1.op;
         if(mvu_pipeline_counter < (3*LANES/10)) {
             u1.vrf_en = 1;
@@ -196,7 +196,7 @@ void Decoder::clock(unsigned int &cycle_count){
                     mvu_counter++;                            
                 } else {
                     mvu_counter = 0;
-                    remaining_rows = (remaining_rows > (2*3*LANES/10)-1)? 
+                    remaining_rows = (remaining_rows > (int)(2*3*LANES/10)-1)? 
                         remaining_rows-(3*LANES/10): remaining_rows;
                     mvu_chunk_counter++;
                 }
@@ -30,8 +30,7 @@ LD::LD(std::string t_name) : Module (t_name) {
     ld_output = new Output<std::vector<TYPE>>(t_name + "_output", this);
 
     // Load input FIFO with initial inputs to the NPU
-	std::string file_name = "register_files/vrf_file.txt"; 
-	readVectorFile(file_name, input_fifo);
+	getProgramImage()->readInputs(input_fifo);
 	std::cout << "Initial size of input FIFO: " << input_fifo.size() << std:: endl;
 }
 
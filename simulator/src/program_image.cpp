@@ -0,0 +1,143 @@
+#include <cstring>
+#include <assert.h>
+#include <fcntl.h>
+#include <unistd.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include "../inc/program_image.h"
+
+#define PROGRAM_IMAGE_MAGIC "NPUSIMG"
+#define PROGRAM_IMAGE_VERSION 1
+#define PROGRAM_IMAGE_INST_WORDS 57
+
+static ProgramImage *program_image = nullptr;
+
+// Program Image Constructor
+ProgramImage::ProgramImage(const std::string &file_name) {
+	int fd = open(file_name.c_str(), O_RDONLY);
+	if (fd < 0) assert(0 && "Cannot Open Program Image!");
+	struct stat file_stat;
+	fstat(fd, &file_stat);
+	size = file_stat.st_size;
+	assert(size >= sizeof(ProgramImageHeader) && "Program image is truncated");
+	data = mmap(nullptr, size, PROT_READ, MAP_PRIVATE, fd, 0);
+	close(fd);
+	assert(data != MAP_FAILED && "Cannot Map Program Image!");
+	header = (const ProgramImageHeader*) data;
+
+	// Check the image was written for this simulator and architecture
+	assert(strcmp(header->magic, PROGRAM_IMAGE_MAGIC) == 0 && "Not a program image");
+	assert(header->version == PROGRAM_IMAGE_VERSION && "Unsupported program image version");
+	assert(header->inst_words == PROGRAM_IMAGE_INST_WORDS && "Unexpected instruction size");
+	assert(header->tiles == TILES && header->dpes == DPES && header->lanes == LANES &&
+		"Program image does not match the architecture parameters");
+	assert(header->mrf_depth <= MVU_MRF_DEPTH && "Program image MRF is deeper than MVU_MRF_DEPTH");
+	assert(header->insts_offset + (uint64_t) header->num_insts * header->inst_words * sizeof(int32_t) <= size &&
+		"Program image is truncated");
+}
+
+// Helper function for locating a section of the image
+const int32_t* ProgramImage::section(uint64_t offset) {
+	return (const int32_t*) ((const char*) data + offset);
+}
+
+// Used for populating the MRF contents of a DPE (the register file pads the rest of its depth with zeros)
+void ProgramImage::readMRF(unsigned int tile_id, unsigned int dpe_id, std::vector<std::vector<TYPE>> &mrf) {
+	const int32_t *words = section(header->mrf_offset) +
+		((uint64_t) tile_id * header->dpes + dpe_id) * header->mrf_depth * header->lanes;
+	for (unsigned int i = 0; i < header->mrf_depth; i++) {
+		mrf.push_back(std::vector<TYPE>(words, words + header->lanes));
+		words += header->lanes;
+	}
+}
+
+// Used for populating the input FIFO contents
+void ProgramImage::readInputs(std::queue<std::vector<TYPE>> &inputs) {
+	const int32_t *words = section(header->inputs_offset);
+	for (unsigned int i = 0; i < header->num_inputs; i++) {
+		inputs.push(std::vector<TYPE>(words, words + header->lanes));
+		words += header->lanes;
+	}
+}
+
+// Used for reading the golden outputs of the functional simulator
+void ProgramImage::readOutputs(std::vector<std::vector<TYPE>> &outputs) {
+	const int32_t *words = section(header->outputs_offset);
+	for (unsigned int i = 0; i < header->num_outputs; i++) {
+		outputs.push_back(std::vector<TYPE>(words, words + header->lanes));
+		words += header->lanes;
+	}
+}
+
+// Used for decoding one VLIW instruction (fields in the order of compiler/sim_image.py)
+void ProgramImage::readInstruction(unsigned int inst_id, npu_instruction &vliw) {
+	assert(inst_id < header->num_insts && "Instruction index out of bound");
+	const int32_t *w = section(header->insts_offset) + (uint64_t) inst_id * header->inst_words;
+	// MVU instruction
+	vliw.mvu_inst.op = *w++;
+	vliw.mvu_inst.vrf_addr0 = *w++;
+	vliw.mvu_inst.vrf_addr1 = *w++;
+	vliw.mvu_inst.vrf_addr2 = *w++;
+	vliw.mvu_inst.v_size = *w++;
+	vliw.mvu_inst.mrf_addr = *w++;
+	vliw.mvu_inst.m_size = *w++;
+	vliw.mvu_inst.tag = *w++;
+	// eVRF instruction
+	vliw.evrf_inst.op = *w++;
+	vliw.evrf_inst.src = *w++;
+	vliw.evrf_inst.vrf_addr0 = *w++;
+	vliw.evrf_inst.vrf_addr1 = *w++;
+	vliw.evrf_inst.vrf_addr2 = *w++;
+	vliw.evrf_inst.v_size = *w++;
+	vliw.evrf_inst.batch = *w++;
+	vliw.evrf_inst.tag = *w++;
+	// MFU instructions
+	mfu_mOP *mfu_insts[2] = {&vliw.mfu0_inst, &vliw.mfu1_inst};
+	for (mfu_mOP *mfu_inst : mfu_insts) {
+		mfu_inst->op = *w++;
+		mfu_inst->v_size = *w++;
+		mfu_inst->act_op = *w++;
+		mfu_inst->add_op = *w++;
+		mfu_inst->vrf0_addr0 = *w++;
+		mfu_inst->vrf0_addr1 = *w++;
+		mfu_inst->vrf0_addr2 = *w++;
+		mfu_inst->mul_op = *w++;
+		mfu_inst->vrf1_addr0 = *w++;
+		mfu_inst->vrf1_addr1 = *w++;
+		mfu_inst->vrf1_addr2 = *w++;
+		mfu_inst->batch = *w++;
+		mfu_inst->tag = *w++;
+	}
+	// Loader instruction
+	vliw.ld_inst.op = *w++;
+	vliw.ld_inst.src = *w++;
+	vliw.ld_inst.v_size = *w++;
+	vliw.ld_inst.dst0_valid = *w++;
+	vliw.ld_inst.dst0_id = *w++;
+	vliw.ld_inst.dst0_addr0 = *w++;
+	vliw.ld_inst.dst0_addr1 = *w++;
+	vliw.ld_inst.dst0_addr2 = *w++;
+	vliw.ld_inst.dst1_valid = *w++;
+	vliw.ld_inst.dst1_id = *w++;
+	vliw.ld_inst.dst1_addr0 = *w++;
+	vliw.ld_inst.dst1_addr1 = *w++;
+	vliw.ld_inst.dst1_addr2 = *w++;
+	vliw.ld_inst.batch = *w++;
+	vliw.ld_inst.wr_to_output = *w++;
+}
+
+ProgramImage::~ProgramImage() {
+	munmap(data, size);
+}
+
+// Used for opening the image that the NPU modules are initialized from
+void openProgramImage(const std::string &file_name) {
+	delete program_image;
+	program_image = new ProgramImage(file_name);
+}
+
+// Image opened by openProgramImage
+ProgramImage* getProgramImage() {
+	assert(program_image && "Program image was not opened");
+	return program_image;
+}
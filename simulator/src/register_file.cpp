@@ -4,7 +4,7 @@
 void init_rf(std::vector<std::vector<TYPE>> &rf, unsigned int depth){
     for (unsigned int i = rf.size(); i < depth; i++) {
         std::vector <TYPE> zeros;
-        for (int j = 0; j < LANES; j++) {
+        for (unsigned int j = 0; j < LANES; j++) {
             zeros.push_back(0);
         }
         rf.push_back(zeros);
@@ -14,7 +14,7 @@ void init_rf(std::vector<std::vector<TYPE>> &rf, unsigned int depth){
 // Register File Constructor
 template <class T>
 RegisterFile<T>::RegisterFile (std::string t_name, unsigned int t_depth, 
-	std::string *t_file_name): Module(t_name) { 
+	const std::vector<T> *t_contents): Module(t_name) { 
 		// Create Input and Output ports
 		raddr = new Input<unsigned int> (t_name + "_raddr", this);
 		rdata = new Output<T> (t_name + "_rdata", this);
@@ -25,8 +25,8 @@ RegisterFile<T>::RegisterFile (std::string t_name, unsigned int t_depth,
 		reads_in_flight = 0;
 		writes_in_flight = 0;
 		// Initialize register file contents
-		if (t_file_name)
-		    readVectorFile(*t_file_name, register_file);
+		if (t_contents)
+		    register_file = *t_contents;
 		init_rf(register_file, t_depth);
 }
 
@@ -31,10 +31,10 @@ Tile::Tile(std::string t_name, unsigned int t_tile_id) : Module (t_name) {
 
         // Create a DPE and its corresponding MRF
         DPE* d = new DPE(t_name + "_dpe" + std::to_string(i), i, t_tile_id);
-		std::string file_name = "register_files/mrf_tile_"+
-			std::to_string(t_tile_id)+"_dpe_"+std::to_string(i)+".txt";
+		std::vector<std::vector<TYPE>> mrf_contents;
+		getProgramImage()->readMRF(t_tile_id, i, mrf_contents);
         RegisterFile<std::vector<TYPE>> *m = new RegisterFile<std::vector<TYPE>> (t_name + 
-            "_mrf" + std::to_string(i), MVU_MRF_DEPTH, &file_name);
+            "_mrf" + std::to_string(i), MVU_MRF_DEPTH, &mrf_contents);
 
         // Create channels for the MRF
         Channel<unsigned int>* temp_mrf_raddr = new Channel<unsigned int>